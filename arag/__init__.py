@@ -1 +1,15 @@
-from .agent_pipeline import ARag
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .agent_pipeline import ARag
+
+__all__ = ["ARag"]
+
+
+def __getattr__(name):
+    # `import arag` stays cheap, the pipeline and its dependencies load on first access to `arag.ARag`
+    if name == "ARag":
+        from .agent_pipeline import ARag
+
+        return ARag
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,34 @@
-import concurrent.futures
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple
-
-from openai import OpenAI
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, Iterator,
+                    List, Optional, Set, Tuple)
 
 from arag.arag_agents import (AnswerAgent, DocumentSelectionAgent,
                               EvaluatorAgent, ImageReferencerAgent,
                               ImproverAgent, KnowledgeAgent, MissingInfoAgent,
-                              ProcessAgent, QueryRewriterAgent)
+                              ProcessAgent, QueryRewriterAgent,
+                              SufficiencyAgent)
 from arag.prompts import PROMPTS
-from arag.utils.citation_system import process_citations
+from arag.utils.deadline_utils import (DeadlineExceeded, deadline_scope,
+                                       gather_until_deadline, get_deadline,
+                                       remaining_time, resolve_deadline)
+from arag.utils.executor_utils import StageExecutor, get_shared_executor
+from arag.utils.rate_limit_utils import RateLimiter
+from arag.utils.retry_utils import (RetryPolicy, is_deadline_error,
+                                    is_rate_limit_error, is_retryable)
+from arag.utils.singleflight import AsyncSingleFlight
 from arag.utils.text_utils import (align_text_images, format_references,
-                                   remove_almost_duplicates)
-from arag.utils.vectordb_utils import (_get_chunks, _get_embeddings,
-                                       _get_metadata)
+                                   remove_almost_duplicates,
+                                   split_completed_paragraphs)
+from arag.utils.token_utils import (batch_by_token_budget, count_tokens,
+                                    pack_by_token_budget,
+                                    split_by_token_budget)
+from arag.utils.tracing_utils import Tracer, get_tracer, span, use_span
+from arag.utils.vectordb_utils import MetadataCache, VectorDBClient, merge_hits
 
 
 class ARag:
@@ -22,15 +38,103 @@ class ARag:
         user_id: str,
         vectordb_endopoint: str = "http://localhost:5000/api",
         status_callback: Optional[Callable[[str, str], Any]] = None,
+        executor: Optional[StageExecutor] = None,
+        rewrite_mode: str = "single",
+        response_cache=None,
+        status_mode: str = "template",
+        vectordb_client: Optional[VectorDBClient] = None,
+        metadata_ttl: float = 300.0,
+        knowledge_batch_tokens: Optional[int] = 6000,
+        knowledge_batch_size: int = 8,
+        knowledge_compress_tokens: Optional[int] = 8000,
+        knowledge_split_tokens: Optional[int] = 32000,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policies: Optional[Dict[str, RetryPolicy]] = None,
+        answer_time_share: float = 0.3,
+        answer_context_tokens: Optional[int] = 24000,
+        answer_context_ranking: str = "retrieval",
+        sufficiency_gate: bool = True,
+        max_missing_sections: Optional[int] = 3,
+        trace_exporter=None,
     ) -> None:
+        if rewrite_mode not in ("single", "parallel"):
+            raise ValueError(f"Unknown rewrite_mode: {rewrite_mode}")
+        if status_mode not in ("template", "llm"):
+            raise ValueError(f"Unknown status_mode: {status_mode}")
+        if answer_context_ranking not in ("retrieval", "embedding"):
+            raise ValueError(f"Unknown answer_context_ranking: {answer_context_ranking}")
+
         self.system_prompts = PROMPTS
         self.model = "gemini-2.0-flash"
         self._vectordb_endpoint = vectordb_endopoint
+        # Pooled HTTP client for chunk, metadata and embedding requests
+        self.vectordb_client = (
+            vectordb_client if vectordb_client is not None else VectorDBClient(vectordb_endpoint=vectordb_endopoint)
+        )
+        # Document catalog indexed by filename, revalidated with ETags once `metadata_ttl` expires
+        self.metadata_cache = MetadataCache(self.vectordb_client, ttl=metadata_ttl)
         self.status_callback = status_callback
+        # "template" sends messages from `perform_action` instantly, "llm" narrates with the
+        # ProcessAgent in the background, off the critical path
+        self.status_mode = status_mode
         self.user_id = user_id
 
         self._retrieved_knowledge = []
 
+        # Bounded pool and per-stage limits shared by every fan-out, process-wide unless given
+        self.executor = executor if executor is not None else get_shared_executor()
+
+        # "single" asks one LLM call for all rewrites, "parallel" issues one call per rewrite
+        self.rewrite_mode = rewrite_mode
+        self._arewrite_flight = AsyncSingleFlight()
+
+        # Optional LLM response cache shared by all agents (see `arag.utils.cache_utils`)
+        self.response_cache = response_cache
+
+        # Chunks sent together to the KnowledgeAgent, bounded by their token count (None = one call per chunk)
+        self.knowledge_batch_tokens = knowledge_batch_tokens
+        self.knowledge_batch_size = knowledge_batch_size
+
+        # Chunks above `knowledge_compress_tokens` go straight to the "compress" KnowledgeAgent
+        # variant, chunks above `knowledge_split_tokens` are split first (None disables either)
+        self.knowledge_compress_tokens = knowledge_compress_tokens
+        self.knowledge_split_tokens = knowledge_split_tokens
+
+        # Chunks kept raw because the KnowledgeAgent kept failing on them (see `_knowledge_fallback`)
+        self.knowledge_fallbacks = 0
+        self._fallback_lock = threading.Lock()
+
+        # Retry policy per agent, keyed like `system_prompts`; agents without one get the default policy
+        self.retry_policies = dict(retry_policies or {})
+
+        # Share of a search timeout kept for answer generation and citations, knowledge gathering
+        # stops once the rest of the budget is used
+        self.answer_time_share = answer_time_share
+
+        # Token budget of the knowledge sent to the AnswerAgent (None = no limit). Blocks are packed
+        # by relevance: "retrieval" keeps retrieval order, "embedding" ranks them by similarity to the query
+        self.answer_context_tokens = answer_context_tokens
+        self.answer_context_ranking = answer_context_ranking
+
+        # Missing-info expansion (a full rewrite, retrieval and extraction round per missing section) only
+        # runs when the SufficiencyAgent finds the knowledge incomplete, for at most `max_missing_sections`
+        # sections ranked by importance (None = no limit). Detection stays pipelined with extraction, the
+        # verdict is awaited alongside its last calls and cancels them when the knowledge is sufficient
+        self.sufficiency_gate = sufficiency_gate
+        self.max_missing_sections = max_missing_sections
+
+        # Limiter shared by every agent of this instance; Gemini quotas are per API key, so give instances
+        # using the same key the same limiter (None = the process default, see `set_rate_limiter`)
+        self.rate_limiter = rate_limiter
+
+        # Spans of every search of this instance, with its stages and LLM/HTTP calls, are sent to this
+        # exporter (None = the process tracer, see `arag.utils.tracing_utils.set_trace_exporter`)
+        self.tracer = Tracer(trace_exporter) if trace_exporter is not None else None
+
+        # Event loop used by the synchronous `search` wrapper, started lazily
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
         self._init_client(api_key=api_key)
         self._init_agents()
 
@@ -39,264 +143,505 @@ class ARag:
         if self.status_callback:
             self.status_callback(state, message)
 
+    async def _anarrate(
+        self, state: str, query: str, action: str, outcome: Any, previous: Optional[asyncio.Task]
+    ) -> None:
+        """Narrate a step with the ProcessAgent, keeping status updates in pipeline order."""
+        try:
+            message = await self.process_agent.aperform_action(query=query, action=action, outcome=outcome)
+        except Exception as e:
+            print(f"Error in status narration: {e}")
+            message = self.perform_action(query=query, action=action, outcome=outcome)
+
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+
+        self._update_status(state, message)
+
+    def _report_status(
+        self, state: str, query: str, action: str, outcome: Any = None, narrations: Optional[List] = None
+    ) -> None:
+        """
+        Report a pipeline step without blocking it.
+
+        Nothing is computed when no callback is registered. In "template" mode the message comes
+        from the `perform_action` table; in "llm" mode a narration task is appended to
+        `narrations` and delivers its message once ready.
+        """
+        if not self.status_callback:
+            return
+
+        if self.status_mode == "llm" and narrations is not None:
+            previous = narrations[-1] if narrations else None
+            narrations.append(asyncio.ensure_future(self._anarrate(state, query, action, outcome, previous)))
+        else:
+            self._update_status(state, self.perform_action(query=query, action=action, outcome=outcome))
+
     def _init_client(self, api_key: str):
+        # The OpenAI SDK takes most of the import time of the package, load it with the first instance
+        from openai import AsyncOpenAI, OpenAI
+
+        # Retries are left to the agents' `RetryPolicy`, so they stay within the search deadline
         self.openai_client = OpenAI(
             api_key=api_key,
             base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+            max_retries=0,
         )
+        self.async_openai_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+            max_retries=0,
+        )
+
+    def _run_coroutine(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the instance event loop and block until it completes.
+
+        The loop lives in a daemon thread for the lifetime of the instance, so the async
+        clients keep their connection pools between calls and the wrapper also works when
+        called from a thread that already runs its own event loop.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="arag-event-loop", daemon=True).start()
+
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
 
     def _init_agents(self) -> None:
         self.query_rewriter = QueryRewriterAgent(
             system_prompt=self.system_prompts["query_rewrite"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("query_rewrite", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.knowledge_agent = KnowledgeAgent(
             system_prompt=self.system_prompts["knowledge_extractor"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("knowledge_extractor", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.answer_agent = AnswerAgent(
             system_prompt=self.system_prompts["answer"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("answer", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.missing_info_agent = MissingInfoAgent(
             system_prompt=self.system_prompts["missing_info"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
+            model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("missing_info", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
+        )
+
+        self.sufficiency_agent = SufficiencyAgent(
+            system_prompt=self.system_prompts["sufficiency"],
+            openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("sufficiency", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.evaluator_agent = EvaluatorAgent(
             system_prompt=self.system_prompts["evaluator"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("evaluator", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.improver_agent = ImproverAgent(
             system_prompt=self.system_prompts["improver"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("improver", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.process_agent = ProcessAgent(
             system_prompt=self.system_prompts["process"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("process", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.image_referencer_agent = ImageReferencerAgent(
             system_prompt=self.system_prompts["images_integrator"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("images_integrator", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
         self.document_selection_agent = DocumentSelectionAgent(
             system_prompt=self.system_prompts["document_selection"],
             openai_client=self.openai_client,
+            async_openai_client=self.async_openai_client,
             model=self.model,
+            cache=self.response_cache,
+            retry_policy=self.retry_policies.setdefault("document_selection", RetryPolicy()),
+            rate_limiter=self.rate_limiter,
         )
 
-    def _extract_knowledge(self, chunk, query):
-        """Extract knowledge from a single chunk."""
+    def _knowledge_pieces(self, chunk: str) -> List[Tuple[str, Optional[str]]]:
+        """Pre-flight size check: the (piece, prompt variant) pairs to send to the KnowledgeAgent for a chunk."""
+        if not self.knowledge_compress_tokens and not self.knowledge_split_tokens:
+            return [(chunk, None)]
+
+        tokens = count_tokens(chunk)
+        if self.knowledge_split_tokens and tokens > self.knowledge_split_tokens:
+            return [(piece, "compress") for piece in split_by_token_budget(chunk, self.knowledge_split_tokens)]
+        if self.knowledge_compress_tokens and tokens > self.knowledge_compress_tokens:
+            return [(chunk, "compress")]
+        return [(chunk, None)]
+
+    @staticmethod
+    def _aborts_extraction(exc: BaseException) -> bool:
+        """Whether a KnowledgeAgent error must reach the caller: the deadline passed or the rate limit is exhausted."""
+        return isinstance(exc, DeadlineExceeded) or is_deadline_error(exc, get_deadline()) or is_rate_limit_error(exc)
+
+    def _knowledge_fallback(self, exc: Exception, chunk: str) -> str:
+        """
+        Keep a chunk raw once the KnowledgeAgent's retry policy gave up on a transient error.
+
+        Called from an `except` block; any other error is re-raised, the fallbacks are counted in
+        `knowledge_fallbacks` and traced as "knowledge_fallback" spans.
+        """
+        if self._aborts_extraction(exc) or not is_retryable(exc):
+            raise exc
 
+        with self._fallback_lock:
+            self.knowledge_fallbacks += 1
+        with span("knowledge_fallback", chunk_chars=len(chunk)) as fallback_span:
+            fallback_span.record_error(exc)
+        print(f"Error in knowledge extraction, keeping the raw chunk: {exc}")
+        return chunk
+
+    def _knowledge_batches(self, chunks: List[str]) -> List[List[str]]:
+        """Group chunks for the KnowledgeAgent by token budget, one chunk per group when batching is off."""
+        if not self.knowledge_batch_tokens:
+            return [[chunk] for chunk in chunks]
+
+        batches = batch_by_token_budget(chunks, self.knowledge_batch_tokens, max_items=self.knowledge_batch_size)
+        return [[chunks[idx] for idx in batch] for batch in batches]
+
+    def extract_knowledge(self, retrieved_chunks: List[Any], query, max_workers=None):
+        """Blocking wrapper around `aextract_knowledge`, `max_workers` bounds the in-flight KnowledgeAgent calls."""
+        return self._run_coroutine(self.aextract_knowledge(retrieved_chunks, query, max_concurrency=max_workers))
+
+    def _process_output_knowledge(self, new_knowledge: str) -> Optional[str]:
+        """Process a single knowledge item and return it if valid."""
         try:
-            return self.knowledge_agent.perform_action(query=query, document_chunk=chunk)
+            if new_knowledge.split("\n")[1].startswith("#"):
+                return new_knowledge
         except:
-            return chunk
+            pass
+        return None
 
-    def extract_knowledge(self, retrieved_chunks: List[Any], query, max_workers=None):
-        """
-        Extract knowledge from chunks in parallel
+    def missing_info_extraction(
+        self,
+        missing_sections: List[Any],
+        chosen_metadata: Dict[str, Any],
+        extracted_knowledge: Set[str],
+        num_chunks: int = 7,
+    ) -> List[str]:
+        """Blocking wrapper around `amissing_info_extraction`."""
+        return self._run_coroutine(
+            self.amissing_info_extraction(missing_sections, chosen_metadata, extracted_knowledge, num_chunks)
+        )
 
-        Args:
-            retrieved_chunks: List of text chunks to process
-            query: Query to use for knowledge extraction
-            knowledge_agent: Agent that extracts knowledge
-            max_workers: Maximum number of worker threads for chunk processing
+    def retrieve_chunks(self, prompts, filename, num_chunks):
+        """Blocking wrapper around `aretrieve_chunks`."""
+        return self._run_coroutine(self.aretrieve_chunks(prompts, filename, num_chunks))
 
-        Returns:
-            List of extracted knowledge chunks
+    def rewrite_query(self, query, chosen_metadata, num_rewrites=5):
+        """Blocking wrapper around `arewrite_query`."""
+        return self._run_coroutine(self.arewrite_query(query, chosen_metadata, num_rewrites=num_rewrites))
+
+    def perform_action(self, query=None, action=None, outcome=None):
+        """Generate narration messages for each step of the search process."""
+
+        messages = {
+            # Initialization and document selection phase
+            "initialize_search": "Starting search process...",
+            "extract_metadata": "Analyzing available documents...",
+            "document_selection_successful": f"Selected most relevant document: {outcome}",
+            # Query processing phase
+            "query_rewrite_successful": "Reformulated query to better match document content",
+            "retrieve_information_successful": f"Retrieved {outcome}",
+            "information_extraction_successful": f"Extracted {outcome}",
+            "generating_answer_successful": "Composing answer based on extracted information",
+            # Evaluation and refinement phase
+            "evaluate_answer_successful_iteration_1": f"Evaluating answer quality... {outcome}",
+            "evaluate_answer_successful_iteration_2": f"Re-evaluating answer... {outcome}",
+            "evaluate_answer_successful_iteration_3": f"Final answer evaluation... {outcome}",
+            "improve_answer_successful_iteration_1": "Refining answer for accuracy and completeness",
+            "improve_answer_successful_iteration_2": "Making additional improvements to answer",
+            "improve_answer_successful_iteration_3": "Finalizing answer improvements",
+        }
+
+        return messages.get(action, f"Performing {action}...")
+
+    def process_missing_info(self, extracted_knowledge, chosen_metadata, max_workers=None):
+        """Blocking wrapper around `aprocess_missing_info`, `max_workers` bounds the items processed at once."""
+        return self._run_coroutine(
+            self.aprocess_missing_info(extracted_knowledge, chosen_metadata, max_concurrency=max_workers)
+        )
+
+    async def _agather(self, stage: str, coros: List[Awaitable], max_concurrency: Optional[int] = None) -> List[Any]:
         """
-        extracted_knowledge = []
+        Await coroutines concurrently under a stage of the shared executor, keeping input order
+        and returning exceptions in place of results.
+        """
+        coros = [self.executor.arun(stage, coro) for coro in coros]
 
-        # Use ThreadPoolExecutor for chunk processing
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit extraction tasks for each chunk
-            future_to_chunk = {
-                executor.submit(self._extract_knowledge, chunk, query): i for i, chunk in enumerate(retrieved_chunks)
-            }
+        if max_concurrency:
+            semaphore = asyncio.Semaphore(max_concurrency)
 
-            # Collect results as they complete (maintains original order)
-            for future in concurrent.futures.as_completed(future_to_chunk):
-                chunk_idx = future_to_chunk[future]
-                try:
-                    result = future.result()
-                    # Ensure we maintain the original order
-                    while len(extracted_knowledge) <= chunk_idx:
-                        extracted_knowledge.append(None)
-                    extracted_knowledge[chunk_idx] = result
-                except Exception as exc:
-                    print(f"Chunk {chunk_idx} generated an exception: {exc}")
+            async def _bounded(coro):
+                async with semaphore:
+                    return await coro
 
-        # Remove any None values (in case some chunks failed)
-        extracted_knowledge = [k for k in extracted_knowledge if k is not None]
-        extracted_knowledge = [k.strip() for k in extracted_knowledge if k != ""]
+            coros = [_bounded(coro) for coro in coros]
 
-        return extracted_knowledge
+        return await asyncio.gather(*coros, return_exceptions=True)
 
-    def _get_chunks_for_query(
-        self, query: str, filename: str, num_chunks: int, section: str, extracted_knowledge: Set[str]
-    ) -> List[str]:
-        """Process a single search query and return unique chunks that aren't in extracted_knowledge and contain the section."""
-        chunks = _get_chunks(
-            vectordb_endopoint=self._vectordb_endpoint, query=query, filename=filename, num_chunks=num_chunks
+    async def _aextract_chunk(self, chunk: str, query) -> str:
+        """Extract knowledge from a single chunk, compressing (and splitting) oversized ones."""
+        knowledge = await asyncio.gather(
+            *[
+                self.knowledge_agent.aperform_action(query=query, document_chunk=piece, variant=variant)
+                for piece, variant in self._knowledge_pieces(chunk)
+            ]
+        )
+        return "\n".join(k for k in knowledge if k)
+
+    async def _aextract_knowledge(self, chunk, query):
+        """Extract knowledge from a single chunk."""
+        try:
+            return await self._aextract_chunk(chunk, query)
+        except Exception as e:
+            return self._knowledge_fallback(e, chunk)
+
+    async def _aextract_knowledge_batch(self, chunks: List[str], query, extract_func: Callable) -> List[str]:
+        """
+        Extract knowledge from several chunks with one KnowledgeAgent call.
+
+        Single chunks, failed batched calls and the chunks a batched response does not cover are
+        handled by `extract_func`, a coroutine function called for one chunk at a time.
+        """
+        if len(chunks) > 1:
+            try:
+                knowledge = await self.knowledge_agent.aperform_batch_action(query=query, document_chunks=chunks)
+            except Exception as e:
+                print(f"Error in batched knowledge extraction: {e}")
+            else:
+                missing = [idx for idx, k in enumerate(knowledge) if k is None]
+                if missing:
+                    print(f"Batched knowledge extraction missed chunks {missing}, extracting them one by one")
+                    extracted = await asyncio.gather(*[extract_func(chunks[idx]) for idx in missing])
+                    for idx, k in zip(missing, extracted):
+                        knowledge[idx] = k
+                return knowledge
+
+        return list(await asyncio.gather(*[extract_func(chunk) for chunk in chunks]))
+
+    async def aextract_knowledge(self, retrieved_chunks: List[Any], query, max_concurrency=None):
+        """
+        Extract knowledge from chunks concurrently
+
+        Args:
+            retrieved_chunks: List of text chunks to process
+            query: Query to use for knowledge extraction
+            max_concurrency: Maximum number of KnowledgeAgent calls in flight for this call
+
+        Returns:
+            List of extracted knowledge chunks, in chunk order
+        """
+        results = await self._agather(
+            "knowledge",
+            [
+                self._aextract_knowledge_batch(batch, query, lambda chunk: self._aextract_knowledge(chunk, query))
+                for batch in self._knowledge_batches(retrieved_chunks)
+            ],
+            max_concurrency=max_concurrency,
         )
-        chunks = chunks["chunks"]
 
-        # Filter chunks that are already in extracted_knowledge or don't contain the section
-        return [chunk for chunk in chunks if chunk not in extracted_knowledge and section in chunk]
+        extracted_knowledge = []
+        for batch_idx, result in enumerate(results):
+            if isinstance(result, Exception):
+                print(f"Batch {batch_idx} generated an exception: {result}")
+                continue
+            extracted_knowledge.extend(k.strip() for k in result if k is not None and k != "")
 
-    def _filter_and_process_chunk(self, args: Tuple) -> Optional[str]:
-        """Process a single chunk with knowledge agent."""
-        wilf, chunk = args
+        return extracted_knowledge
 
+    async def _afilter_and_process_chunk(self, wilf: str, chunk: str) -> Optional[str]:
+        """Extract the knowledge a missing section looks for from a single chunk."""
         try:
-            extracted_knowledge = self.knowledge_agent.perform_action(query=wilf, document_chunk=chunk)
+            extracted_knowledge = await self._aextract_chunk(chunk, wilf)
         except Exception as e:
+            if self._aborts_extraction(e):
+                raise
             try:
-                _knowledge_prompt = (
-                    self.system_prompts["knowledge_extractor"]
-                    + "\n\nYou MUST COMPRESS the information as MUCH as you can while PREVERVING THE MOST IMPORTANT PARTS!"
+                # Oversized chunks were already compressed, retry any other failure compressed once
+                extracted_knowledge = await self.knowledge_agent.aperform_action(
+                    query=wilf, document_chunk=chunk, variant="compress"
                 )
-                self.knowledge_agent.system_prompt = _knowledge_prompt
-                extracted_knowledge = self.knowledge_agent.perform_action(query=wilf, document_chunk=chunk)
-                self.knowledge_agent.system_prompt = self.system_prompts["knowledge_extractor"]
             except Exception as e:
-                return chunk
+                return self._knowledge_fallback(e, chunk)
         return extracted_knowledge
 
-    def _process_queries_in_parallel(
+    async def _aprocess_queries_in_parallel(
         self, search_queries: List[str], filename: str, num_chunks: int, section: str, extracted_knowledge: Set[str]
     ) -> List[str]:
-        """Process all search queries in parallel and return unique chunks."""
-        # Create a list of tasks, each with its own argument
-        tasks = []
-        for query in search_queries:
-            tasks.append((query, filename, num_chunks, section, extracted_knowledge))
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            chunks_results = list(executor.map(lambda args: self._get_chunks_for_query(*args), tasks))
-
-        # Flatten results and remove duplicates
-        _extracted = []
-        for chunks in chunks_results:
-            _extracted.extend(chunks)
-        return list(set(_extracted))
-
-    def _process_extraction_item(
+        """Retrieve all search queries in one batch and return unique chunks that aren't in extracted_knowledge and contain the section."""
+        try:
+            hits = await self.executor.arun(
+                "retrieve",
+                self.vectordb_client.aget_chunks_batch(queries=search_queries, filename=filename, num_chunks=num_chunks),
+            )
+        except Exception as e:
+            print(f"Error in batched retrieval: {e}")
+            return []
+
+        return [chunk for chunk in merge_hits(hits) if chunk not in extracted_knowledge and section in chunk]
+
+    async def _aprocess_extraction_item(
         self, o: Any, chosen_metadata: Dict[str, Any], extracted_knowledge: Set[str], num_chunks: int
     ) -> List[str]:
         """Process a single extraction item and return extracted knowledge."""
         wilf = o.what_im_looking_for
-        search_queries = self.rewrite_query(query=wilf, chosen_metadata=chosen_metadata, num_rewrites=7)
-        section = o.section
+        search_queries = await self.arewrite_query(query=wilf, chosen_metadata=chosen_metadata, num_rewrites=7)
 
-        # First parallel operation: process all search queries concurrently
-        _extracted = self._process_queries_in_parallel(
-            search_queries, chosen_metadata["filename"], num_chunks, section, extracted_knowledge
+        _extracted = await self._aprocess_queries_in_parallel(
+            search_queries, chosen_metadata["filename"], num_chunks, o.section, extracted_knowledge
         )
 
-        # Second parallel operation: process all extracted chunks with knowledge agent
         if _extracted:
-            # Create a list of tasks for the knowledge agent
-            tasks = [(wilf, chunk) for chunk in _extracted]
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                results = list(executor.map(self._filter_and_process_chunk, tasks))
-
-            return [result for result in results if result]  # Filter out empty results
+            results = await self._agather(
+                "knowledge",
+                [
+                    self._aextract_knowledge_batch(
+                        batch, wilf, lambda chunk: self._afilter_and_process_chunk(wilf, chunk)
+                    )
+                    for batch in self._knowledge_batches(_extracted)
+                ],
+            )
+            return [
+                result for batch in results if not isinstance(batch, Exception) for result in batch if result
+            ]
 
         return []
 
-    def _process_output_knowledge(self, new_knowledge: str) -> Optional[str]:
-        """Process a single knowledge item and return it if valid."""
-        try:
-            if new_knowledge.split("\n")[1].startswith("#"):
-                return new_knowledge
-        except:
-            pass
-        return None
-
-    def missing_info_extraction(
+    async def amissing_info_extraction(
         self,
         missing_sections: List[Any],
         chosen_metadata: Dict[str, Any],
         extracted_knowledge: Set[str],
         num_chunks: int = 7,
     ) -> List[str]:
-        """Main function to parallelize the entire knowledge extraction process."""
-        # Process all extraction items in parallel
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            tasks = [(item, chosen_metadata, extracted_knowledge, num_chunks) for item in missing_sections]
-            results = list(executor.map(lambda args: self._process_extraction_item(*args), tasks))
+        """Retrieve and extract the knowledge of every missing section concurrently."""
+        results = await self._agather(
+            "missing_info_extraction",
+            [
+                self._aprocess_extraction_item(item, chosen_metadata, extracted_knowledge, num_chunks)
+                for item in missing_sections
+            ]
+        )
 
-        # Flatten the results
         newly_extracted_knowledge = []
         for result_list in results:
+            if isinstance(result_list, Exception):
+                print(f"Error in parallel execution: {result_list}")
+                continue
             newly_extracted_knowledge.extend(result_list)
 
-        # Remove duplicates and empty strings
         newly_extracted_knowledge = list(set([k for k in newly_extracted_knowledge if k != ""]))
 
-        # Process output knowledge in parallel
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            processed_results = list(executor.map(self._process_output_knowledge, newly_extracted_knowledge))
-
-        # Filter out None values and duplicates
         output_knowledge = []
         seen = set()
-        for result in processed_results:
+        for result in map(self._process_output_knowledge, newly_extracted_knowledge):
             if result and result.split("\n")[1] not in seen:
                 seen.add(result.split("\n")[1])
                 output_knowledge.append(result)
 
         return output_knowledge
 
-    def _retrieve_chunks(self, prompt, filename, num_chunks):
-        chunks = _get_chunks(
-            vectordb_endopoint=self._vectordb_endpoint, query=prompt, filename=filename, num_chunks=num_chunks
+    async def aretrieve_chunks(self, prompts, filename, num_chunks):
+        """Retrieve chunks for all prompts with a single batched vector query and remove duplicates."""
+        hits = await self.executor.arun(
+            "retrieve",
+            self.vectordb_client.aget_chunks_batch(queries=prompts, filename=filename, num_chunks=num_chunks),
         )
-        return chunks["chunks"]
 
-    def retrieve_chunks(self, prompts, filename, num_chunks):
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Create a list of futures
-            future_to_prompt = {
-                executor.submit(self._retrieve_chunks, prompt, filename, num_chunks): prompt for prompt in prompts
-            }
-
-            # Collect results as they complete
-            all_chunks = []
-
-            for future in concurrent.futures.as_completed(future_to_prompt):
-                chunks = future.result()
-                all_chunks.extend(chunks)
-
-        # Remove duplicates
-        return list(set(all_chunks))
-
-    # Define the worker function
-    def _rewrite_query(self, query, chosen_metadata):
-        return self.query_rewriter.perform_action(
-            query=query, summary=chosen_metadata["summary"], table_of_contents=str(chosen_metadata["table_of_contents"])
+        return merge_hits(hits)
+
+    async def _arewrite_query(self, query, chosen_metadata, num_queries=None):
+        return await self.query_rewriter.aperform_action(
+            query=query,
+            summary=chosen_metadata["summary"],
+            table_of_contents=str(chosen_metadata["table_of_contents"]),
+            num_queries=num_queries,
         )
 
-    def rewrite_query(self, query, chosen_metadata, num_rewrites=5):
+    async def _arewrite_prompts(self, query, chosen_metadata, num_rewrites):
+        """Run the rewrite LLM call(s) for one query according to `self.rewrite_mode`."""
+        if self.rewrite_mode == "single":
+            try:
+                return await self.executor.arun(
+                    "rewrite", self._arewrite_query(query, chosen_metadata, num_queries=num_rewrites)
+                )
+            except Exception as e:
+                print(f"Error in query rewrite: {e}")
+                return [query]
+
+        results = await self._agather(
+            "rewrite", [self._arewrite_query(query, chosen_metadata) for _ in range(num_rewrites)]
+        )
+
+        rewritten_prompts = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error in parallel execution: {result}")
+                continue
+            rewritten_prompts.extend(result)
+
+        return rewritten_prompts
+
+    async def arewrite_query(self, query, chosen_metadata, num_rewrites=5):
         """
-        Parallelize the query rewriting process using ThreadPoolExecutor.
+        Rewrite a query into diverse search prompts.
+
+        In "single" mode one LLM call asks for `num_rewrites` distinct rewrites; in "parallel"
+        mode `num_rewrites` independent calls run on the shared stage executor. Identical
+        requests already in flight (e.g. several missing sections looking for the same thing)
+        share a single call.
 
         Args:
             query (str): The original query to rewrite
@@ -306,174 +651,627 @@ class ARag:
         Returns:
             list: Unique rewritten prompts
         """
-        rewritten_prompts = []
-
-        # Use ThreadPoolExecutor for parallel execution
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            # Submit all tasks
-            future_results = [executor.submit(self._rewrite_query, query, chosen_metadata) for _ in range(num_rewrites)]
-
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_results):
-                try:
-                    result = future.result()
-                    rewritten_prompts.extend(result)
-                except Exception as e:
-                    print(f"Error in parallel execution: {e}")
+        key = (self.rewrite_mode, query, chosen_metadata["filename"], num_rewrites)
+        rewritten_prompts = await self._arewrite_flight.do(
+            key, self._arewrite_prompts, query, chosen_metadata, num_rewrites
+        )
 
-        # Return unique prompts
         return list(set(rewritten_prompts))
 
-    def perform_action(self, query=None, action=None, outcome=None):
-        """Generate narration messages for each step of the search process."""
-
-        messages = {
-            # Initialization and document selection phase
-            "initialize_search": "Starting search process...",
-            "extract_metadata": "Analyzing available documents...",
-            "document_selection_successful": f"Selected most relevant document: {outcome}",
-            # Query processing phase
-            "query_rewrite_successful": "Reformulated query to better match document content",
-            "retrieve_information_successful": f"Retrieved {outcome}",
-            "information_extraction_successful": f"Extracted {outcome}",
-            "generating_answer_successful": "Composing answer based on extracted information",
-            # Evaluation and refinement phase
-            "evaluate_answer_successful_iteration_1": f"Evaluating answer quality... {outcome}",
-            "evaluate_answer_successful_iteration_2": f"Re-evaluating answer... {outcome}",
-            "evaluate_answer_successful_iteration_3": f"Final answer evaluation... {outcome}",
-            "improve_answer_successful_iteration_1": "Refining answer for accuracy and completeness",
-            "improve_answer_successful_iteration_2": "Making additional improvements to answer",
-            "improve_answer_successful_iteration_3": "Finalizing answer improvements",
-        }
-
-        return messages.get(action, f"Performing {action}...")
-
-    def _process_missing_info(self, e, chosen_metadata):
-        """Process a single knowledge item."""
-        return self.missing_info_agent.perform_action(
+    async def _aprocess_missing_info(self, e, chosen_metadata):
+        return await self.missing_info_agent.aperform_action(
             text_chunk=e,
             table_of_contents=chosen_metadata["table_of_contents"],
             file_summary=chosen_metadata["summary"],
         )
 
-    def process_missing_info(self, extracted_knowledge, chosen_metadata, max_workers=None):
+    async def aprocess_missing_info(self, extracted_knowledge, chosen_metadata, max_concurrency=None):
         """
-        Process extracted knowledge items in parallel.
+        Process extracted knowledge items concurrently with the MissingInfoAgent.
 
-        Parameters:
-        - extracted_knowledge: List of knowledge items to process
-        - missing_info: The object with the perform_action method
-        - chosen_metadata: Dictionary containing metadata
-        - max_workers: Maximum number of worker threads (None = auto-determine based on system)
+        Args:
+            extracted_knowledge: List of knowledge items to process
+            chosen_metadata: Dictionary containing metadata
+            max_concurrency: Maximum number of items processed concurrently for this call (None = stage limit only)
 
         Returns:
-        - List of processed outputs
+            List of the missing sections found in every item
         """
-        outs = []
-
-        # Using ThreadPoolExecutor since this is likely an I/O-bound task
-        # For CPU-bound tasks, use ProcessPoolExecutor instead
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Create a future for each knowledge item
-            future_to_item = {
-                executor.submit(self._process_missing_info, e, chosen_metadata): e for e in extracted_knowledge
-            }
+        results = await self._agather(
+            "missing_info",
+            [self._aprocess_missing_info(e, chosen_metadata) for e in extracted_knowledge],
+            max_concurrency=max_concurrency,
+        )
 
-            # Process results as they complete
-            for future in concurrent.futures.as_completed(future_to_item):
-                try:
-                    result = future.result()
-                    outs.extend(result)
-                except Exception as exc:
-                    item = future_to_item[future]
-                    print(f"Processing of {item} generated an exception: {exc}")
+        outs = []
+        for item, result in zip(extracted_knowledge, results):
+            if isinstance(result, Exception):
+                print(f"Processing of {item} generated an exception: {result}")
+                continue
+            outs.extend(result)
 
         return outs
 
-    def search(self, query: str) -> str:
-        # Extract metadata from available documents
-        self._update_status(
-            "metadata_extract", self.process_agent.perform_action(query=query, action="extract_metadata")
-        )
+    async def aiter_retrieved_chunks(self, prompts, filename, num_chunks) -> AsyncIterator[List[str]]:
+        """
+        Yield the new unique chunks of every retrieval response as soon as it arrives.
 
-        metadata = _get_metadata(self._vectordb_endpoint)
+        A batched response is yielded as one list in `merge_hits` order; per-query responses are
+        yielded as they arrive, without the chunks already yielded for an earlier query.
+        """
+        seen = set()
+        results = self.vectordb_client.aiter_chunks_batch(queries=prompts, filename=filename, num_chunks=num_chunks)
 
-        # Select the most relevant document
-        chosen_file = self.document_selection_agent.perform_action(query=query, files_metadata=metadata)
-        self._update_status(
-            "doc_select",
-            self.process_agent.perform_action(query=query, action="document_selection_successful", outcome=chosen_file),
-        )
+        async def _next_hits():
+            # Exhaustion is not a retrieval failure, keep it out of the stage metrics
+            try:
+                return await results.__anext__()
+            except StopAsyncIteration:
+                return None
 
-        for m in metadata:
-            if m["filename"] == chosen_file:
-                chosen_metadata = m
-                break
+        try:
+            while True:
+                hits = await self.executor.arun("retrieve", _next_hits())
+                if hits is None:
+                    break
+
+                chunks = [chunk for chunk in merge_hits(hits) if chunk not in seen]
+                seen.update(chunks)
+                if chunks:
+                    yield chunks
+        finally:
+            await results.aclose()
+
+    async def _adetect_missing_info(self, knowledge_task: Awaitable, chosen_metadata):
+        """Run MissingInfoAgent on a knowledge block as soon as its extraction finishes."""
+        knowledge = await knowledge_task
+        if knowledge is None or knowledge == "":
+            return []
+
+        return await self.executor.arun("missing_info", self._aprocess_missing_info(knowledge.strip(), chosen_metadata))
+
+    def _rank_missing_sections(self, missing_sections: List[Any]) -> List[Any]:
+        """
+        Deduplicate missing sections and rank them by importance.
 
-        # Rewrite query for better retrieval
-        rewritten_prompts = self.rewrite_query(query=query, chosen_metadata=chosen_metadata, num_rewrites=7)
+        A section referenced by more knowledge blocks ranks higher, ties keep detection order.
+        """
+        unique = {}
+        references = {}
+        for item in missing_sections:
+            key = (str(item.section).strip().lower(), item.what_im_looking_for.strip().lower())
+            unique.setdefault(key, item)
+            references[key[0]] = references.get(key[0], 0) + 1
 
-        self._update_status(
-            "query_refine",
-            self.process_agent.perform_action(
-                query=query, action="query_rewrite_successful", outcome=rewritten_prompts
-            ),
-        )
+        return sorted(unique.values(), key=lambda item: -references[str(item.section).strip().lower()])
 
-        # Retrieve relevant document chunks
-        retrieved_chunks = self.retrieve_chunks(prompts=rewritten_prompts, filename=chosen_file, num_chunks=5)
+    def _sufficiency_knowledge(self, knowledge: List[str]) -> List[str]:
+        """The knowledge shown to the SufficiencyAgent, packed like the AnswerAgent context."""
+        if not self.answer_context_tokens:
+            return knowledge
 
-        self._update_status(
-            "chunk_retrieve",
-            self.process_agent.perform_action(
-                query=query, action="retrieve_information_successful", outcome=f"{len(retrieved_chunks)} chunks found"
-            ),
-        )
+        packed, _ = pack_by_token_budget(knowledge, self.answer_context_tokens)
+        return [knowledge[idx] for idx in packed]
 
-        # Extract knowledge from chunks
-        extracted_knowledge = self.extract_knowledge(retrieved_chunks=retrieved_chunks, query=query, max_workers=8)
+    async def _ais_sufficient(self, query: str, knowledge: List[str]) -> bool:
+        """Whether the SufficiencyAgent finds that the knowledge answers the query, False if the check fails."""
+        try:
+            is_sufficient, _ = await self.sufficiency_agent.aperform_action(
+                query=query, knowledge=self._sufficiency_knowledge(knowledge), missing_sections=[]
+            )
+        except Exception as e:
+            print(f"Error in sufficiency check, looking for missing information: {e}")
+            return False
 
-        self._update_status(
-            "knowledge_extract",
-            self.process_agent.perform_action(
-                query=query,
-                action="information_extraction_successful",
-                outcome=f"{len(extracted_knowledge)} pieces of knowledge extracted",
-            ),
-        )
+        return is_sufficient
 
-        # Check for missing information
-        missing_sections = self.process_missing_info(
-            extracted_knowledge=extracted_knowledge, chosen_metadata=chosen_metadata
-        )
+    async def _agate_missing_info(
+        self, query: str, knowledge: List[str], missing_info_tasks: List[asyncio.Task]
+    ) -> List[Any]:
+        """
+        Check the knowledge with the SufficiencyAgent while missing-info detection finishes.
 
-        missing_knowledge = self.missing_info_extraction(
+        Returns:
+            The detection results, none when the knowledge is sufficient (detection still running is cancelled)
+        """
+        detection = asyncio.ensure_future(gather_until_deadline(missing_info_tasks))
+        try:
+            with span("sufficiency_check", blocks=len(knowledge)) as check_span:
+                is_sufficient = await self._ais_sufficient(query, knowledge)
+                check_span.set_attribute("sufficient", is_sufficient)
+
+            if is_sufficient:
+                pending = sum(not task.done() for task in missing_info_tasks)
+                print(f"Knowledge is sufficient, skipping missing information ({pending} checks cancelled)")
+                return []
+            return await detection
+        finally:
+            detection.cancel()
+
+    def _select_missing_sections(self, missing_sections: List[Any]) -> List[Any]:
+        """The missing sections worth a missing-info expansion round, ranked and capped at `max_missing_sections`."""
+        candidates = self._rank_missing_sections(missing_sections)
+
+        if self.max_missing_sections is not None and len(candidates) > self.max_missing_sections:
+            print(f"Following {self.max_missing_sections} of {len(candidates)} missing sections")
+            candidates = candidates[: self.max_missing_sections]
+
+        return candidates
+
+    async def _aexpand_missing_info(
+        self, knowledge: List[str], missing_sections: List[Any], chosen_metadata: Dict[str, Any], expansion_span
+    ) -> List[str]:
+        """Retrieve the information referenced by the knowledge but missing from it."""
+        missing_sections = self._select_missing_sections(missing_sections)
+        expansion_span.set_attribute("missing_sections", len(missing_sections))
+        if not missing_sections:
+            return []
+
+        return await self.amissing_info_extraction(
             missing_sections=missing_sections,
             chosen_metadata=chosen_metadata,
-            extracted_knowledge=extracted_knowledge,
+            extracted_knowledge=knowledge,
             num_chunks=7,
         )
 
+    async def astream_knowledge(
+        self,
+        query: str,
+        prompts: List[str],
+        chosen_metadata: Dict[str, Any],
+        num_chunks: int = 5,
+        max_concurrency: Optional[int] = 8,
+        narrations: Optional[List[asyncio.Task]] = None,
+        detect_missing: bool = True,
+        sufficiency_gate: bool = False,
+    ) -> Tuple[List[str], List[Any]]:
+        """
+        Retrieve, extract knowledge and detect missing information as one pipeline.
+
+        Retrieved chunks are sent to KnowledgeAgent the moment their response arrives (batched by
+        token budget), and every extracted knowledge block is sent to MissingInfoAgent the moment
+        it is ready, so the stages overlap and latency follows the longest chunk chain instead of
+        the sum of the stage maxima.
+
+        Args:
+            query: The user question
+            prompts: Rewritten queries to retrieve chunks for
+            chosen_metadata: Metadata of the selected document
+            num_chunks: Number of chunks retrieved per prompt
+            max_concurrency: Maximum number of in-flight KnowledgeAgent calls
+            narrations: Background narration tasks, only used in "llm" status mode
+            detect_missing: Run MissingInfoAgent on the knowledge blocks (off, no missing sections are returned)
+            sufficiency_gate: Once extraction is done, check the knowledge with the SufficiencyAgent while
+                missing-info detection finishes; when it is sufficient, detection is cancelled and no missing
+                sections are returned
+
+        Returns:
+            Extracted knowledge in retrieval order, and the missing sections found in it
+
+        Inside a `deadline_scope`, retrieval and extraction stop at the deadline: calls still
+        running are cancelled and the knowledge extracted so far is returned.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def _extract(batch):
+            coro = self._aextract_knowledge_batch(batch, query, lambda chunk: self._aextract_knowledge(chunk, query))
+            if semaphore is None:
+                return await self.executor.arun("knowledge", coro)
+            async with semaphore:
+                return await self.executor.arun("knowledge", coro)
+
+        async def _pick(batch_task, offset):
+            return (await batch_task)[offset]
+
+        batch_tasks = []
+        knowledge_tasks = []
+        missing_info_tasks = []
+
+        async def _dispatch():
+            async for chunks in self.aiter_retrieved_chunks(
+                prompts=prompts, filename=chosen_metadata["filename"], num_chunks=num_chunks
+            ):
+                for batch in self._knowledge_batches(chunks):
+                    batch_task = asyncio.ensure_future(_extract(batch))
+                    batch_tasks.append(batch_task)
+
+                    for offset in range(len(batch)):
+                        knowledge_task = asyncio.ensure_future(_pick(batch_task, offset))
+                        knowledge_tasks.append(knowledge_task)
+                        if detect_missing:
+                            missing_info_tasks.append(
+                                asyncio.ensure_future(self._adetect_missing_info(knowledge_task, chosen_metadata))
+                            )
+
+        try:
+            try:
+                await asyncio.wait_for(_dispatch(), timeout=remaining_time())
+            except asyncio.TimeoutError:
+                print(f"Deadline reached during retrieval, continuing with {len(knowledge_tasks)} chunks")
+
+            self._report_status(
+                "chunk_retrieve",
+                query,
+                "retrieve_information_successful",
+                f"{len(knowledge_tasks)} chunks found",
+                narrations,
+            )
+
+            # Knowledge still being extracted at the deadline is dropped
+            knowledge_results = await gather_until_deadline(knowledge_tasks)
+
+            extracted_knowledge = []
+            for chunk_idx, result in enumerate(knowledge_results):
+                if isinstance(result, Exception):
+                    print(f"Chunk {chunk_idx} generated an exception: {result}")
+                elif result is not None and result != "":
+                    extracted_knowledge.append(result.strip())
+
+            self._report_status(
+                "knowledge_extract",
+                query,
+                "information_extraction_successful",
+                f"{len(extracted_knowledge)} pieces of knowledge extracted",
+                narrations,
+            )
+
+            if sufficiency_gate and extracted_knowledge:
+                missing_info_results = await self._agate_missing_info(query, extracted_knowledge, missing_info_tasks)
+            else:
+                missing_info_results = await gather_until_deadline(missing_info_tasks)
+        finally:
+            # Only pending when retrieval failed, the deadline was reached or the search was cancelled
+            for task in batch_tasks + knowledge_tasks + missing_info_tasks:
+                task.cancel()
+
+        missing_sections = []
+        for chunk_idx, result in enumerate(missing_info_results):
+            if isinstance(result, Exception):
+                print(f"Processing of chunk {chunk_idx} generated an exception: {result}")
+                continue
+            missing_sections.extend(result)
+
+        return extracted_knowledge, missing_sections
+
+    def _tracer(self) -> Tracer:
+        """Tracer the spans of a search go to; nested spans follow it through the current span."""
+        return self.tracer if self.tracer is not None else get_tracer()
+
+    async def asearch(self, query: str, timeout: Optional[float] = None, deadline: Optional[float] = None) -> str:
+        """
+        Answer a query end-to-end on the running event loop.
+
+        All LLM and vector database traffic goes through the async clients, so many searches
+        can share a single event loop without spawning threads. An instance should be driven
+        either through `search` or from one event loop through `asearch`, since the async
+        clients bind their connection pools to the loop they are first used on.
+
+        With a timeout or deadline, every LLM and HTTP call is bounded by it. Knowledge gathering
+        stops once `1 - answer_time_share` of the budget is used, cancelling the calls still
+        running (and skipping missing-info expansion if needed); the answer is then generated
+        from the knowledge gathered so far.
+
+        Args:
+            query: The user question
+            timeout: Latency budget of the search in seconds
+            deadline: Absolute `time.monotonic()` deadline, the earlier of both applies
+
+        Returns:
+            The answer with images aligned and citations added
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before an answer could be generated
+        """
+        # Background narration tasks, only used in "llm" status mode
+        narrations = []
+
+        try:
+            with deadline_scope(timeout=timeout, deadline=deadline), self._tracer().span(
+                "search", user_id=self.user_id, query=query
+            ):
+                # Every call is bounded by the deadline, the outer bound also covers the steps in between
+                try:
+                    return await asyncio.wait_for(
+                        self._asearch(query=query, narrations=narrations), timeout=remaining_time()
+                    )
+                except DeadlineExceeded:
+                    raise
+                except asyncio.TimeoutError as exc:
+                    raise DeadlineExceeded("Deadline exceeded before an answer was generated") from exc
+                except Exception as exc:
+                    if is_deadline_error(exc, get_deadline()):
+                        raise DeadlineExceeded("Deadline exceeded before an answer was generated") from exc
+                    raise
+        finally:
+            # Narrations still pending once the answer is ready are stale
+            for narration in narrations:
+                narration.cancel()
+
+    def _knowledge_deadline(self) -> Optional[float]:
+        """Deadline of the knowledge gathering phase, leaving `answer_time_share` of the remaining budget."""
+        deadline = get_deadline()
+        if deadline is None:
+            return None
+
+        now = time.monotonic()
+        return now + max(0.0, deadline - now) * (1 - self.answer_time_share)
+
+    async def _agather_knowledge(self, query: str, narrations: List[asyncio.Task]) -> List[str]:
+        """Run every step before answer generation and return the deduplicated knowledge."""
+        # Extract metadata from available documents
+        self._report_status("metadata_extract", query, "extract_metadata", narrations=narrations)
+
+        metadata, metadata_index = await self.metadata_cache.aget()
+
+        # Select the most relevant document
+        chosen_file = await self.document_selection_agent.aperform_action(query=query, files_metadata=metadata)
+        self._report_status("doc_select", query, "document_selection_successful", chosen_file, narrations)
+
+        chosen_metadata = metadata_index.get(chosen_file)
+        if chosen_metadata is None:
+            raise ValueError(f"Selected document not found in metadata: {chosen_file}")
+
+        # Rewrite query for better retrieval
+        rewritten_prompts = await self.arewrite_query(query=query, chosen_metadata=chosen_metadata, num_rewrites=7)
+
+        self._report_status("query_refine", query, "query_rewrite_successful", rewritten_prompts, narrations)
+
+        with deadline_scope(deadline=self._knowledge_deadline()), span("knowledge_gathering") as gathering_span:
+            # Retrieve chunks, extract knowledge and check for missing information as one pipeline. With
+            # the sufficiency gate, sufficient knowledge ends detection early and skips the expansion
+            extracted_knowledge, missing_sections = await self.astream_knowledge(
+                query=query,
+                prompts=rewritten_prompts,
+                chosen_metadata=chosen_metadata,
+                num_chunks=5,
+                max_concurrency=8,
+                narrations=narrations,
+                sufficiency_gate=self.sufficiency_gate,
+            )
+
+            gathering_span.set_attributes(knowledge=len(extracted_knowledge), missing_sections=len(missing_sections))
+
+            missing_knowledge = []
+            if missing_sections and remaining_time() != 0:
+                try:
+                    with span("missing_info_expansion") as expansion_span:
+                        missing_knowledge = await asyncio.wait_for(
+                            self._aexpand_missing_info(
+                                extracted_knowledge, missing_sections, chosen_metadata, expansion_span
+                            ),
+                            timeout=remaining_time(),
+                        )
+                except asyncio.TimeoutError:
+                    print("Deadline reached, skipping missing information expansion")
+            elif missing_sections:
+                print("Deadline reached, skipping missing information expansion")
+
         extracted_knowledge.extend(missing_knowledge)
-        extracted_knowledge = remove_almost_duplicates(extracted_knowledge)
+        return remove_almost_duplicates(extracted_knowledge)
+
+    async def _aadd_citations(
+        self, answer: str, merged_knowledge: str, citation_map: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Add citations to (part of) an answer, returning it unchanged if citation matching fails."""
+        # Citation matching is blocking (batched embedding requests), keep it off the loop. It runs
+        # in a copy of the current context so the embedding requests keep the search deadline
+        try:
+            # Imported on first use, it pulls in NumPy
+            from arag.utils.citation_system import process_citations
+
+            # At the deadline the answer is returned without citations
+            with span("citations"):
+                answer = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self.executor.pool,
+                        functools.partial(
+                            contextvars.copy_context().run,
+                            process_citations,
+                            answer=answer,
+                            text_chunks=merged_knowledge,
+                            threshold=0.4,
+                            get_embeddings_func=self.vectordb_client.get_embeddings,
+                            get_embeddings_batch_func=self.vectordb_client.get_embeddings_batch,
+                            citation_map=citation_map,
+                        ),
+                    ),
+                    timeout=remaining_time(),
+                )
+            answer = format_references(answer).strip()
+        except Exception as e:
+            pass
+
+        return answer
+
+    async def _arank_knowledge(self, query: str, knowledge: List[str]) -> Optional[List[int]]:
+        """Indices of the knowledge blocks by decreasing similarity to the query, None for retrieval order."""
+        if self.answer_context_ranking != "embedding":
+            return None
+
+        try:
+            # Blocking batched embedding request, kept off the loop like citation matching
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self.executor.pool,
+                functools.partial(
+                    contextvars.copy_context().run, self.vectordb_client.get_embeddings_batch, [query] + knowledge
+                ),
+            )
+        except Exception as e:
+            print(f"Error ranking knowledge, keeping retrieval order: {e}")
+            return None
+
+        query_vector, block_vectors = vectors[0], vectors[1:]
+        if query_vector is None:
+            return None
+
+        # Imported on first use, it pulls in NumPy
+        from arag.utils.citation_system import rank_by_similarity
+
+        return rank_by_similarity(query_vector, block_vectors)
+
+    async def _apack_context(self, query: str, knowledge: List[str]) -> List[str]:
+        """
+        Keep the most relevant knowledge blocks that fit `answer_context_tokens`, in retrieval order.
+
+        Dropped blocks are reported in the log and on the current span.
+        """
+        if not self.answer_context_tokens or not knowledge:
+            return knowledge
+
+        with span("context_packing", blocks=len(knowledge), ranking=self.answer_context_ranking) as packing_span:
+            ranking = await self._arank_knowledge(query, knowledge)
+            # Tokens of the `<document_chunk>` tags wrapping every block in the AnswerAgent prompt
+            packed, dropped = pack_by_token_budget(knowledge, self.answer_context_tokens, ranking=ranking, overhead=12)
+
+            if dropped:
+                dropped_tokens = sum(count_tokens(knowledge[idx]) for idx in dropped)
+                print(
+                    f"Answer context over {self.answer_context_tokens} tokens, dropped {len(dropped)} of "
+                    f"{len(knowledge)} knowledge blocks ({dropped_tokens} tokens): blocks {dropped}"
+                )
+                packing_span.set_attributes(dropped=len(dropped), dropped_tokens=dropped_tokens, dropped_blocks=dropped)
+
+            return [knowledge[idx] for idx in packed]
+
+    async def _asearch(self, query: str, narrations: List[asyncio.Task]) -> str:
+        extracted_knowledge = await self._agather_knowledge(query=query, narrations=narrations)
+        extracted_knowledge = await self._apack_context(query, extracted_knowledge)
 
         merged_knowledge = "\n".join(extracted_knowledge)
 
         # Generate initial answer
-        answer = self.answer_agent.perform_action(query=query, document_chunks=extracted_knowledge)
-        self._update_status(
-            "answer_generate", self.process_agent.perform_action(query=query, action="generating_answer_successful")
-        )
+        answer = await self.answer_agent.aperform_action(query=query, document_chunks=extracted_knowledge)
+        self._report_status("answer_generate", query, "generating_answer_successful", narrations=narrations)
 
         answer = align_text_images(answer)
 
+        return await self._aadd_citations(answer, merged_knowledge)
+
+    async def _aiter_until(self, stream: AsyncIterator, deadline: Optional[float], parent_span) -> AsyncIterator:
+        """
+        Iterate an async generator within a deadline, stopping silently once it is reached.
+
+        Every step runs in its own deadline scope and under `parent_span`, since the steps of a
+        generator may be driven from different tasks (see `search_stream`).
+        """
         try:
-            answer = format_references(
-                process_citations(
-                    answer=answer, text_chunks=merged_knowledge, threshold=0.4, get_embeddings_func=_get_embeddings
-                )
-            ).strip()
-        except Exception as e:
-            pass
+            while True:
+                with deadline_scope(deadline=deadline), use_span(parent_span):
+                    try:
+                        item = await asyncio.wait_for(stream.__anext__(), timeout=remaining_time())
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        print("Deadline reached during answer generation, the answer is truncated")
+                        return
+                yield item
+        finally:
+            await stream.aclose()
+
+    async def asearch_stream(
+        self, query: str, timeout: Optional[float] = None, deadline: Optional[float] = None
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Answer a query, streaming the answer while it is generated.
 
-        return answer
\ No newline at end of file
+        Yields `("answer_token", text)` for every piece of text received from the Answer Agent,
+        and `("answer_paragraph", text)` with the final form of each paragraph (images aligned,
+        citations added) once it is complete. Citation numbering is shared by all paragraphs.
+        The same pairs are sent to the status callback. Citations are matched in the background
+        so they never hold back the token stream.
+
+        A timeout or deadline applies as in `asearch`; when it is reached during generation the
+        answer is truncated.
+
+        Args:
+            query: The user question
+            timeout: Latency budget of the search in seconds
+            deadline: Absolute `time.monotonic()` deadline, the earlier of both applies
+        """
+        deadline = resolve_deadline(timeout=timeout, deadline=deadline)
+        # Not made current, like the deadline it is only set around the awaits between yields
+        search_span = self._tracer().start_span("search", user_id=self.user_id, query=query, stream=True)
+        narrations = []
+        citation_tasks = []
+
+        async def _cite(paragraph, previous):
+            # Paragraphs are cited one after the other so the numbering follows the answer
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            with deadline_scope(deadline=deadline), use_span(search_span):
+                return await self._aadd_citations(align_text_images(paragraph), merged_knowledge, citation_map)
+
+        def _schedule(paragraph):
+            previous = citation_tasks[-1] if citation_tasks else None
+            citation_tasks.append(asyncio.ensure_future(_cite(paragraph, previous)))
+
+        try:
+            # Not held across a `yield`, the generator may be resumed from another task
+            with deadline_scope(deadline=deadline), use_span(search_span):
+                extracted_knowledge = await self._agather_knowledge(query=query, narrations=narrations)
+                extracted_knowledge = await self._apack_context(query, extracted_knowledge)
+
+            merged_knowledge = "\n".join(extracted_knowledge)
+            citation_map = {}
+            pending = ""
+
+            answer_stream = self.answer_agent.astream_action(query=query, document_chunks=extracted_knowledge)
+            # Closed with this generator, so a consumer stopping early also ends the LLM request
+            async with contextlib.aclosing(self._aiter_until(answer_stream, deadline, search_span)) as tokens:
+                async for token in tokens:
+                    self._update_status("answer_token", token)
+                    yield "answer_token", token
+
+                    completed, pending = split_completed_paragraphs(pending + token)
+                    if completed:
+                        _schedule(completed)
+
+                    # Deliver cited paragraphs that are ready, in answer order
+                    while citation_tasks and citation_tasks[0].done():
+                        paragraph = citation_tasks.pop(0).result()
+                        self._update_status("answer_paragraph", paragraph)
+                        yield "answer_paragraph", paragraph
+
+            if pending.strip():
+                _schedule(pending)
+
+            self._report_status("answer_generate", query, "generating_answer_successful", narrations=narrations)
+
+            while citation_tasks:
+                paragraph = await citation_tasks.pop(0)
+                self._update_status("answer_paragraph", paragraph)
+                yield "answer_paragraph", paragraph
+        except Exception as exc:
+            search_span.record_error(exc)
+            if is_deadline_error(exc, deadline):
+                raise DeadlineExceeded("Deadline exceeded before an answer was generated") from exc
+            raise
+        finally:
+            for task in narrations + citation_tasks:
+                task.cancel()
+            search_span.end()
+
+    def search(self, query: str, timeout: Optional[float] = None, deadline: Optional[float] = None) -> str:
+        """Blocking wrapper around `asearch`."""
+        return self._run_coroutine(self.asearch(query=query, timeout=timeout, deadline=deadline))
+
+    def search_stream(
+        self, query: str, timeout: Optional[float] = None, deadline: Optional[float] = None
+    ) -> Iterator[Tuple[str, str]]:
+        """Blocking generator wrapper around `asearch_stream`."""
+        stream = self.asearch_stream(query=query, timeout=timeout, deadline=deadline)
+
+        async def _next():
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        try:
+            while True:
+                event = self._run_coroutine(_next())
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._run_coroutine(stream.aclose())
@@ -7,3 +7,4 @@ from .knowledge_agent import KnowledgeAgent
 from .missing_info_agent import MissingInfoAgent
 from .process_agent import ProcessAgent
 from .query_rewrite_agent import QueryRewriterAgent
+from .sufficiency_agent import SufficiencyAgent
@@ -1,10 +1,14 @@
+import contextlib
 from typing import List
 
 from pydantic import BaseModel
 
+from arag.utils.rate_limit_utils import PRIORITY_HIGH
+
 from .decorators import register_action
 from .template_agent import BaseAgent
-from .utils.agent_primitives import client_message
+from .utils.agent_primitives import (aclient_message, aclient_message_stream,
+                                     client_message, client_message_stream)
 
 
 class AnswerSchema(BaseModel):
@@ -12,10 +16,23 @@ class AnswerSchema(BaseModel):
 
 
 class AnswerAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, query: str, document_chunks: List[str], conversation_summary: str = None) -> str:
         prompt = (
@@ -37,6 +54,29 @@ class AnswerAgent(BaseAgent):
         response, usage_metadata = client_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            priority=PRIORITY_HIGH,
+            model=self.model + "-thinking-exp",
+            user_message=self._message(
+                query=query, document_chunks=document_chunks, conversation_summary=conversation_summary
+            ),
+        )
+
+        return response, usage_metadata
+
+    @register_action(action_name="action-answer")
+    async def aperform_action(self, query: str, document_chunks: List[str], conversation_summary: str = None) -> str:
+        response, usage_metadata = await aclient_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            priority=PRIORITY_HIGH,
             model=self.model + "-thinking-exp",
             user_message=self._message(
                 query=query, document_chunks=document_chunks, conversation_summary=conversation_summary
@@ -44,3 +84,40 @@ class AnswerAgent(BaseAgent):
         )
 
         return response, usage_metadata
+
+    @register_action(action_name="action-answer")
+    def stream_action(self, query: str, document_chunks: List[str], conversation_summary: str = None):
+        """Stream the answer, yielding text deltas as they are generated."""
+        yield from client_message_stream(
+            system_message=self.system_prompt,
+            openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            priority=PRIORITY_HIGH,
+            model=self.model + "-thinking-exp",
+            user_message=self._message(
+                query=query, document_chunks=document_chunks, conversation_summary=conversation_summary
+            ),
+        )
+
+    @register_action(action_name="action-answer")
+    async def astream_action(self, query: str, document_chunks: List[str], conversation_summary: str = None):
+        """Async counterpart of `stream_action`."""
+        stream = aclient_message_stream(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            priority=PRIORITY_HIGH,
+            model=self.model + "-thinking-exp",
+            user_message=self._message(
+                query=query, document_chunks=document_chunks, conversation_summary=conversation_summary
+            ),
+        )
+        async with contextlib.aclosing(stream):
+            async for delta, usage_metadata in stream:
+                yield delta, usage_metadata
@@ -1,9 +1,138 @@
+import bisect
+import contextlib
 import functools
+import inspect
+import json
+import threading
 import time
-from typing import Callable, Dict
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from arag.utils.tracing_utils import span, start_span, usage_attributes
+
+# Upper bounds in seconds of the latency histogram buckets, the last one catches everything
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+_TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def _parse_usage(usage_metadata: Any) -> Dict[str, Any]:
+    """Usage as a dict, whether it was reported as a JSON string or a dict."""
+    if isinstance(usage_metadata, str):
+        try:
+            usage_metadata = json.loads(usage_metadata)
+        except ValueError:
+            return {}
+    return usage_metadata if isinstance(usage_metadata, dict) else {}
+
+
+class ActionRegistry:
+    """
+    Bounded record of agent actions with aggregated per-action statistics.
+
+    The most recent `max_entries` actions are kept in a ring buffer, and counters per action
+    (calls, cache hits, latency histogram, token totals) take constant memory however long the
+    process runs. Both are guarded by one lock, so resizing never loses a concurrent record. Responses are only
+    kept in the entries when `retain_responses` is set, since they are the bulk of the memory.
+
+    Args:
+        max_entries: Number of recent actions kept
+        retain_responses: Keep the response text of each action
+        verbose: Print the elapsed time of every action
+    """
+
+    def __init__(self, max_entries: int = 1000, retain_responses: bool = False, verbose: bool = False) -> None:
+        self.retain_responses = retain_responses
+        self.verbose = verbose
+        self._entries: deque = deque(maxlen=max_entries)
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        return self._entries.maxlen
+
+    def configure(
+        self, max_entries: Optional[int] = None, retain_responses: Optional[bool] = None, verbose: Optional[bool] = None
+    ) -> None:
+        """Resize the ring buffer (keeping the most recent entries), toggle response retention or timing logs."""
+        if retain_responses is not None:
+            self.retain_responses = retain_responses
+        if verbose is not None:
+            self.verbose = verbose
+        if max_entries is not None and max_entries != self.max_entries:
+            with self._lock:
+                self._entries = deque(self._entries, maxlen=max_entries)
+
+    def record(self, action_data: Dict[str, Any]) -> None:
+        """Store an action and add it to the statistics of its action name."""
+        usage = _parse_usage(action_data.get("token_count"))
+        if not self.retain_responses:
+            action_data = {**action_data, "response": None}
+
+        with self._lock:
+            # Under the lock, `configure` may swap the buffer for a resized copy
+            self._entries.append(action_data)
+
+            stats = self._stats.get(action_data["action"])
+            if stats is None:
+                stats = self._stats[action_data["action"]] = {
+                    "count": 0,
+                    "cache_hits": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                    "latency_histogram": [0] * len(LATENCY_BUCKETS),
+                    **{field: 0 for field in _TOKEN_FIELDS},
+                }
+
+            elapsed_time = action_data["elapsed_time"]
+            stats["count"] += 1
+            stats["cache_hits"] += bool(usage.get("cache_hit"))
+            stats["total_time"] += elapsed_time
+            stats["max_time"] = max(stats["max_time"], elapsed_time)
+            stats["latency_histogram"][bisect.bisect_left(LATENCY_BUCKETS, elapsed_time)] += 1
+            for field in _TOKEN_FIELDS:
+                stats[field] += usage.get(field) or 0
+
+    def entries(self) -> list:
+        """The retained actions, oldest first."""
+        with self._lock:
+            return list(self._entries)
+
+    def get_actions_for_query(self, query: str) -> list:
+        return [entry for entry in self.entries() if entry["query"] == query]
+
+    def get_all_actions(self) -> Dict[str, list]:
+        """The retained actions grouped by query."""
+        actions: Dict[str, list] = {}
+        for entry in self.entries():
+            actions.setdefault(entry["query"], []).append(entry)
+        return actions
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregated statistics per action name, since the last `clear`.
+
+        Returns:
+            For every action: count, cache_hits, mean_time, max_time, token totals and a
+            `latency_histogram` mapping each bucket upper bound to its number of calls
+        """
+        with self._lock:
+            snapshot = {action: dict(stats) for action, stats in self._stats.items()}
+
+        for stats in snapshot.values():
+            stats["mean_time"] = stats["total_time"] / stats["count"]
+            stats["latency_histogram"] = dict(zip(LATENCY_BUCKETS, stats["latency_histogram"]))
+        return snapshot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
 
 # Global registry to store all action data
-action_registry = {}
+action_registry = ActionRegistry()
 
 
 def register_action(action_name: str):
@@ -14,22 +143,23 @@ def register_action(action_name: str):
         action_name: The name of the action being performed (e.g., "query_rewrite")
 
     Returns:
-        Decorated function that logs action metadata
+        Decorated function that logs action metadata and runs in a tracing span. The first
+        argument after `self` (positional or keyword) is recorded as the query. Coroutine
+        functions are wrapped with an async wrapper so `aperform_action` methods are recorded
+        too. Streaming actions are generators yielding `(text_delta, usage)` pairs; the
+        wrapper yields the text deltas and records the full response at the end.
     """
 
     def decorator(func: Callable):
-        @functools.wraps(func)
-        def wrapper(self, query: str, *args, **kwargs):
-            # Get start time
-            start_time = time.time()
+        query_param = list(inspect.signature(func).parameters)[1]
 
-            # Extract the original function name and class name
-            class_name = self.__class__.__name__
-            function_name = func.__name__
+        def _query(args: tuple, kwargs: dict):
+            return args[0] if args else kwargs.get(query_param)
 
-            # Execute the function and capture the response
-            response, usage_metadata = func(self, query, *args, **kwargs)
+        def _start_span(self):
+            return start_span(action_name, agent=self.__class__.__name__, function=func.__name__)
 
+        def _record(self, query: str, start_time: float, response, usage_metadata, action_span) -> None:
             # Calculate elapsed time
             elapsed_time = time.time() - start_time
 
@@ -41,22 +171,99 @@ def register_action(action_name: str):
             # Create action metadata
             action_data = {
                 "timestamp": time.time(),
+                "query": query,
                 "elapsed_time": elapsed_time,
                 "action": action_name,
-                "class": class_name,
-                "function": function_name,
+                "class": self.__class__.__name__,
+                "function": func.__name__,
                 "message": message,
                 "response": response,
                 "token_count": usage_metadata,
             }
 
-            # Store in registry with query as key
-            if query not in action_registry:
-                action_registry[query] = []
-            action_registry[query].append(action_data)
+            action_registry.record(action_data)
+            action_span.set_attributes(**usage_attributes(usage_metadata))
 
             # Print brief log (optional)
-            print(f"[{action_name}] - Time: {elapsed_time:.2f}s")
+            if action_registry.verbose:
+                print(f"[{action_name}] - Time: {elapsed_time:.2f}s")
+
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def async_stream_wrapper(self, *args, **kwargs):
+                start_time = time.time()
+                # Not made current, the generator may be resumed from other tasks
+                action_span = _start_span(self)
+
+                # Stream text deltas through, record the full response once the usage arrives
+                parts, usage_metadata = [], None
+                try:
+                    # Closes the action's generator, and the request below it, when the consumer stops early
+                    async with contextlib.aclosing(func(self, *args, **kwargs)) as stream:
+                        async for delta, usage in stream:
+                            if usage is not None:
+                                usage_metadata = usage
+                            if delta is not None:
+                                parts.append(delta)
+                                yield delta
+                    _record(self, _query(args, kwargs), start_time, "".join(parts), usage_metadata, action_span)
+                except BaseException as exc:
+                    action_span.record_error(exc)
+                    raise
+                finally:
+                    action_span.end()
+
+            return async_stream_wrapper
+
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def stream_wrapper(self, *args, **kwargs):
+                start_time = time.time()
+                action_span = _start_span(self)
+
+                parts, usage_metadata = [], None
+                try:
+                    for delta, usage in func(self, *args, **kwargs):
+                        if usage is not None:
+                            usage_metadata = usage
+                        if delta is not None:
+                            parts.append(delta)
+                            yield delta
+                    _record(self, _query(args, kwargs), start_time, "".join(parts), usage_metadata, action_span)
+                except BaseException as exc:
+                    action_span.record_error(exc)
+                    raise
+                finally:
+                    action_span.end()
+
+            return stream_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                start_time = time.time()
+
+                with span(action_name, agent=self.__class__.__name__, function=func.__name__) as action_span:
+                    # Await the coroutine and capture the response
+                    response, usage_metadata = await func(self, *args, **kwargs)
+                    _record(self, _query(args, kwargs), start_time, response, usage_metadata, action_span)
+
+                return response
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            # Get start time
+            start_time = time.time()
+
+            with span(action_name, agent=self.__class__.__name__, function=func.__name__) as action_span:
+                # Execute the function and capture the response
+                response, usage_metadata = func(self, *args, **kwargs)
+                _record(self, _query(args, kwargs), start_time, response, usage_metadata, action_span)
 
             return response
 
@@ -67,13 +274,25 @@ def register_action(action_name: str):
 
 # Utility functions to work with the registry
 def get_actions_for_query(query: str) -> list:
-    """Get all actions performed for a specific query."""
-    return action_registry.get(query, [])
+    """Get the retained actions performed for a specific query."""
+    return action_registry.get_actions_for_query(query)
 
 
 def get_all_actions() -> Dict[str, list]:
-    """Get all actions in the registry."""
-    return action_registry
+    """Get the retained actions grouped by query."""
+    return action_registry.get_all_actions()
+
+
+def get_action_stats() -> Dict[str, Dict[str, Any]]:
+    """Get the aggregated statistics of every action."""
+    return action_registry.stats()
+
+
+def configure_registry(
+    max_entries: Optional[int] = None, retain_responses: Optional[bool] = None, verbose: Optional[bool] = None
+) -> None:
+    """Resize the registry ring buffer, toggle response retention or the timing log of every action."""
+    action_registry.configure(max_entries=max_entries, retain_responses=retain_responses, verbose=verbose)
 
 
 def clear_registry():
@@ -82,8 +301,22 @@ def clear_registry():
 
 
 def export_registry_to_json(filename: str):
-    """Export the registry to a JSON file."""
-    import json
+    """Export the retained actions, grouped by query, to a JSON file."""
+    actions = {
+        query: [{key: value for key, value in entry.items() if key != "query"} for entry in entries]
+        for query, entries in action_registry.get_all_actions().items()
+    }
+
+    with open(filename, "w") as f:
+        json.dump(actions, f, indent=2)
+
+
+def export_stats_to_json(filename: str):
+    """Export the aggregated statistics of every action to a JSON file."""
+    stats = {
+        action: {**values, "latency_histogram": {str(k): v for k, v in values["latency_histogram"].items()}}
+        for action, values in action_registry.stats().items()
+    }
 
     with open(filename, "w") as f:
-        json.dump(action_registry, f, indent=2)
+        json.dump(stats, f, indent=2)
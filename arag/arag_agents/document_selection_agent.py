@@ -4,7 +4,7 @@ from pydantic import BaseModel
 
 from .decorators import register_action
 from .template_agent import BaseAgent
-from .utils.agent_primitives import client_sturctured_message
+from .utils.agent_primitives import aclient_sturctured_message, client_sturctured_message
 
 
 class DocumentSelectionSchema(BaseModel):
@@ -12,10 +12,23 @@ class DocumentSelectionSchema(BaseModel):
 
 
 class DocumentSelectionAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, query: str, files_metadata: List[dict]) -> str:
         prompt = f"<query>{query}</query>\n<documents>\n"
@@ -31,6 +44,27 @@ class DocumentSelectionAgent(BaseAgent):
         response, usage_metadata = client_sturctured_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._message(query=query, files_metadata=files_metadata),
+            structured_output_schema=DocumentSelectionSchema,
+            temperature=0.0,
+        )
+
+        return response.filename, usage_metadata
+
+    @register_action(action_name="action-document-selection")
+    async def aperform_action(self, query: str, files_metadata: List[dict]) -> List[str]:
+        response, usage_metadata = await aclient_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
             model=self.model,
             user_message=self._message(query=query, files_metadata=files_metadata),
             structured_output_schema=DocumentSelectionSchema,
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 
+from .decorators import register_action
 from .template_agent import BaseAgent
 from .utils.agent_primitives import client_sturctured_message
 
@@ -9,10 +10,23 @@ class ImageReferencerSchema(BaseModel):
 
 
 class ImageReferencerAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, answer: str, section: str) -> str:
         prompt = f"<answer>{answer}</answer>\n"
@@ -20,14 +34,19 @@ class ImageReferencerAgent(BaseAgent):
 
         return prompt
 
+    @register_action(action_name="action-image-reference")
     def perform_action(self, answer: str, section: str) -> str:
-        response, _ = client_sturctured_message(
+        response, usage = client_sturctured_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
             model=self.model,
             user_message=self._message(answer=answer, section=section),
             structured_output_schema=ImageReferencerSchema,
             temperature=0.0,
         )
 
-        return response.enhanced_response
+        return response.enhanced_response, usage
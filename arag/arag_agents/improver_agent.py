@@ -10,10 +10,23 @@ class ImproverSchema(BaseModel):
 
 
 class ImproverAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, query: str, knowledge_chunks: str, original_answer: str, feedback: str) -> str:
         prompt = f"<query>{query}</query>\n"
@@ -28,6 +41,10 @@ class ImproverAgent(BaseAgent):
         response, usage_metadata = client_sturctured_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
             model=self.model,
             user_message=self._message(
                 query=query, original_answer=original_answer, knowledge_chunks=knowledge_chunks, feedback=feedback
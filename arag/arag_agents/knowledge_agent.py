@@ -1,19 +1,48 @@
+import re
+from typing import List, Optional
+
 from pydantic import BaseModel
 
+from arag.prompts.knowledge import KNOWLEDGE_COMPRESS_INSTRUCTION
+
 from .decorators import register_action
 from .template_agent import BaseAgent
-from .utils.agent_primitives import client_sturctured_message
+from .utils.agent_primitives import aclient_sturctured_message, client_sturctured_message
 
 
 class KnowledgeSchema(BaseModel):
     knowledge: str
 
 
+class KnowledgeEntry(BaseModel):
+    chunk_id: str
+    knowledge: str
+
+
+class KnowledgeBatchSchema(BaseModel):
+    entries: List[KnowledgeEntry]
+
+
 class KnowledgeAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    prompt_variants = {"compress": KNOWLEDGE_COMPRESS_INSTRUCTION}
+
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, query: str, document_chunk: str) -> str:
         prompt = f"<user_query>{query}</user_query>\n"
@@ -21,14 +50,111 @@ class KnowledgeAgent(BaseAgent):
 
         return prompt
 
+    def _batch_message(self, query: str, document_chunks: List[str]) -> str:
+        prompt = f"<user_query>{query}</user_query>\n<document_chunks>\n"
+
+        for chunk_id, document_chunk in enumerate(document_chunks):
+            prompt += f'<document_chunk id="{chunk_id}">{document_chunk}</document_chunk>\n'
+
+        prompt += "</document_chunks>"
+
+        return prompt
+
+    @staticmethod
+    def _batch_knowledge(response: KnowledgeBatchSchema, num_chunks: int) -> List[Optional[str]]:
+        """
+        Knowledge per chunk of a batched response, None for chunks it does not cover.
+
+        The prompt asks for one entry per chunk (empty when nothing is relevant), so chunks left out,
+        entries with an unreadable ID and duplicated IDs come from a truncated or malformed response.
+        """
+        knowledge = {}
+        duplicates = set()
+        for entry in response.entries:
+            # Tolerate decorated IDs such as "chunk 3"
+            match = re.fullmatch(r"\D*(\d+)\D*", entry.chunk_id)
+            if match is None:
+                continue
+            chunk_id = int(match.group(1))
+            if chunk_id in knowledge:
+                duplicates.add(chunk_id)
+            knowledge[chunk_id] = entry.knowledge
+
+        return [None if idx in duplicates else knowledge.get(idx) for idx in range(num_chunks)]
+
     @register_action(action_name="action-knowledge")
-    def perform_action(self, query: str, document_chunk: str) -> str:
+    def perform_action(self, query: str, document_chunk: str, variant: Optional[str] = None) -> str:
+        """
+        Extract the knowledge relevant to the query from a chunk.
+
+        Args:
+            variant: Prompt variant for this call only, e.g. "compress" for oversized chunks
+        """
         response, usage_metadata = client_sturctured_message(
-            system_message=self.system_prompt,
+            system_message=self._system_prompt(variant),
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
             model=self.model,
             user_message=self._message(query=query, document_chunk=document_chunk),
             structured_output_schema=KnowledgeSchema,
         )
 
         return response.knowledge, usage_metadata
+
+    @register_action(action_name="action-knowledge")
+    async def aperform_action(self, query: str, document_chunk: str, variant: Optional[str] = None) -> str:
+        """Async counterpart of `perform_action`."""
+        response, usage_metadata = await aclient_sturctured_message(
+            system_message=self._system_prompt(variant),
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._message(query=query, document_chunk=document_chunk),
+            structured_output_schema=KnowledgeSchema,
+        )
+
+        return response.knowledge, usage_metadata
+
+    @register_action(action_name="action-knowledge-batch")
+    def perform_batch_action(self, query: str, document_chunks: List[str]) -> List[Optional[str]]:
+        """
+        Extract knowledge from several chunks in one call, returning one entry per chunk in order.
+
+        Entries are None for the chunks the response does not cover, see `_batch_knowledge`.
+        """
+        response, usage_metadata = client_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._batch_message(query=query, document_chunks=document_chunks),
+            structured_output_schema=KnowledgeBatchSchema,
+        )
+
+        return self._batch_knowledge(response, len(document_chunks)), usage_metadata
+
+    @register_action(action_name="action-knowledge-batch")
+    async def aperform_batch_action(self, query: str, document_chunks: List[str]) -> List[Optional[str]]:
+        """Async counterpart of `perform_batch_action`."""
+        response, usage_metadata = await aclient_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._batch_message(query=query, document_chunks=document_chunks),
+            structured_output_schema=KnowledgeBatchSchema,
+        )
+
+        return self._batch_knowledge(response, len(document_chunks)), usage_metadata
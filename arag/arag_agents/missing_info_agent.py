@@ -2,8 +2,9 @@ from typing import List
 
 from pydantic import BaseModel
 
+from .decorators import register_action
 from .template_agent import BaseAgent
-from .utils.agent_primitives import client_sturctured_message
+from .utils.agent_primitives import aclient_sturctured_message, client_sturctured_message
 
 
 class MissingInfoSubSchema(BaseModel):
@@ -17,10 +18,23 @@ class MissingInfoSchema(BaseModel):
 
 
 class MissingInfoAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, text_chunk: str, table_of_contents: str, file_summary: str) -> str:
         prompt = f"<text_chunk>{text_chunk}</text_chunk>\n"
@@ -29,11 +43,34 @@ class MissingInfoAgent(BaseAgent):
 
         return prompt
 
+    @register_action(action_name="action-missing-info")
     def perform_action(self, text_chunk: str, table_of_contents: str, file_summary: str) -> List[str]:
-
-        response, _ = client_sturctured_message(
+        response, usage = client_sturctured_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._message(
+                text_chunk=text_chunk, table_of_contents=table_of_contents, file_summary=file_summary
+            ),
+            structured_output_schema=MissingInfoSchema,
+            temperature=0.0,
+        )
+
+        return response.missing_information, usage
+
+    @register_action(action_name="action-missing-info")
+    async def aperform_action(self, text_chunk: str, table_of_contents: str, file_summary: str) -> List[str]:
+        response, usage = await aclient_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
             model=self.model,
             user_message=self._message(
                 text_chunk=text_chunk, table_of_contents=table_of_contents, file_summary=file_summary
@@ -42,4 +79,4 @@ class MissingInfoAgent(BaseAgent):
             temperature=0.0,
         )
 
-        return response.missing_information
+        return response.missing_information, usage
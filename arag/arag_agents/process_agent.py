@@ -2,8 +2,11 @@ from typing import Optional
 
 from pydantic import BaseModel
 
+from arag.utils.rate_limit_utils import PRIORITY_LOW
+
+from .decorators import register_action
 from .template_agent import BaseAgent
-from .utils.agent_primitives import client_sturctured_message
+from .utils.agent_primitives import aclient_sturctured_message, client_sturctured_message
 
 
 class ProcessSchema(BaseModel):
@@ -11,10 +14,23 @@ class ProcessSchema(BaseModel):
 
 
 class ProcessAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(self, query: str, action: str, outcome: Optional[str] = None) -> str:
         prompt = ""
@@ -27,13 +43,36 @@ class ProcessAgent(BaseAgent):
 
         return prompt.strip()
 
+    @register_action(action_name="action-process")
     def perform_action(self, query: str, action: str, outcome: Optional[str] = None) -> str:
-        response, _ = client_sturctured_message(
+        response, usage = client_sturctured_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            priority=PRIORITY_LOW,
+            model=self.model,
+            user_message=self._message(query=query, action=action, outcome=outcome),
+            structured_output_schema=ProcessSchema,
+        )
+
+        return response.narration, usage
+
+    @register_action(action_name="action-process")
+    async def aperform_action(self, query: str, action: str, outcome: Optional[str] = None) -> str:
+        response, usage = await aclient_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            priority=PRIORITY_LOW,
             model=self.model,
             user_message=self._message(query=query, action=action, outcome=outcome),
             structured_output_schema=ProcessSchema,
         )
 
-        return response.narration
+        return response.narration, usage
@@ -1,10 +1,10 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
 from .decorators import register_action
 from .template_agent import BaseAgent
-from .utils.agent_primitives import client_sturctured_message
+from .utils.agent_primitives import aclient_sturctured_message, client_sturctured_message
 
 
 class QueryRewriterSchema(BaseModel):
@@ -12,10 +12,23 @@ class QueryRewriterSchema(BaseModel):
 
 
 class QueryRewriterAgent(BaseAgent):
-    def __init__(self, system_prompt: str, openai_client, model: str = "gemini-2.0-flash") -> None:
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
         self.system_prompt = system_prompt
         self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
         self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
 
     def _message(
         self,
@@ -24,9 +37,13 @@ class QueryRewriterAgent(BaseAgent):
         summary: str,
         previous_queries: List[str] = None,
         conversation_summary: str = None,
+        num_queries: Optional[int] = None,
     ) -> str:
         prompt = f"<user_query>{query}</user_query>\n<table_of_contents>{table_of_contents}</table_of_contents>\n<summary>{summary}</summary>"
 
+        if num_queries is not None:
+            prompt += f"\n<num_queries>{num_queries}</num_queries>"
+
         if previous_queries is not None:
             for previous_query in previous_queries:
                 prompt += f"\n<previous_queries>{str(previous_query)}</previous_queries>"
@@ -44,10 +61,50 @@ class QueryRewriterAgent(BaseAgent):
         summary: str,
         previous_queries: List[str] = None,
         conversation_summary: str = None,
+        num_queries: Optional[int] = None,
     ) -> List[str]:
         response, usage_metadata = client_sturctured_message(
             system_message=self.system_prompt,
             openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._message(
+                query=query,
+                table_of_contents=table_of_contents,
+                summary=summary,
+                previous_queries=previous_queries,
+                conversation_summary=conversation_summary,
+                num_queries=num_queries,
+            ),
+            structured_output_schema=QueryRewriterSchema,
+            temperature=0.0,
+        )
+
+        rewritten_queries = response.rewritten_queries
+        rewritten_queries.append(query)
+
+        return rewritten_queries, usage_metadata
+
+    @register_action(action_name="action-rewrite")
+    async def aperform_action(
+        self,
+        query: str,
+        table_of_contents: str,
+        summary: str,
+        previous_queries: List[str] = None,
+        conversation_summary: str = None,
+        num_queries: Optional[int] = None,
+    ) -> List[str]:
+        response, usage_metadata = await aclient_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
             model=self.model,
             user_message=self._message(
                 query=query,
@@ -55,6 +112,7 @@ class QueryRewriterAgent(BaseAgent):
                 summary=summary,
                 previous_queries=previous_queries,
                 conversation_summary=conversation_summary,
+                num_queries=num_queries,
             ),
             structured_output_schema=QueryRewriterSchema,
             temperature=0.0,
@@ -0,0 +1,93 @@
+from typing import Any, List, Tuple
+
+from pydantic import BaseModel
+
+from .decorators import register_action
+from .template_agent import BaseAgent
+from .utils.agent_primitives import aclient_sturctured_message, client_sturctured_message
+
+
+class SufficiencySchema(BaseModel):
+    is_sufficient: bool
+    needed_references: List[int]
+
+
+class SufficiencyAgent(BaseAgent):
+    def __init__(
+        self,
+        system_prompt: str,
+        openai_client,
+        model: str = "gemini-2.0-flash",
+        async_openai_client=None,
+        cache=None,
+        retry_policy=None,
+        rate_limiter=None,
+    ) -> None:
+        self.system_prompt = system_prompt
+        self.openai_client = openai_client
+        self.async_openai_client = async_openai_client
+        self.model = model
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+
+    def _message(self, query: str, knowledge: List[str], missing_sections: List[Any]) -> str:
+        prompt = f"<user_query>{query}</user_query>\n<knowledge>\n"
+
+        for block in knowledge:
+            prompt += f"<knowledge_block>{block}</knowledge_block>\n"
+
+        prompt += "</knowledge>\n<missing_references>\n"
+
+        for idx, section in enumerate(missing_sections):
+            prompt += (
+                f'<reference number="{idx}">\n<reference_context>{section.reference_context}</reference_context>\n'
+                f"<what_im_looking_for>{section.what_im_looking_for}</what_im_looking_for>\n"
+                f"<section>{section.section}</section>\n</reference>\n"
+            )
+
+        prompt += "</missing_references>"
+        return prompt
+
+    @staticmethod
+    def _needed(response: SufficiencySchema, num_sections: int) -> List[int]:
+        """Valid reference numbers of the response, without duplicates, in the order given."""
+        if response.is_sufficient:
+            return []
+        return list(dict.fromkeys(idx for idx in response.needed_references if 0 <= idx < num_sections))
+
+    @register_action(action_name="action-sufficiency")
+    def perform_action(self, query: str, knowledge: List[str], missing_sections: List[Any]) -> Tuple[bool, List[int]]:
+        response, usage_metadata = client_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._message(query=query, knowledge=knowledge, missing_sections=missing_sections),
+            structured_output_schema=SufficiencySchema,
+            temperature=0.0,
+        )
+
+        return (response.is_sufficient, self._needed(response, len(missing_sections))), usage_metadata
+
+    @register_action(action_name="action-sufficiency")
+    async def aperform_action(
+        self, query: str, knowledge: List[str], missing_sections: List[Any]
+    ) -> Tuple[bool, List[int]]:
+        response, usage_metadata = await aclient_sturctured_message(
+            system_message=self.system_prompt,
+            openai_client=self.async_openai_client,
+            cache=self.cache,
+            cache_namespace=self.__class__.__name__,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            model=self.model,
+            user_message=self._message(query=query, knowledge=knowledge, missing_sections=missing_sections),
+            structured_output_schema=SufficiencySchema,
+            temperature=0.0,
+        )
+
+        return (response.is_sufficient, self._needed(response, len(missing_sections))), usage_metadata
@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
+from typing import Dict, Optional
 
 
 class BaseAgent(ABC):
+    # Named instructions appended to the system prompt for a single call, e.g. {"compress": "..."}
+    prompt_variants: Dict[str, str] = {}
+
     @abstractmethod
     def _message(self):
         pass
@@ -9,3 +13,18 @@ class BaseAgent(ABC):
     @abstractmethod
     def perform_action(self):
         pass
+
+    def _system_prompt(self, variant: Optional[str] = None) -> str:
+        """
+        System prompt of one call.
+
+        Variants are resolved per call, so concurrent calls never see each other's prompt and
+        the shared `system_prompt` is never mutated.
+
+        Raises:
+            KeyError: If the agent has no such variant
+        """
+        if variant is None:
+            return self.system_prompt
+
+        return f"{self.system_prompt}\n\n{self.prompt_variants[variant]}"
@@ -1,17 +1,388 @@
-from typing import Optional
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+from typing import AsyncIterator, Callable, Iterator, Optional, Tuple
 
+from arag.utils.deadline_utils import (DeadlineExceeded, check_deadline,
+                                       get_deadline)
+from arag.utils.rate_limit_utils import PRIORITY_NORMAL, RateLimiter
+from arag.utils.retry_utils import RetryPolicy, is_deadline_error
+from arag.utils.token_utils import count_tokens
+from arag.utils.tracing_utils import (get_tracer, span, start_span,
+                                      usage_attributes)
 
-def client_message(
-    user_message: str, openai_client, model: str, system_message: Optional[str] = None, temperature: float = 0.6
+# Usage reported for responses served from the cache, no tokens were spent on them
+_CACHE_HIT_USAGE = json.dumps({"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cache_hit": True})
+
+
+def _cache_key(
+    namespace: Optional[str], model: str, messages: list, temperature: float, structured_output_schema=None
 ) -> str:
+    """Hash everything that determines a response: agent, model, prompt, output schema and temperature."""
+    schema = None
+    if structured_output_schema is not None:
+        schema = [structured_output_schema.__name__, structured_output_schema.model_json_schema()]
+
+    payload = json.dumps(
+        {"namespace": namespace, "model": model, "messages": messages, "temperature": temperature, "schema": schema},
+        sort_keys=True,
+    )
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Process-wide default for calls made without a `rate_limiter`, see `set_rate_limiter`
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def set_rate_limiter(rate_limiter: Optional[RateLimiter]) -> None:
+    """
+    Install the default limiter of the process, used by client calls that are not given one.
+
+    Meant for application setup; to limit the calls of a single `ARag`, pass it a `rate_limiter`.
+    """
+    global _rate_limiter
+    _rate_limiter = rate_limiter
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    return _rate_limiter
+
+
+@functools.lru_cache(maxsize=64)
+def _count_system_tokens(system_message: str) -> int:
+    # System prompts are long and identical across calls of an agent
+    return count_tokens(system_message)
+
+
+def _estimate_tokens(messages: list) -> int:
+    return sum(
+        _count_system_tokens(m["content"]) if m["role"] == "system" else count_tokens(m["content"]) for m in messages
+    )
+
+
+def _reserve(
+    messages: list, priority: int, rate_limiter: Optional[RateLimiter]
+) -> Tuple[Optional[RateLimiter], int]:
+    """Wait for the limiter (the process default if None), returning it with the number of tokens reserved."""
+    limiter = rate_limiter if rate_limiter is not None else _rate_limiter
+    if limiter is None:
+        return None, 0
+
+    tokens = _estimate_tokens(messages) if limiter.limits_tokens else 0
+    limiter.acquire(tokens=tokens, priority=priority, deadline=get_deadline())
+    return limiter, tokens
+
+
+async def _areserve(
+    messages: list, priority: int, rate_limiter: Optional[RateLimiter]
+) -> Tuple[Optional[RateLimiter], int]:
+    """Async counterpart of `_reserve`."""
+    limiter = rate_limiter if rate_limiter is not None else _rate_limiter
+    if limiter is None:
+        return None, 0
+
+    tokens = _estimate_tokens(messages) if limiter.limits_tokens else 0
+    await limiter.aacquire(tokens=tokens, priority=priority, deadline=get_deadline())
+    return limiter, tokens
+
+
+def _reconcile(limiter: Optional[RateLimiter], reserved_tokens: int, usage) -> None:
+    if limiter is not None and usage is not None:
+        limiter.reconcile(reserved_tokens, usage.total_tokens)
+
+
+def _refund(limiter: Optional[RateLimiter], reserved_tokens: int) -> None:
+    """Give back the tokens reserved for a request that failed before reporting its usage."""
+    if limiter is not None:
+        limiter.reconcile(reserved_tokens, 0)
+
+
+async def _acache_get(cache, key: str):
+    """Read the cache from async code, through `aget` when the cache has one (e.g. off-loop disk I/O)."""
+    aget = getattr(cache, "aget", None)
+    return await aget(key) if aget is not None else cache.get(key)
+
+
+async def _acache_set(cache, key: str, value: str) -> None:
+    aset = getattr(cache, "aset", None)
+    if aset is not None:
+        await aset(key, value)
+    else:
+        cache.set(key, value)
+
+
+def _request_options() -> dict:
+    """Per-request client options; the timeout is cut to what is left of the current deadline."""
+    remaining = check_deadline()
+    return {} if remaining is None else {"timeout": remaining}
+
+
+def _with_retry(retry_policy: Optional[RetryPolicy], request, hedge: bool = True):
+    """Send a request with the retry policy, reporting a timeout past the deadline as `DeadlineExceeded`."""
+    deadline = get_deadline()
+    try:
+        if retry_policy is None:
+            return request()
+        return retry_policy.call(request, deadline=deadline, hedge=hedge)
+    except Exception as exc:
+        if is_deadline_error(exc, deadline):
+            raise DeadlineExceeded("Deadline exceeded during the LLM request") from exc
+        raise
+
+
+async def _awith_retry(retry_policy: Optional[RetryPolicy], request, hedge: bool = True):
+    """Async counterpart of `_with_retry`."""
+    deadline = get_deadline()
+    try:
+        if retry_policy is None:
+            return await request()
+        return await retry_policy.acall(request, deadline=deadline, hedge=hedge)
+    except Exception as exc:
+        if is_deadline_error(exc, deadline):
+            raise DeadlineExceeded("Deadline exceeded during the LLM request") from exc
+        raise
+
+
+def _traced(span_name: str):
+    """
+    Run a client call in a tracing span recording the model, agent, prompt size, cache hit and usage.
+
+    Streaming calls get a span that is not made current, since the generator may be resumed
+    from other tasks; their usage is taken from the final `(None, usage)` pair.
+    """
+
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+
+        def _attributes(args: tuple, kwargs: dict) -> dict:
+            arguments = signature.bind(*args, **kwargs).arguments
+            attributes = {
+                "model": arguments.get("model"),
+                "agent": arguments.get("cache_namespace") or "",
+                "prompt_chars": len(arguments.get("user_message") or "") + len(arguments.get("system_message") or ""),
+            }
+            if arguments.get("structured_output_schema") is not None:
+                attributes["schema"] = arguments["structured_output_schema"].__name__
+            return attributes
+
+        def _finish(call_span, usage) -> None:
+            call_span.set_attributes(cache_hit=False)
+            call_span.set_attributes(**usage_attributes(usage))
+
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def async_stream_wrapper(*args, **kwargs):
+                # `aclosing`: unlike `yield from`, `async for` leaves the inner generator open when closed early
+                if not get_tracer().enabled:
+                    async with contextlib.aclosing(func(*args, **kwargs)) as stream:
+                        async for item in stream:
+                            yield item
+                    return
+
+                call_span = start_span(span_name, stream=True, **_attributes(args, kwargs))
+                try:
+                    async with contextlib.aclosing(func(*args, **kwargs)) as stream:
+                        async for delta, usage in stream:
+                            if usage is not None:
+                                _finish(call_span, usage)
+                            yield delta, usage
+                except BaseException as exc:
+                    call_span.record_error(exc)
+                    raise
+                finally:
+                    call_span.end()
+
+            return async_stream_wrapper
+
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def stream_wrapper(*args, **kwargs):
+                if not get_tracer().enabled:
+                    yield from func(*args, **kwargs)
+                    return
+
+                call_span = start_span(span_name, stream=True, **_attributes(args, kwargs))
+                try:
+                    for delta, usage in func(*args, **kwargs):
+                        if usage is not None:
+                            _finish(call_span, usage)
+                        yield delta, usage
+                except BaseException as exc:
+                    call_span.record_error(exc)
+                    raise
+                finally:
+                    call_span.end()
+
+            return stream_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not get_tracer().enabled:
+                    return await func(*args, **kwargs)
+
+                with span(span_name, **_attributes(args, kwargs)) as call_span:
+                    response, usage = await func(*args, **kwargs)
+                    _finish(call_span, usage)
+                return response, usage
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not get_tracer().enabled:
+                return func(*args, **kwargs)
+
+            with span(span_name, **_attributes(args, kwargs)) as call_span:
+                response, usage = func(*args, **kwargs)
+                _finish(call_span, usage)
+            return response, usage
+
+        return wrapper
+
+    return decorator
+
+
+def _build_messages(user_message: str, system_message: Optional[str] = None) -> list:
     messages = [{"role": "system", "content": system_message}] if system_message else []
     messages.append({"role": "user", "content": user_message})
 
-    response = openai_client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+    return messages
+
+
+@_traced("llm.chat")
+def client_message(
+    user_message: str,
+    openai_client,
+    model: str,
+    system_message: Optional[str] = None,
+    temperature: float = 0.6,
+    cache=None,
+    cache_namespace: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> str:
+    """
+    Send a chat completion request and return the text response with its usage.
+
+    Args:
+        cache: Optional response cache (e.g. `LRUCache` or `SQLiteCache` from `arag.utils.cache_utils`)
+        cache_namespace: Name separating cache entries of different agents
+        priority: Priority of the request in the rate limiter queue
+        retry_policy: Optional `RetryPolicy` retrying transient errors and hedging slow calls
+        rate_limiter: Optional `RateLimiter` the request waits for (None = the process default,
+            see `set_rate_limiter`)
+
+    Inside a `deadline_scope` (see `arag.utils.deadline_utils`) the request timeout, retries and
+    rate limiter waits are bounded by the deadline, and `DeadlineExceeded` is raised once it passed.
+    """
+    messages = _build_messages(user_message=user_message, system_message=system_message)
+
+    if cache is not None:
+        key = _cache_key(cache_namespace, model, messages, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, _CACHE_HIT_USAGE
+
+    def _request():
+        limiter, reserved_tokens = _reserve(messages, priority, rate_limiter)
+        try:
+            response = openai_client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, **_request_options()
+            )
+        except BaseException:
+            _refund(limiter, reserved_tokens)
+            raise
+        _reconcile(limiter, reserved_tokens, response.usage)
+        return response
+
+    response = _with_retry(retry_policy, _request)
+    content = response.choices[0].message.content
+
+    if cache is not None and content is not None:
+        cache.set(key, content)
+
+    return content, response.usage.json()
+
+
+@_traced("llm.chat")
+def client_message_stream(
+    user_message: str,
+    openai_client,
+    model: str,
+    system_message: Optional[str] = None,
+    temperature: float = 0.6,
+    cache=None,
+    cache_namespace: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    """
+    Stream a chat completion as it is generated.
+
+    Yields `(text_delta, None)` for every received piece of text and a final `(None, usage)`.
+    A cached response is yielded as a single delta; the full text is cached once the stream ends.
+    """
+    messages = _build_messages(user_message=user_message, system_message=system_message)
+
+    if cache is not None:
+        key = _cache_key(cache_namespace, model, messages, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached, None
+            yield None, _CACHE_HIT_USAGE
+            return
 
-    return response.choices[0].message.content, response.usage.json()
+    def _open():
+        # Every attempt is counted by the limiter, like the requests of the other client calls
+        limiter, reserved_tokens = _reserve(messages, priority, rate_limiter)
+        try:
+            stream = openai_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                **_request_options(),
+            )
+        except BaseException:
+            _refund(limiter, reserved_tokens)
+            raise
+        return stream, limiter, reserved_tokens
 
+    # Only opening the stream is retried, a stream cannot be hedged or resumed once tokens were yielded
+    stream, limiter, reserved_tokens = _with_retry(retry_policy, _open, hedge=False)
 
+    parts = []
+    usage = None
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                _reconcile(limiter, reserved_tokens, chunk.usage)
+                usage = chunk.usage.json()
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1], None
+    finally:
+        # Releases the connection when the consumer stops early
+        if hasattr(stream, "close"):
+            stream.close()
+
+    if cache is not None and parts:
+        cache.set(key, "".join(parts))
+
+    yield None, usage
+
+
+@_traced("llm.chat")
 def client_sturctured_message(
     user_message: str,
     openai_client,
@@ -19,12 +390,201 @@ def client_sturctured_message(
     structured_output_schema,
     system_message: Optional[str] = None,
     temperature: float = 0.6,
+    cache=None,
+    cache_namespace: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
 ) -> str:
-    messages = [{"role": "system", "content": system_message}] if system_message else []
-    messages.append({"role": "user", "content": user_message})
+    """
+    Send a structured output request and return the parsed pydantic object with its usage.
 
-    response = openai_client.beta.chat.completions.parse(
-        model=model, messages=messages, response_format=structured_output_schema, temperature=temperature
-    )
+    Cached responses are stored as JSON and validated back into `structured_output_schema` on hit.
+    """
+    messages = _build_messages(user_message=user_message, system_message=system_message)
+
+    if cache is not None:
+        key = _cache_key(cache_namespace, model, messages, temperature, structured_output_schema)
+        cached = cache.get(key)
+        if cached is not None:
+            return structured_output_schema.model_validate_json(cached), _CACHE_HIT_USAGE
+
+    def _request():
+        limiter, reserved_tokens = _reserve(messages, priority, rate_limiter)
+        try:
+            response = openai_client.beta.chat.completions.parse(
+                model=model,
+                messages=messages,
+                response_format=structured_output_schema,
+                temperature=temperature,
+                **_request_options(),
+            )
+        except BaseException:
+            _refund(limiter, reserved_tokens)
+            raise
+        _reconcile(limiter, reserved_tokens, response.usage)
+        return response
+
+    response = _with_retry(retry_policy, _request)
+    parsed = response.choices[0].message.parsed
+
+    if cache is not None and parsed is not None:
+        cache.set(key, parsed.model_dump_json())
+
+    return parsed, response.usage.json()
+
+
+@_traced("llm.chat")
+async def aclient_message(
+    user_message: str,
+    openai_client,
+    model: str,
+    system_message: Optional[str] = None,
+    temperature: float = 0.6,
+    cache=None,
+    cache_namespace: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> str:
+    """Async counterpart of `client_message`; `openai_client` must be an `AsyncOpenAI` instance."""
+    messages = _build_messages(user_message=user_message, system_message=system_message)
+
+    if cache is not None:
+        key = _cache_key(cache_namespace, model, messages, temperature)
+        cached = await _acache_get(cache, key)
+        if cached is not None:
+            return cached, _CACHE_HIT_USAGE
+
+    async def _request():
+        limiter, reserved_tokens = await _areserve(messages, priority, rate_limiter)
+        try:
+            response = await openai_client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, **_request_options()
+            )
+        except BaseException:
+            _refund(limiter, reserved_tokens)
+            raise
+        _reconcile(limiter, reserved_tokens, response.usage)
+        return response
+
+    response = await _awith_retry(retry_policy, _request)
+    content = response.choices[0].message.content
+
+    if cache is not None and content is not None:
+        await _acache_set(cache, key, content)
+
+    return content, response.usage.json()
+
+
+@_traced("llm.chat")
+async def aclient_message_stream(
+    user_message: str,
+    openai_client,
+    model: str,
+    system_message: Optional[str] = None,
+    temperature: float = 0.6,
+    cache=None,
+    cache_namespace: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> AsyncIterator[Tuple[Optional[str], Optional[str]]]:
+    """Async counterpart of `client_message_stream`; `openai_client` must be an `AsyncOpenAI` instance."""
+    messages = _build_messages(user_message=user_message, system_message=system_message)
+
+    if cache is not None:
+        key = _cache_key(cache_namespace, model, messages, temperature)
+        cached = await _acache_get(cache, key)
+        if cached is not None:
+            yield cached, None
+            yield None, _CACHE_HIT_USAGE
+            return
+
+    async def _open():
+        # Every attempt is counted by the limiter, like the requests of the other client calls
+        limiter, reserved_tokens = await _areserve(messages, priority, rate_limiter)
+        try:
+            stream = await openai_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                **_request_options(),
+            )
+        except BaseException:
+            _refund(limiter, reserved_tokens)
+            raise
+        return stream, limiter, reserved_tokens
+
+    # Only opening the stream is retried, a stream cannot be hedged or resumed once tokens were yielded
+    stream, limiter, reserved_tokens = await _awith_retry(retry_policy, _open, hedge=False)
+
+    parts = []
+    usage = None
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                _reconcile(limiter, reserved_tokens, chunk.usage)
+                usage = chunk.usage.json()
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1], None
+    finally:
+        # Releases the connection when the consumer stops early
+        if hasattr(stream, "close"):
+            await stream.close()
+
+    if cache is not None and parts:
+        await _acache_set(cache, key, "".join(parts))
+
+    yield None, usage
+
+
+@_traced("llm.chat")
+async def aclient_sturctured_message(
+    user_message: str,
+    openai_client,
+    model: str,
+    structured_output_schema,
+    system_message: Optional[str] = None,
+    temperature: float = 0.6,
+    cache=None,
+    cache_namespace: Optional[str] = None,
+    priority: int = PRIORITY_NORMAL,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> str:
+    """Async counterpart of `client_sturctured_message`; `openai_client` must be an `AsyncOpenAI` instance."""
+    messages = _build_messages(user_message=user_message, system_message=system_message)
+
+    if cache is not None:
+        key = _cache_key(cache_namespace, model, messages, temperature, structured_output_schema)
+        cached = await _acache_get(cache, key)
+        if cached is not None:
+            return structured_output_schema.model_validate_json(cached), _CACHE_HIT_USAGE
+
+    async def _request():
+        limiter, reserved_tokens = await _areserve(messages, priority, rate_limiter)
+        try:
+            response = await openai_client.beta.chat.completions.parse(
+                model=model,
+                messages=messages,
+                response_format=structured_output_schema,
+                temperature=temperature,
+                **_request_options(),
+            )
+        except BaseException:
+            _refund(limiter, reserved_tokens)
+            raise
+        _reconcile(limiter, reserved_tokens, response.usage)
+        return response
+
+    response = await _awith_retry(retry_policy, _request)
+    parsed = response.choices[0].message.parsed
+
+    if cache is not None and parsed is not None:
+        await _acache_set(cache, key, parsed.model_dump_json())
 
-    return response.choices[0].message.parsed, response.usage.json()
\ No newline at end of file
+    return parsed, response.usage.json()
@@ -1,33 +1,83 @@
-from typing import List
+import functools
+from typing import List, Optional
 
-import tiktoken
+from arag.utils.token_utils import count_tokens
+
+
+@functools.lru_cache(maxsize=None)
+def _pattern_tokens() -> int:
+    """Tokens of the `<knowledge>` tags wrapping every memory, plus the blank line between memories."""
+    return count_tokens("<knowledge>\n\n</knowledge>\n\n")
 
 
 class AgentMemory:
-    def __init__(self) -> None:
+    def __init__(self, max_memory_tokens: int = 4096) -> None:
+        self.max_memory_tokens = max_memory_tokens
+
         self._memories = []
-        self._tokenizer = tiktoken.get_encoding("o200k_base")
+        # Token count of every memory, computed once when it is added
+        self._token_counts = []
+        self._total_tokens = 0
+
+    @property
+    def total_tokens(self) -> int:
+        """Tokens of all memories, tags excluded."""
+        return self._total_tokens
+
+    def _count_tokens(self, memory: str) -> Optional[int]:
+        """
+        Token count of a memory, None if it is over `max_memory_tokens`.
+
+        Every memory is encoded once, here, since its count feeds the running total that bounds
+        `retrieve`. A memory of fewer bytes than the limit is accepted whatever its count, as
+        every token covers at least one byte; the count only decides for longer memories.
+        """
+        tokens = count_tokens(memory)
+        if len(memory.encode("utf-8")) < self.max_memory_tokens or tokens < self.max_memory_tokens:
+            return tokens
+        return None
 
     def update(self, memories: List[str]) -> None:
         for memory in memories:
-            if (
-                memory != ""
-                and len(self._tokenizer.encode(memory)) < 4096
-                and "sorry" not in memory.lower()
-                and "does not contain" not in memory.lower()
-            ):
+            if memory == "" or "sorry" in memory.lower() or "does not contain" in memory.lower():
+                continue
+
+            tokens = self._count_tokens(memory)
+            if tokens is not None:
                 self._memories.append(memory)
+                self._token_counts.append(tokens)
+                self._total_tokens += tokens
 
     def _memory_pattern(self, memories: List[str]) -> str:
-        output_memories = ""
+        return "\n\n".join(f"<knowledge>\n{memory}\n</knowledge>" for memory in memories)
 
-        for memory in memories:
-            output_memories += f"<knowledge>\n{memory}\n</knowledge>\n\n"
+    def retrieve(self, max_tokens: Optional[int] = None) -> str:
+        """
+        Format the memories for a prompt.
+
+        Args:
+            max_tokens: Token budget of the output, tags included. The most recent memories that
+                fit are kept, in the order they were added (None = all memories)
+
+        Returns:
+            The memories wrapped in `<knowledge>` tags
+        """
+        pattern_tokens = _pattern_tokens()
+        if max_tokens is None or self._total_tokens + len(self._memories) * pattern_tokens <= max_tokens:
+            return self._memory_pattern(self._memories)
 
-        return output_memories.strip()
+        kept = []
+        used = 0
+        for idx in range(len(self._memories) - 1, -1, -1):
+            tokens = self._token_counts[idx] + pattern_tokens
+            if used + tokens > max_tokens:
+                break
+            kept.append(idx)
+            used += tokens
 
-    def retrieve(self) -> str:
-        return self._memory_pattern(self._memories)
+        return self._memory_pattern([self._memories[idx] for idx in reversed(kept)])
 
     def reset(self) -> None:
         self._memories = []
+        self._token_counts = []
+        self._total_tokens = 0
@@ -16,6 +16,8 @@ Your core task is to extract the most relevant information from paginated docume
 
 When performing this task, prioritize precision, relevance, and completeness while avoiding paraphrasing, summarizing, or adding your own interpretations to the extracted content.
 
+When the input is a <document_chunks> list of `<document_chunk id="...">` elements instead of a single <document_chunk>, process every chunk independently exactly as described above and return one entry per chunk with its `chunk_id` and the extracted `knowledge` (an empty string for chunks without relevant information). Never merge content across chunks or attribute it to the wrong chunk ID.
+
 ## Operating Principles
 1. **Verbatim Extraction**: Always copy text exactly as it appears in the document, preserving the original wording completely.
 2. **Exact Page Format Preservation**: Always include the exact page marker format `{page_number}----------------------------` before each extracted passage, maintaining the precise formatting with the correct number of hyphens.
@@ -275,4 +277,8 @@ Battery Replacement: Every 12-18 months under normal use
 
 **Output:**
 <knowledge>
-</knowledge>"""
\ No newline at end of file
+</knowledge>"""
+
+KNOWLEDGE_COMPRESS_INSTRUCTION = (
+    "You MUST COMPRESS the information as MUCH as you can while PREVERVING THE MOST IMPORTANT PARTS!"
+)
@@ -8,6 +8,7 @@ from .knowledge import KNOWLEDGE_EXTRACTOR
 from .missing_info import MISSING_INFO
 from .process import PROCESS
 from .query_rewrite import QUERY_REWRITE
+from .sufficiency import SUFFICIENCY
 
 PROMPTS = {
     "default": DEFAULT,
@@ -20,4 +21,5 @@ PROMPTS = {
     "improver": IMPROVER,
     "evaluator": EVALUATOR,
     "missing_info": MISSING_INFO,
+    "sufficiency": SUFFICIENCY,
 }
\ No newline at end of file
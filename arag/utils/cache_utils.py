@@ -0,0 +1,196 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class _CacheStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with LRU eviction and optional TTL.
+
+    Values are kept as-is, so besides strings it can hold already decoded objects.
+
+    Args:
+        max_entries: Maximum number of entries kept before the least recently used is evicted
+        ttl: Time to live in seconds (None = entries never expire)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = _CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    async def aget(self, key: str) -> Optional[Any]:
+        # In memory, cheap enough to run on the event loop
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats.as_dict(), "size": len(self._entries)}
+
+
+class SQLiteCache:
+    """
+    Thread-safe on-disk string cache backed by SQLite, with size-bounded LRU eviction and TTL.
+
+    The database can be shared by several worker processes on the same machine. Writes keep a
+    running estimate of the number of rows; once it passes `max_entries` the rows are counted
+    and the least recently used ones evicted in one batch, down to `max_entries - evict_batch`.
+    The async methods run the queries in a worker thread, off the event loop.
+
+    Args:
+        path: Path of the SQLite database file
+        max_entries: Maximum number of entries kept before the least recently used are evicted
+        ttl: Time to live in seconds (None = entries never expire)
+        evict_batch: Entries evicted beyond `max_entries`, 10% of it by default
+    """
+
+    def __init__(
+        self, path: str, max_entries: int = 100_000, ttl: Optional[float] = None, evict_batch: Optional[int] = None
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_batch = evict_batch if evict_batch is not None else max(1, max_entries // 10)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._stats = _CacheStats()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+        # Upper estimate of the rows (replaced keys and other processes' writes are not tracked),
+        # corrected by an exact count whenever it passes `max_entries`
+        (self._size,) = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            row = self._connection.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._size -= 1
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+
+            self._connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._stats.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Count the rows and evict the least recently used down to `max_entries - evict_batch`."""
+        (size,) = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if size > self.max_entries:
+            evicted = self._connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (size - max(0, self.max_entries - self.evict_batch),),
+            ).rowcount
+            self._stats.evictions += evicted
+            size -= evicted
+        self._size = size
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM cache")
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (size,) = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+            return {**self._stats.as_dict(), "size": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -1,11 +1,7 @@
-import multiprocessing
 import re
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-from functools import partial
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 
 def split_text(text: str, min_segment_length: int = 10):
@@ -253,27 +249,56 @@ def parse_chunks_with_position(extracted_knowledge: str):
     return page_boundaries
 
 
-def get_embedding_for_page(page, get_embeddings_func):
-    """Get embedding for a single page - for parallel processing"""
-    content = page["content"]
+def _embed_texts(texts, get_embeddings_func=None, get_embeddings_batch_func=None):
+    """Embed texts with one batched call when possible, otherwise one call per text."""
+    if not texts:
+        return []
+
+    if get_embeddings_batch_func is not None:
+        try:
+            return get_embeddings_batch_func(texts)
+        except Exception as e:
+            print(f"Error getting embeddings: {e}")
+            return [None] * len(texts)
+
+    embeddings = []
+    for text in texts:
+        try:
+            embeddings.append(get_embeddings_func(text=text))
+        except Exception as e:
+            print(f"Error getting embedding: {e}")
+            embeddings.append(None)
+    return embeddings
+
+
+def get_embeddings_for_pages(page_boundaries, get_embeddings_func=None, get_embeddings_batch_func=None, dim=768):
+    """Get embeddings for all pages at once, using zero vectors for empty pages and failures"""
     # Handle empty content
-    if not content or not isinstance(content, str) or len(content.strip()) < 10:
-        return np.zeros((768,))  # Use default dimension
+    valid = [
+        i
+        for i, page in enumerate(page_boundaries)
+        if page["content"] and isinstance(page["content"], str) and len(page["content"].strip()) >= 10
+    ]
 
-    try:
-        return get_embeddings_func(text=content)
-    except Exception as e:
-        print(f"Error getting embeddings: {e}")
-        # Use zero vector as fallback
-        return np.zeros((768,))
+    vectors = _embed_texts(
+        [page_boundaries[i]["content"] for i in valid],
+        get_embeddings_func=get_embeddings_func,
+        get_embeddings_batch_func=get_embeddings_batch_func,
+    )
 
+    # Use the returned dimension for the zero vector fallback when available
+    dim = next((len(vector) for vector in vectors if vector is not None), dim)
+
+    embeddings = [np.zeros((dim,)) for _ in page_boundaries]
+    for i, vector in zip(valid, vectors):
+        if vector is not None:
+            embeddings[i] = np.array(vector)
+
+    return embeddings
 
-def process_segment_for_citation(
-    segment_data, chunks_vectors, page_boundaries, threshold, get_embeddings_func, min_length=30
-):
-    """Process a single segment for citation matching - for parallel processing"""
-    segment, segment_idx = segment_data
 
+def is_citation_candidate(segment, min_length=30):
+    """Check whether a segment should be matched against the reference pages"""
     # Types of content that shouldn't be cited
     no_citation_types = {"image", "header", "code", "table"}
 
@@ -282,38 +307,71 @@ def process_segment_for_citation(
 
     # Images and headers never get citations
     if any(t in segment_type.split(",") for t in no_citation_types) or segment.get("protected", False):
-        return (segment_idx, -1)
+        return False
 
     # Lists are usually cited, but we need to check content
     if "list" in segment_type:
         # Check if this list has sections that shouldn't be cited (like "Remedy:")
         content = segment["content"]
         if "Remedy:" in content or "remedy:" in content or len(content) < min_length:
-            return (segment_idx, -1)
+            return False
 
     # Check if content is too short for citation
     content = segment["content"]
     if len(content) < min_length:
-        return (segment_idx, -1)
+        return False
 
     # Skip citation for obvious references
     if "refer to section" in content.lower() or "see section" in content.lower():
-        return (segment_idx, -1)
+        return False
 
-    try:
-        segment_vector = np.array(get_embeddings_func(text=content))[None, ...]
-        scores = cosine_similarity(segment_vector, chunks_vectors)
-        max_score = np.max(scores)
+    return True
 
-        if max_score > threshold:
-            return (segment_idx, np.argmax(scores).item())
-        else:
-            # Add segments that don't meet threshold without citation
-            return (segment_idx, -1)
-    except Exception as e:
-        print(f"Error processing segment: {e}")
-        # Keep the segment without citation if there's an error
-        return (segment_idx, -1)
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize every row, leaving all-zero rows as zeros"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def match_segments_to_pages(segment_vectors: np.ndarray, chunks_vectors: np.ndarray, threshold: float) -> List[int]:
+    """
+    Find the most similar page for every segment with a single similarity matrix.
+
+    Args:
+        segment_vectors (np.ndarray): Segment embeddings, shape (num_segments, dim)
+        chunks_vectors (np.ndarray): Page embeddings, shape (num_pages, dim)
+        threshold (float): Minimum cosine similarity for a citation
+
+    Returns:
+        List[int]: Index of the cited page per segment, -1 when no page passes the threshold
+    """
+    scores = _normalize_rows(segment_vectors) @ _normalize_rows(chunks_vectors).T
+    best = np.argmax(scores, axis=1)
+    best_scores = scores[np.arange(len(best)), best]
+    return np.where(best_scores > threshold, best, -1).tolist()
+
+
+def rank_by_similarity(query_vector, vectors: List[Optional[List[float]]]) -> List[int]:
+    """
+    Order vectors by decreasing cosine similarity to a query vector with a single matrix product.
+
+    Args:
+        query_vector: Query embedding
+        vectors: Embeddings to rank, None for texts that could not be embedded
+
+    Returns:
+        List[int]: Indices into `vectors`, most similar first; missing vectors rank last, ties keep input order
+    """
+    scores = np.full(len(vectors), -np.inf)
+    present = [idx for idx, vector in enumerate(vectors) if vector is not None]
+    if present:
+        matrix = np.asarray([vectors[idx] for idx in present], dtype=float)
+        query = np.asarray([query_vector], dtype=float)
+        scores[present] = (_normalize_rows(matrix) @ _normalize_rows(query).T)[:, 0]
+
+    return np.argsort(-scores, kind="stable").tolist()
 
 
 def add_citations_parallel(
@@ -322,10 +380,13 @@ def add_citations_parallel(
     threshold: float = 0.5,
     get_embeddings_func=None,
     min_length: int = 30,
+    get_embeddings_batch_func=None,
+    citation_map: Optional[Dict[str, int]] = None,
 ):
     """
     Add citations to answer segments based on similarity to reference content.
-    This version uses parallel processing for improved performance.
+    All pages and all citable segments are embedded in two batched calls and matched
+    with one segment x page similarity matrix.
 
     Args:
         answer_segments (List[Dict]): List of text segments with metadata
@@ -333,31 +394,26 @@ def add_citations_parallel(
         threshold (float): Similarity threshold for citation (default: 0.5)
         get_embeddings_func: Function to get embeddings from text
         min_length (int): Minimum text length for citation consideration
+        get_embeddings_batch_func: Function embedding a list of texts in one call, preferred when given
+        citation_map (Dict[str, int]): Page number to citation index map, updated in place so
+            consecutive calls (e.g. one per streamed paragraph) share the numbering
 
     Returns:
         str: Text with citations added
     """
-    if not get_embeddings_func:
+    if not get_embeddings_func and not get_embeddings_batch_func:
         raise ValueError("A function to get embeddings must be provided")
 
     # Skip processing if no page boundaries or segments
     if not page_boundaries or not answer_segments:
         return "\n\n".join([s["content"] for s in answer_segments])
 
-    # Determine number of workers (CPUs)
-    num_workers = max(1, multiprocessing.cpu_count() - 1)  # Leave one CPU free
-
-    # Process page boundaries to get embeddings in parallel
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        # Create a partial function with the embedding function
-        get_embedding_partial = partial(get_embedding_for_page, get_embeddings_func=get_embeddings_func)
-
-        # Process pages in parallel
-        embeddings = list(executor.map(get_embedding_partial, page_boundaries))
-
-        # Assign embeddings back to pages
-        for i, page in enumerate(page_boundaries):
-            page["vector"] = embeddings[i]
+    # First batched call: embed every page
+    embeddings = get_embeddings_for_pages(
+        page_boundaries, get_embeddings_func=get_embeddings_func, get_embeddings_batch_func=get_embeddings_batch_func
+    )
+    for page, vector in zip(page_boundaries, embeddings):
+        page["vector"] = vector
 
     # Stack vectors for efficient similarity computation
     try:
@@ -366,23 +422,25 @@ def add_citations_parallel(
         print("Warning: Could not stack vectors, dimensions may not match")
         return "\n\n".join([s["content"] for s in answer_segments])
 
-    # Prepare segments for parallel processing
-    segment_data = [(segment, i) for i, segment in enumerate(answer_segments)]
-
-    # Process segments in parallel
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
-        # Create a partial function with fixed arguments
-        process_segment_partial = partial(
-            process_segment_for_citation,
-            chunks_vectors=chunks_vectors,
-            page_boundaries=page_boundaries,
-            threshold=threshold,
-            get_embeddings_func=get_embeddings_func,
-            min_length=min_length,
-        )
+    # Second batched call: embed every segment that can receive a citation
+    candidate_idxs = [i for i, segment in enumerate(answer_segments) if is_citation_candidate(segment, min_length)]
+    candidate_vectors = _embed_texts(
+        [answer_segments[i]["content"] for i in candidate_idxs],
+        get_embeddings_func=get_embeddings_func,
+        get_embeddings_batch_func=get_embeddings_batch_func,
+    )
+    embedded = [(i, vector) for i, vector in zip(candidate_idxs, candidate_vectors) if vector is not None]
 
-        # Process segments in parallel and get results
-        citation_results = list(executor.map(process_segment_partial, segment_data))
+    # Segments that are not cited (or failed to embed) keep -1
+    citation_results = [(i, -1) for i in range(len(answer_segments))]
+    if embedded:
+        try:
+            segment_vectors = np.array([vector for _, vector in embedded], dtype=float)
+            matches = match_segments_to_pages(segment_vectors, chunks_vectors.astype(float), threshold)
+            for (i, _), citation_idx in zip(embedded, matches):
+                citation_results[i] = (i, citation_idx)
+        except ValueError as e:
+            print(f"Error matching segments: {e}")
 
     # Convert results back to the format expected by post-processing
     selected_idxs = []
@@ -468,7 +526,12 @@ def add_citations_parallel(
     unique_indexes = sorted(set(unique_indexes))
 
     # Create a mapping from page numbers to citation indices - FIX: Start from 1 instead of 0
-    citation_map = {page: idx + 1 for idx, page in enumerate(unique_indexes)}
+    # A map shared across calls keeps its indices and numbers new pages after them
+    if citation_map is None:
+        citation_map = {}
+    for page in unique_indexes:
+        if page not in citation_map:
+            citation_map[page] = len(citation_map) + 1
 
     # Build the final text with citations
     # Reconstruct the original text structure, preserving relative positions
@@ -551,9 +614,11 @@ def add_citations_parallel(
     return full_text.strip()
 
 
-def process_citations(answer, text_chunks, threshold=0.5, get_embeddings_func=None):
-    """Main function to process citations with parallel processing"""
-    if not get_embeddings_func:
+def process_citations(
+    answer, text_chunks, threshold=0.5, get_embeddings_func=None, get_embeddings_batch_func=None, citation_map=None
+):
+    """Main function to process citations, embedding in batches when `get_embeddings_batch_func` is given"""
+    if not get_embeddings_func and not get_embeddings_batch_func:
         raise ValueError("A function to get embeddings must be provided")
 
     # Parse chunks with position info
@@ -562,12 +627,14 @@ def process_citations(answer, text_chunks, threshold=0.5, get_embeddings_func=No
     # Extract segments with metadata
     answer_segments = split_text(text=answer)
 
-    # Find matches and add citations using parallel processing
+    # Find matches and add citations
     return add_citations_parallel(
         answer_segments=answer_segments,
         page_boundaries=page_boundaries,
         threshold=threshold,
         get_embeddings_func=get_embeddings_func,
+        get_embeddings_batch_func=get_embeddings_batch_func,
+        citation_map=citation_map,
     )
 
 
@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import contextvars
+import time
+from typing import Any, Iterator, List, Optional
+
+# Absolute `time.monotonic()` deadline of the current request, inherited by the tasks it creates
+_deadline: contextvars.ContextVar = contextvars.ContextVar("arag_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request is not started because its deadline has already passed."""
+
+
+def get_deadline() -> Optional[float]:
+    """The `time.monotonic()` deadline of the current context, None when unbounded."""
+    return _deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline (never negative), None when unbounded."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def check_deadline() -> Optional[float]:
+    """
+    Return the seconds left for a request about to be sent.
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Deadline exceeded before the request was sent")
+    return remaining
+
+
+def resolve_deadline(timeout: Optional[float] = None, deadline: Optional[float] = None) -> Optional[float]:
+    """The earliest of the current deadline, `deadline` and `timeout` seconds from now, None when unbounded."""
+    candidates = [d for d in (_deadline.get(), deadline) if d is not None]
+    if timeout is not None:
+        candidates.append(time.monotonic() + timeout)
+
+    return min(candidates) if candidates else None
+
+
+@contextlib.contextmanager
+def deadline_scope(timeout: Optional[float] = None, deadline: Optional[float] = None) -> Iterator[Optional[float]]:
+    """
+    Bound everything run in this context (and in tasks created from it) by a deadline.
+
+    A scope can only tighten the deadline it is nested in, never extend it.
+
+    Args:
+        timeout: Seconds from now
+        deadline: Absolute `time.monotonic()` value
+
+    Yields:
+        The effective deadline, None when unbounded
+    """
+    effective = resolve_deadline(timeout=timeout, deadline=deadline)
+    token = _deadline.set(effective)
+    try:
+        yield effective
+    finally:
+        _deadline.reset(token)
+
+
+async def gather_until_deadline(tasks: List[asyncio.Future]) -> List[Any]:
+    """
+    Like `asyncio.gather(*tasks, return_exceptions=True)`, but stop waiting at the current deadline.
+
+    Tasks still running at the deadline are cancelled and reported as `DeadlineExceeded`.
+
+    Returns:
+        One result or exception per task, in task order
+    """
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=remaining_time())
+        for task in pending:
+            task.cancel()
+
+    results = []
+    for task in tasks:
+        if not task.done() or task.cancelled():
+            results.append(DeadlineExceeded("Deadline exceeded before the task finished"))
+        elif task.exception() is not None:
+            results.append(task.exception())
+        else:
+            results.append(task.result())
+    return results
@@ -0,0 +1,118 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Largest 31-bit prime, keeps (a * h + b) below 2**63 for 32-bit shingle hashes
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def _optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) whose S-curve midpoint (1 / bands) ** (1 / rows) is closest to the threshold."""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate filter using shingled MinHash signatures and LSH banding.
+
+    Texts are normalized (lowercase, punctuation and whitespace collapsed) and split into word
+    shingles. Exact duplicates of a normalized text are dropped through a hash lookup; other texts
+    are only compared against the candidates sharing an LSH band, and are dropped when the
+    estimated Jaccard similarity reaches the threshold. The cost is linear in the number of texts.
+
+    Args:
+        jaccard_threshold: Estimated shingle Jaccard similarity at which a text counts as a duplicate
+        num_perm: Number of MinHash permutations (signature length)
+        shingle_size: Number of consecutive words per shingle
+        seed: Seed of the permutation parameters
+    """
+
+    def __init__(
+        self, jaccard_threshold: float = 0.7, num_perm: int = 128, shingle_size: int = 2, seed: int = 1
+    ) -> None:
+        self.jaccard_threshold = jaccard_threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _optimal_bands(num_perm, jaccard_threshold)
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self._exact: Set[str] = set()
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+
+    def _shingles(self, normalized: str) -> Set[str]:
+        words = normalized.split(" ")
+        if len(words) <= self.shingle_size:
+            return {normalized}
+        return {" ".join(words[i : i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text."""
+        shingles = self._shingles(_normalize(text))
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # One row per permutation, min over the shingles
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _find_duplicate(self, signature: np.ndarray, band_keys: List[bytes]) -> Optional[int]:
+        checked = set()
+        for band, key in enumerate(band_keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.jaccard_threshold:
+                    return candidate
+        return None
+
+    def add(self, text: str) -> bool:
+        """
+        Add a text to the index unless it duplicates one already added.
+
+        Returns:
+            True when the text was kept, False when it was a duplicate
+        """
+        normalized = _normalize(text)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        if digest in self._exact:
+            return False
+
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+        if self._find_duplicate(signature, band_keys) is not None:
+            return False
+
+        self._exact.add(digest)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(band_keys):
+            self._buckets[band][key].append(index)
+        return True
+
+    def deduplicate(self, texts: List[str]) -> List[str]:
+        """Keep the first occurrence of every group of near-duplicate texts, preserving order."""
+        return [text for text in texts if self.add(text)]
@@ -0,0 +1,266 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from arag.utils.tracing_utils import span
+
+
+class _StageMetrics:
+    """Counters for a single fan-out stage, guarded by the owning executor lock."""
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.queued = 0
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "queued": self.queued,
+            "waiting": self.waiting,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class StageExecutor:
+    """
+    Bounded thread pool shared by the ARag fan-out stages.
+
+    Every task is tagged with a stage name ("rewrite", "retrieve", "knowledge", ...). A stage
+    can be given a concurrency limit, enforced for both thread tasks and coroutines, and the
+    executor keeps per-stage counters including the queue depth (tasks submitted but not yet
+    running or waiting for a stage slot).
+
+    Nested fan-outs are safe on a bounded pool: `map` runs any task that no worker picked up
+    yet on the calling thread, so a worker waiting on its own sub-tasks always makes progress.
+
+    Args:
+        max_workers: Size of the shared thread pool
+        stage_limits: Maximum number of concurrently running tasks per stage
+    """
+
+    def __init__(self, max_workers: int = 32, stage_limits: Optional[Dict[str, int]] = None) -> None:
+        self.max_workers = max_workers
+        self.stage_limits = dict(stage_limits or {})
+
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="arag-stage")
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _StageMetrics] = {}
+        self._thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        # asyncio semaphores are bound to the loop they are first used on
+        self._async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    @property
+    def pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        """The underlying thread pool, e.g. for `loop.run_in_executor`."""
+        return self._pool
+
+    def set_stage_limit(self, stage: str, limit: Optional[int]) -> None:
+        """Set or clear (with None) the concurrency limit of a stage."""
+        with self._lock:
+            if limit is None:
+                self.stage_limits.pop(stage, None)
+            else:
+                self.stage_limits[stage] = limit
+            self._thread_semaphores.pop(stage, None)
+            for semaphores in self._async_semaphores.values():
+                semaphores.pop(stage, None)
+
+    def _stage_metrics(self, stage: str) -> _StageMetrics:
+        if stage not in self._metrics:
+            self._metrics[stage] = _StageMetrics()
+        return self._metrics[stage]
+
+    def _on_submit(self, stage: str) -> None:
+        with self._lock:
+            metrics = self._stage_metrics(stage)
+            metrics.submitted += 1
+            metrics.queued += 1
+            metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queued + metrics.waiting)
+
+    def _on_start(self, stage: str, limited: bool) -> None:
+        with self._lock:
+            metrics = self._stage_metrics(stage)
+            metrics.queued -= 1
+            if limited:
+                metrics.waiting += 1
+            else:
+                metrics.active += 1
+
+    def _on_acquire(self, stage: str) -> None:
+        with self._lock:
+            metrics = self._stage_metrics(stage)
+            metrics.waiting -= 1
+            metrics.active += 1
+
+    def _on_cancel(self, stage: str) -> None:
+        with self._lock:
+            self._stage_metrics(stage).queued -= 1
+
+    def _on_finish(self, stage: str, failed: bool) -> None:
+        with self._lock:
+            metrics = self._stage_metrics(stage)
+            metrics.active -= 1
+            if failed:
+                metrics.failed += 1
+            else:
+                metrics.completed += 1
+
+    def _thread_semaphore(self, stage: str) -> Optional[threading.BoundedSemaphore]:
+        with self._lock:
+            limit = self.stage_limits.get(stage)
+            if limit is None:
+                return None
+            if stage not in self._thread_semaphores:
+                self._thread_semaphores[stage] = threading.BoundedSemaphore(limit)
+            return self._thread_semaphores[stage]
+
+    def _async_semaphore(self, stage: str) -> Optional[asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            limit = self.stage_limits.get(stage)
+            if limit is None:
+                return None
+            semaphores = self._async_semaphores.setdefault(loop, {})
+            if stage not in semaphores:
+                semaphores[stage] = asyncio.Semaphore(limit)
+            return semaphores[stage]
+
+    def _run_task(self, stage: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        semaphore = self._thread_semaphore(stage)
+        self._on_start(stage, limited=semaphore is not None)
+
+        if semaphore is not None:
+            semaphore.acquire()
+            self._on_acquire(stage)
+
+        try:
+            with span(f"stage.{stage}"):
+                result = fn(*args, **kwargs)
+        except BaseException:
+            self._on_finish(stage, failed=True)
+            raise
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+        self._on_finish(stage, failed=False)
+        return result
+
+    def submit(self, stage: str, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """Submit `fn(*args, **kwargs)` to the shared pool under the given stage, in a copy of the caller's context."""
+        self._on_submit(stage)
+        return self._pool.submit(contextvars.copy_context().run, self._run_task, stage, fn, args, kwargs)
+
+    def _resolve(self, stage: str, future: concurrent.futures.Future, fn: Callable, args: tuple) -> Any:
+        # Run the task on the calling thread if no worker has picked it up yet
+        if future.cancel():
+            return self._run_task(stage, fn, args, {})
+        return future.result()
+
+    def map(
+        self,
+        stage: str,
+        fn: Callable,
+        iterable: Iterable,
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """
+        Apply `fn` to every item on the shared pool and return results in input order.
+
+        Args:
+            stage: Stage name used for limits and metrics
+            fn: Callable taking a single item
+            iterable: Items to process
+            max_concurrency: Additional bound for this call only, on top of the stage limit
+            return_exceptions: Return raised exceptions in place of results instead of re-raising
+
+        Returns:
+            List of results in input order
+        """
+        if max_concurrency:
+            call_semaphore = threading.BoundedSemaphore(max_concurrency)
+            _fn = fn
+
+            def fn(item):
+                with call_semaphore:
+                    return _fn(item)
+
+        items = list(iterable)
+        futures = [self.submit(stage, fn, item) for item in items]
+
+        results = []
+        for i, (future, item) in enumerate(zip(futures, items)):
+            try:
+                results.append(self._resolve(stage, future, fn, (item,)))
+            except Exception as exc:
+                if not return_exceptions:
+                    for pending in futures[i + 1 :]:
+                        if pending.cancel():
+                            self._on_cancel(stage)
+                    raise
+                results.append(exc)
+
+        return results
+
+    async def arun(self, stage: str, coro: Awaitable) -> Any:
+        """Await a coroutine under the concurrency limit and metrics of a stage."""
+        semaphore = self._async_semaphore(stage)
+        self._on_submit(stage)
+        self._on_start(stage, limited=semaphore is not None)
+
+        if semaphore is not None:
+            try:
+                await semaphore.acquire()
+            except BaseException:
+                with self._lock:
+                    self._stage_metrics(stage).waiting -= 1
+                coro.close()
+                raise
+            self._on_acquire(stage)
+
+        try:
+            with span(f"stage.{stage}"):
+                result = await coro
+        except BaseException:
+            self._on_finish(stage, failed=True)
+            raise
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+        self._on_finish(stage, failed=False)
+        return result
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        """Snapshot of the per-stage counters."""
+        with self._lock:
+            return {stage: metrics.as_dict() for stage, metrics in self._metrics.items()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_shared_executor: Optional[StageExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_shared_executor() -> StageExecutor:
+    """Process-wide executor used by every ARag instance that is not given its own."""
+    global _shared_executor
+
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = StageExecutor()
+        return _shared_executor
@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Optional
+
+from arag.utils.deadline_utils import DeadlineExceeded
+
+# Lower values are served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# How often async waiters re-check the queue, they cannot be woken by the condition variable
+_ASYNC_POLL_INTERVAL = 0.05
+
+
+class _TokenBucket:
+    """Bucket refilled continuously up to `capacity` per minute. Its level may go negative after reconciliation."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute, with priorities.
+
+    Callers reserve one request and an estimated number of tokens before sending a request,
+    and `reconcile` the estimate with the reported usage afterwards. Waiting callers are
+    served strictly by priority, then arrival, so answer generation (`PRIORITY_HIGH`) goes
+    ahead of queued background work such as status narration (`PRIORITY_LOW`). The same
+    limiter can be used from threads (`acquire`) and coroutines (`aacquire`).
+
+    Args:
+        requests_per_minute: Maximum requests per minute (None = unlimited)
+        tokens_per_minute: Maximum tokens per minute (None = unlimited)
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self._condition = threading.Condition()
+        self._waiters: list = []
+        self._sequence = itertools.count()
+
+        self._stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "reconciled_tokens": 0}
+
+    @property
+    def limits_tokens(self) -> bool:
+        """Whether callers need to estimate tokens at all."""
+        return self._tokens is not None
+
+    def _enqueue(self, priority: int) -> tuple:
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+        return entry
+
+    def _dequeue(self, entry: tuple) -> None:
+        # Only used when a waiter gives up, e.g. on cancellation
+        with self._condition:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def _try_take(self, entry: tuple, tokens: int) -> float:
+        """Take capacity for the entry if it is first in line, otherwise return how long to wait."""
+        now = time.monotonic()
+        buckets = [(bucket, amount) for bucket, amount in ((self._requests, 1), (self._tokens, tokens)) if bucket]
+        for bucket, _ in buckets:
+            bucket.refill(now)
+
+        if self._waiters[0] != entry:
+            return _ASYNC_POLL_INTERVAL
+
+        wait = max((bucket.wait_time(amount) for bucket, amount in buckets), default=0.0)
+        if wait > 0:
+            return wait
+
+        for bucket, amount in buckets:
+            bucket.level -= min(amount, bucket.capacity)
+        heapq.heappop(self._waiters)
+        self._stats["acquired"] += 1
+        self._condition.notify_all()
+        return 0.0
+
+    def _record_wait(self, started_at: float) -> None:
+        waited = time.monotonic() - started_at
+        if waited > 0.001:
+            with self._condition:
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += waited
+
+    def acquire(self, tokens: int = 0, priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None) -> None:
+        """
+        Block until one request and `tokens` tokens are available for this priority.
+
+        Raises:
+            DeadlineExceeded: If capacity is not available before the `time.monotonic()` deadline
+        """
+        if self._requests is None and self._tokens is None:
+            return
+
+        started_at = time.monotonic()
+        entry = self._enqueue(priority)
+        try:
+            with self._condition:
+                while True:
+                    wait = self._try_take(entry, tokens)
+                    if wait == 0:
+                        break
+                    if deadline is not None:
+                        if time.monotonic() >= deadline:
+                            raise DeadlineExceeded("Deadline exceeded while waiting for the rate limiter")
+                        wait = min(wait, deadline - time.monotonic())
+                    self._condition.wait(wait)
+        except BaseException:
+            self._dequeue(entry)
+            raise
+        self._record_wait(started_at)
+
+    async def aacquire(
+        self, tokens: int = 0, priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None
+    ) -> None:
+        """Async counterpart of `acquire`, waiting without blocking the event loop."""
+        if self._requests is None and self._tokens is None:
+            return
+
+        started_at = time.monotonic()
+        entry = self._enqueue(priority)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_take(entry, tokens)
+                if wait == 0:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded("Deadline exceeded while waiting for the rate limiter")
+                await asyncio.sleep(min(wait, _ASYNC_POLL_INTERVAL))
+        except BaseException:
+            self._dequeue(entry)
+            raise
+        self._record_wait(started_at)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket with the usage reported for a request that reserved `estimated_tokens`."""
+        if self._tokens is None or actual_tokens is None:
+            return
+
+        with self._condition:
+            self._tokens.level -= actual_tokens - estimated_tokens
+            self._stats["reconciled_tokens"] += actual_tokens - estimated_tokens
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {**self._stats, "queued": len(self._waiters)}
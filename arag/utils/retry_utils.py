@@ -0,0 +1,265 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from arag.utils.deadline_utils import DeadlineExceeded
+
+# Status codes worth another attempt: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Connection and timeout errors of the OpenAI SDK, matched by name to avoid importing it here
+_RETRYABLE_ERROR_NAMES = frozenset({"APIConnectionError", "APITimeoutError"})
+
+# Timeout and connection errors of the OpenAI SDK, httpx and requests
+_TIMEOUT_ERROR_NAMES = _RETRYABLE_ERROR_NAMES | {"TimeoutException", "NetworkError", "Timeout", "ConnectionError"}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether an exception raised by an LLM or HTTP call is transient."""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+
+    status_code = getattr(exc, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    if any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__):
+        return True
+
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Whether an exception reports an exhausted rate limit or quota (HTTP 429)."""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    return any(cls.__name__ == "RateLimitError" for cls in type(exc).__mro__)
+
+
+def is_deadline_error(exc: BaseException, deadline: Optional[float]) -> bool:
+    """
+    Whether a timeout or connection error was caused by the deadline, i.e. raised once it had passed.
+
+    Request timeouts are cut to what is left of the deadline, so such errors are reported as
+    `DeadlineExceeded` by the callers instead.
+    """
+    if deadline is None or time.monotonic() < deadline or isinstance(exc, DeadlineExceeded):
+        return False
+
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in _TIMEOUT_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a `Retry-After` header, if the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Retry transient failures with exponential backoff and full jitter, optionally hedging slow calls.
+
+    Attempt `n` waits a random delay up to `min(max_delay, base_delay * 2 ** n)`, or what a
+    `Retry-After` header asks for, in full since an earlier retry would be rejected again. With
+    a deadline, no attempt is started that could not finish waiting before it. With `hedge=True` a duplicate call is fired once the first one has been
+    running longer than the `hedge_quantile` of the latencies observed so far, and the first
+    result wins. Each policy keeps its own latency window, so give every agent its own policy.
+
+    Args:
+        max_attempts: Maximum number of attempts, the first one included
+        base_delay: Backoff base in seconds
+        max_delay: Upper bound of a single backoff in seconds (`Retry-After` is not capped)
+        retry_on: Predicate deciding whether an exception is retried
+        hedge: Fire a duplicate call when the first one is slower than usual
+        hedge_quantile: Latency quantile after which the duplicate is fired
+        hedge_min_samples: Observed calls required before hedging starts
+        latency_window: Number of recent latencies kept to compute the quantile
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        retry_on: Callable[[BaseException], bool] = is_retryable,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._hedge_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+
+    def _observe(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a duplicate call is fired, None while hedging is off or warming up."""
+        if not self.hedge:
+            return None
+
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self._latencies)
+
+        return latencies[min(len(latencies) - 1, int(self.hedge_quantile * len(latencies)))]
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _next_delay(self, attempt: int, exc: BaseException, deadline: Optional[float]) -> Optional[float]:
+        """Delay before the next attempt, or None when the error should be raised."""
+        if attempt + 1 >= self.max_attempts or not self.retry_on(exc):
+            return None
+
+        delay = self._backoff(attempt, exc)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+
+        with self._lock:
+            self._stats["retries"] += 1
+        return delay
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _call_hedged(self, fn: Callable[[], Any], delay: Optional[float]) -> Any:
+        if delay is None:
+            return fn()
+
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="arag-hedge")
+
+        # Each call runs in a copy of the caller's context, e.g. to keep its deadline
+        first = self._hedge_pool.submit(contextvars.copy_context().run, fn)
+        done, _ = concurrent.futures.wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self._count("hedges")
+        second = self._hedge_pool.submit(contextvars.copy_context().run, fn)
+        pending = {first, second}
+        # The slower call keeps running in the background and its result is discarded
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+        # Both failed, surface the first call's error
+        return first.result()
+
+    async def _acall_hedged(self, fn: Callable[[], Awaitable], delay: Optional[float]) -> Any:
+        if delay is None:
+            return await fn()
+
+        first = asyncio.ensure_future(fn())
+        try:
+            return await asyncio.wait_for(asyncio.shield(first), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            first.cancel()
+            raise
+
+        self._count("hedges")
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+            # Both failed, surface the first call's error
+            return first.result()
+        finally:
+            for task in (first, second):
+                task.cancel()
+
+    def call(self, fn: Callable[[], Any], deadline: Optional[float] = None, hedge: bool = True) -> Any:
+        """
+        Call `fn()` with retries (and hedging when enabled).
+
+        Args:
+            fn: Function performing the request
+            deadline: `time.monotonic()` value after which no new attempt is started
+            hedge: Allow hedging for this call, e.g. off for streams that cannot be duplicated
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            try:
+                result = self._call_hedged(fn, self.hedge_delay() if hedge else None)
+            except Exception as exc:
+                delay = self._next_delay(attempt, exc, deadline)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                print(f"Retrying after {type(exc).__name__} in {delay:.2f}s ({attempt + 2}/{self.max_attempts})")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._observe(time.monotonic() - started_at)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable], deadline: Optional[float] = None, hedge: bool = True) -> Any:
+        """Async counterpart of `call`; `fn` returns a new coroutine on every call."""
+        self._count("calls")
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            try:
+                result = await self._acall_hedged(fn, self.hedge_delay() if hedge else None)
+            except Exception as exc:
+                delay = self._next_delay(attempt, exc, deadline)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                print(f"Retrying after {type(exc).__name__} in {delay:.2f}s ({attempt + 2}/{self.max_attempts})")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            self._observe(time.monotonic() - started_at)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
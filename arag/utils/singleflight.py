@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight calls made from different threads.
+
+    The first caller for a key runs the function; callers arriving with the same key while
+    it is still running wait for and share its result (or exception) instead of issuing a
+    duplicate request. Nothing is cached once the call completes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce identical in-flight coroutine calls on the same event loop.
+
+    The shared call runs as its own task, so cancelling one of the waiting callers does not
+    cancel the request for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+
+        task = calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            calls[key] = task
+
+            def _done(t: asyncio.Future) -> None:
+                calls.pop(key, None)
+                # Mark the exception as retrieved in case every waiter was cancelled
+                if not t.cancelled():
+                    t.exception()
+
+            task.add_done_callback(_done)
+
+        return await asyncio.shield(task)
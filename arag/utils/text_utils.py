@@ -1,6 +1,5 @@
 import re
-
-import Levenshtein
+import warnings
 
 
 def convert_citations(text):
@@ -213,10 +212,55 @@ def format_references(text):
     return result
 
 
-def remove_almost_duplicates(strings, threshold=2):
-    result = []
-    for s in strings:
-        # Check if this string is too similar to any already in our result
-        if not any(Levenshtein.distance(s, existing) <= threshold for existing in result):
-            result.append(s)
-    return result
\ No newline at end of file
+def split_completed_paragraphs(text):
+    """
+    Split streamed text into the paragraphs completed so far and the unfinished rest.
+
+    Paragraphs are complete once followed by a blank line that is not inside a code block.
+
+    Args:
+        text (str): Text received so far
+
+    Returns:
+        tuple: (completed paragraphs as one string, empty if none, remaining text)
+    """
+    end = text.rfind("\n\n")
+    while end != -1 and text.count("```", 0, end) % 2:
+        end = text.rfind("\n\n", 0, end)
+
+    if end == -1:
+        return "", text
+
+    return text[:end].strip("\n"), text[end + 2 :].lstrip("\n")
+
+
+def remove_almost_duplicates(strings, jaccard_threshold=0.7, num_perm=128, shingle_size=2, threshold=None):
+    """
+    Remove exact and near-duplicate strings, keeping the first occurrence.
+
+    Args:
+        strings (list): Strings to deduplicate
+        jaccard_threshold (float): Estimated word-shingle Jaccard similarity at which two strings are duplicates
+        num_perm (int): Number of MinHash permutations
+        shingle_size (int): Number of consecutive words per shingle
+        threshold (int): Deprecated Levenshtein distance cutoff, use `jaccard_threshold`. A distance of 0 keeps
+            only exact duplicates out, any other distance maps to the default `jaccard_threshold`
+
+    Returns:
+        list: Deduplicated strings in their original order
+    """
+    # Imported on first use, it pulls in NumPy
+    from arag.utils.dedup_utils import MinHashDeduplicator
+
+    if threshold is not None:
+        warnings.warn(
+            "remove_almost_duplicates(threshold=...) is deprecated, use jaccard_threshold instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        jaccard_threshold = 1.0 if threshold <= 0 else 0.7
+
+    deduplicator = MinHashDeduplicator(
+        jaccard_threshold=jaccard_threshold, num_perm=num_perm, shingle_size=shingle_size
+    )
+    return deduplicator.deduplicate(strings)
@@ -0,0 +1,142 @@
+import functools
+from typing import List, Optional, Sequence, Tuple
+
+# Encoding used to estimate prompt sizes, close enough to Gemini tokenization for budgeting
+DEFAULT_ENCODING = "o200k_base"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str):
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # tiktoken downloads encodings on first use, fall back to a character estimate offline
+        print(f"Error loading tiktoken encoding {encoding_name}: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    """
+    Estimate the number of tokens of a text.
+
+    Args:
+        text: Text to count
+        encoding_name: tiktoken encoding used for the estimate
+
+    Returns:
+        Number of tokens, or about one token per 4 characters when tiktoken is unavailable
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(encoding_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def batch_by_token_budget(
+    texts: List[str], max_tokens: int, max_items: Optional[int] = None, encoding_name: str = DEFAULT_ENCODING
+) -> List[List[int]]:
+    """
+    Group texts into consecutive batches that fit a token budget.
+
+    A text larger than the budget on its own gets a batch of its own.
+
+    Args:
+        texts: Texts to group
+        max_tokens: Maximum number of tokens per batch
+        max_items: Maximum number of texts per batch (None = no limit)
+        encoding_name: tiktoken encoding used for the estimate
+
+    Returns:
+        Batches of indices into `texts`, in input order
+    """
+    batches = []
+    current, current_tokens = [], 0
+
+    for idx, text in enumerate(texts):
+        tokens = count_tokens(text, encoding_name=encoding_name)
+
+        if current and (current_tokens + tokens > max_tokens or (max_items and len(current) >= max_items)):
+            batches.append(current)
+            current, current_tokens = [], 0
+
+        current.append(idx)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def split_by_token_budget(text: str, max_tokens: int, encoding_name: str = DEFAULT_ENCODING) -> List[str]:
+    """
+    Split a text into consecutive pieces that fit a token budget, at line boundaries when possible.
+
+    Lines larger than the budget on their own are cut into fixed-size character windows.
+
+    Args:
+        text: Text to split
+        max_tokens: Maximum number of tokens per piece
+        encoding_name: tiktoken encoding used for the estimate
+
+    Returns:
+        Pieces whose concatenation is the original text
+    """
+    if count_tokens(text, encoding_name=encoding_name) <= max_tokens:
+        return [text]
+
+    # About 4 characters per token, halved to stay under the budget for dense text
+    window = max(1, max_tokens * 2)
+    lines = []
+    for line in text.splitlines(keepends=True):
+        if count_tokens(line, encoding_name=encoding_name) <= max_tokens:
+            lines.append(line)
+        else:
+            lines.extend(line[i : i + window] for i in range(0, len(line), window))
+
+    batches = batch_by_token_budget(lines, max_tokens, encoding_name=encoding_name)
+    return ["".join(lines[idx] for idx in batch) for batch in batches]
+
+
+def pack_by_token_budget(
+    texts: List[str],
+    max_tokens: int,
+    ranking: Optional[Sequence[int]] = None,
+    overhead: int = 0,
+    encoding_name: str = DEFAULT_ENCODING,
+) -> Tuple[List[int], List[int]]:
+    """
+    Greedily pick the most relevant texts that fit a token budget together.
+
+    Texts are taken in ranking order; one that does not fit is skipped and smaller, less
+    relevant texts may still be packed after it.
+
+    Args:
+        texts: Texts to pack
+        max_tokens: Maximum number of tokens of the packed texts
+        ranking: Indices into `texts`, most relevant first (None = input order)
+        overhead: Tokens added per text by the surrounding prompt, e.g. its tags
+        encoding_name: tiktoken encoding used for the estimate
+
+    Returns:
+        Indices of the packed texts in input order, and indices of the dropped texts in ranking order
+    """
+    ranking = range(len(texts)) if ranking is None else ranking
+
+    packed, dropped = [], []
+    used = 0
+    for idx in ranking:
+        tokens = count_tokens(texts[idx], encoding_name=encoding_name) + overhead
+        if used + tokens <= max_tokens:
+            packed.append(idx)
+            used += tokens
+        else:
+            dropped.append(idx)
+
+    return sorted(packed), dropped
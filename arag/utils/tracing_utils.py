@@ -0,0 +1,350 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# Span of the code currently running, inherited by the tasks and stage jobs it starts
+_current_span: contextvars.ContextVar = contextvars.ContextVar("arag_current_span", default=None)
+
+
+class Span:
+    """
+    A timed operation of a trace, e.g. a search, a pipeline stage or an LLM call.
+
+    Times are in nanoseconds since the epoch. Spans are exported when they end.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time", "attributes", "error", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._tracer = tracer
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Duration in seconds, None while the span is running."""
+        return None if self.end_time is None else (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            self._tracer._export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Span handed out while tracing is disabled, so instrumented code never checks."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def usage_attributes(usage: Any) -> Dict[str, Any]:
+    """Token counts of an LLM usage report (object, dict or JSON string) as span attributes."""
+    if isinstance(usage, str):
+        try:
+            usage = json.loads(usage)
+        except ValueError:
+            return {}
+    if usage is None:
+        return {}
+
+    attributes = {}
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens", "cache_hit"):
+        value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+        if value is not None:
+            attributes[field] = value
+    return attributes
+
+
+class JSONLinesExporter:
+    """
+    Append every finished span as one JSON line to a file.
+
+    Args:
+        path: File the spans are appended to
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, default=str)}
+
+
+class OTLPHTTPExporter:
+    """
+    Send spans to an OpenTelemetry collector with OTLP/HTTP in its JSON encoding.
+
+    Spans are buffered and posted in batches from a background thread, every `flush_interval`
+    seconds or as soon as `max_batch_size` spans are waiting, so exporting never blocks a search.
+
+    Args:
+        endpoint: Traces endpoint of the collector
+        service_name: `service.name` resource attribute
+        headers: Extra HTTP headers, e.g. for authentication
+        max_batch_size: Number of spans that triggers an immediate export
+        flush_interval: Seconds between two exports
+        timeout: Request timeout in seconds
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "arag",
+        headers: Optional[Dict[str, str]] = None,
+        max_batch_size: int = 256,
+        flush_interval: float = 5.0,
+        timeout: float = 10.0,
+    ) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        # Only needed by this exporter, `requests` stays out of the import of every agent
+        import requests
+
+        self._buffer: List[Span] = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run, name="arag-otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_time),
+                "endTimeUnixNano": str(span.end_time),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                # 1 = OK, 2 = ERROR
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]
+                    },
+                    "scopeSpans": [{"scope": {"name": "arag"}, "spans": otlp_spans}],
+                }
+            ]
+        }
+
+    def _send(self, spans: List[Span]) -> None:
+        import requests
+
+        try:
+            response = self._session.post(
+                self.endpoint, data=json.dumps(self._payload(spans)), headers=self.headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error exporting {len(spans)} spans: {e}")
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._stopped and len(self._buffer) < self.max_batch_size:
+                    self._condition.wait(self.flush_interval)
+                spans, self._buffer = self._buffer, []
+                stopped = self._stopped
+
+            if spans:
+                self._send(spans)
+            if stopped:
+                return
+
+    def export(self, spans: List[Span]) -> None:
+        with self._condition:
+            self._buffer.extend(spans)
+            if len(self._buffer) >= self.max_batch_size:
+                self._condition.notify()
+
+    def shutdown(self) -> None:
+        """Export the buffered spans and stop the background thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join(self.timeout)
+        self._session.close()
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to an exporter.
+
+    Without an exporter tracing is disabled and spans cost nothing. An exporter is any object
+    with an `export(spans)` method, such as `JSONLinesExporter` or `OTLPHTTPExporter`.
+
+    Args:
+        exporter: Receiver of finished spans (None disables tracing)
+    """
+
+    def __init__(self, exporter=None) -> None:
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def _export(self, span: Span) -> None:
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export([span])
+        except Exception as e:
+            print(f"Error exporting span {span.name}: {e}")
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """
+        Start a span without making it current, e.g. for spans held across `yield`.
+
+        Args:
+            name: Span name
+            parent: Parent span, the current span by default
+            **attributes: Initial attributes
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, parent if parent is not None else _current_span.get(), attributes)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Run the block in a new child span of the current one, recording any exception."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_error(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+# Process-wide tracer, used for spans started outside a span of another tracer
+_tracer = Tracer()
+
+
+def set_trace_exporter(exporter) -> None:
+    """Install the exporter of the process tracer (None disables it), meant for application setup."""
+    _tracer.exporter = exporter
+
+
+def get_tracer() -> Tracer:
+    """
+    Tracer of the current span, the process tracer outside any span.
+
+    Child spans thereby go to the tracer their trace was started with, e.g. the one of an `ARag`
+    given its own `trace_exporter`, through every task and stage job the trace spans.
+    """
+    current = _current_span.get()
+    return current._tracer if current is not None else _tracer
+
+
+def span(name: str, **attributes) -> contextlib.AbstractContextManager:
+    """Shortcut for `get_tracer().span(...)`."""
+    return get_tracer().span(name, **attributes)
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes) -> Span:
+    """Shortcut for `get_tracer().start_span(...)`, using the tracer of `parent` when given."""
+    tracer = parent._tracer if isinstance(parent, Span) else get_tracer()
+    return tracer.start_span(name, parent=parent, **attributes)
+
+
+@contextlib.contextmanager
+def use_span(span: Span) -> Iterator[Span]:
+    """Make a span started with `start_span` current for the block, without ending it."""
+    if isinstance(span, _NoopSpan):
+        yield span
+        return
+
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
@@ -1,26 +1,93 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from arag.utils.cache_utils import LRUCache, SQLiteCache
+from arag.utils.deadline_utils import check_deadline
+from arag.utils.singleflight import AsyncSingleFlight, SingleFlight
+from arag.utils.tracing_utils import span
+
+# Timeout used when no session-specific one is given: (connect, read) seconds
+DEFAULT_TIMEOUT = (5.0, 60.0)
+
+# Status codes meaning the server has no `/query_batch` endpoint
+_BATCH_UNSUPPORTED_STATUS = (404, 405, 501)
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def _build_session(
+    pool_connections: int = 10, pool_maxsize: int = 50, max_retries: int = 3, backoff_factor: float = 0.5
+) -> requests.Session:
+    """Create a keep-alive session with a bounded connection pool and retries with exponential backoff."""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def _get_shared_session() -> requests.Session:
+    """Per-process session used by the module-level helpers when no session is given."""
+    global _shared_session
 
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = _build_session()
+        return _shared_session
 
-def _get_chunks(vectordb_endopoint: str, query: str, filename: str, num_chunks: int = 3):
+
+def _get_chunks(
+    vectordb_endopoint: str,
+    query: str,
+    filename: str,
+    num_chunks: int = 3,
+    session: Optional[requests.Session] = None,
+    timeout=DEFAULT_TIMEOUT,
+):
 
     url = f"{vectordb_endopoint}/query"
     payload = {"query": query, "num_returns": num_chunks, "filename": filename}
 
-    response = requests.get(url, json=payload)
+    response = (session or _get_shared_session()).get(url, json=payload, timeout=timeout)
 
     return response.json()
 
 
-def _get_metadata(vectordb_endopoint):
+def _get_metadata(vectordb_endopoint, session: Optional[requests.Session] = None, timeout=DEFAULT_TIMEOUT):
 
     url = f"{vectordb_endopoint}/metadata"
 
-    response = requests.get(url)
+    response = (session or _get_shared_session()).get(url, timeout=timeout)
 
     return response.json()
 
 
-def _get_embeddings(text, model="nomic-embed-text", api_url="http://localhost:11434"):
+def _get_embeddings(
+    text,
+    model="nomic-embed-text",
+    api_url="http://localhost:11434",
+    session: Optional[requests.Session] = None,
+    timeout=DEFAULT_TIMEOUT,
+):
     """
     Get embeddings for the provided text using Ollama API.
 
@@ -28,6 +95,8 @@ def _get_embeddings(text, model="nomic-embed-text", api_url="http://localhost:11
         text (str): The text to generate embeddings for
         model (str): The model to use for embeddings, default is "nomic-embed-text"
         api_url (str): The base URL for Ollama API, default is "http://localhost:11434"
+        session (requests.Session): Session to send the request with, default is a shared pooled session
+        timeout: Request timeout in seconds, or a (connect, read) tuple
 
     Returns:
         list: The embedding vector if successful
@@ -38,7 +107,7 @@ def _get_embeddings(text, model="nomic-embed-text", api_url="http://localhost:11
     payload = {"model": model, "prompt": text}
 
     try:
-        response = requests.post(endpoint, json=payload)
+        response = (session or _get_shared_session()).post(endpoint, json=payload, timeout=timeout)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
         result = response.json()
@@ -52,4 +121,665 @@ def _get_embeddings(text, model="nomic-embed-text", api_url="http://localhost:11
 
     except requests.exceptions.RequestException as e:
         print(f"Error making request: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def _get_embeddings_batch(
+    texts: List[str],
+    model="nomic-embed-text",
+    api_url="http://localhost:11434",
+    session: Optional[requests.Session] = None,
+    timeout=DEFAULT_TIMEOUT,
+):
+    """
+    Get embeddings for several texts in one request using the Ollama `/api/embed` endpoint.
+
+    Args:
+        texts (List[str]): The texts to generate embeddings for
+        model (str): The model to use for embeddings, default is "nomic-embed-text"
+        api_url (str): The base URL for Ollama API, default is "http://localhost:11434"
+        session (requests.Session): Session to send the request with, default is a shared pooled session
+        timeout: Request timeout in seconds, or a (connect, read) tuple
+
+    Returns:
+        list: One embedding vector per text, in order
+
+    Raises:
+        requests.exceptions.HTTPError: If the server rejects the request (e.g. 404 on old Ollama versions)
+    """
+    endpoint = f"{api_url}/api/embed"
+
+    payload = {"model": model, "input": list(texts)}
+
+    response = (session or _get_shared_session()).post(endpoint, json=payload, timeout=timeout)
+    response.raise_for_status()
+
+    return response.json()["embeddings"]
+
+
+class EmbeddingCache:
+    """
+    Embedding cache keyed on a hash of the model name and the text content.
+
+    Entries live in an in-memory LRU and, when `disk_path` is given, in a SQLite file as well,
+    so they survive restarts and are shared by worker processes.
+
+    Args:
+        max_entries: Maximum number of embeddings kept in memory
+        disk_path: Optional SQLite file for a persistent second tier
+        max_disk_entries: Maximum number of embeddings kept on disk
+        ttl: Time to live in seconds (None = entries never expire)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 1_000_000,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.disk = SQLiteCache(disk_path, max_entries=max_disk_entries, ttl=ttl) if disk_path else None
+
+    @staticmethod
+    def _key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self._key(model, text)
+
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            cached = self.disk.get(key)
+            if cached is not None:
+                vector = json.loads(cached)
+                self.memory.set(key, vector)
+
+        return vector
+
+    def set(self, model: str, text: str, vector: List[float]) -> None:
+        key = self._key(model, text)
+
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            self.disk.set(key, json.dumps(vector))
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        """Async counterpart of `get`, reading the disk tier off the event loop."""
+        key = self._key(model, text)
+
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            cached = await self.disk.aget(key)
+            if cached is not None:
+                vector = json.loads(cached)
+                self.memory.set(key, vector)
+
+        return vector
+
+    async def aset(self, model: str, text: str, vector: List[float]) -> None:
+        key = self._key(model, text)
+
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            await self.disk.aset(key, json.dumps(vector))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+def _chunk_id(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+def _to_hits(query: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize a `/query` or `/query_batch` result into per-query hits.
+
+    Servers that do not return chunk IDs or scores get content-hash IDs and `None` scores.
+    """
+    chunks = result.get("chunks", [])
+
+    return {
+        "query": query,
+        "chunks": chunks,
+        "chunk_ids": result.get("chunk_ids") or [_chunk_id(chunk) for chunk in chunks],
+        "scores": result.get("scores") or [None] * len(chunks),
+    }
+
+
+def merge_hits(hits: List[Dict[str, Any]]) -> List[str]:
+    """
+    Merge per-query hits into unique chunks.
+
+    Chunks are deduplicated by chunk ID and ordered by their best score across queries when the
+    server returns scores, otherwise by first appearance.
+    """
+    best: Dict[str, Tuple[float, int, str]] = {}
+    position = 0
+
+    for hit in hits:
+        for chunk, chunk_id, score in zip(hit["chunks"], hit["chunk_ids"], hit["scores"]):
+            score = float("-inf") if score is None else score
+            if chunk_id not in best:
+                best[chunk_id] = (score, position, chunk)
+                position += 1
+            elif score > best[chunk_id][0]:
+                best[chunk_id] = (score, best[chunk_id][1], chunk)
+
+    return [chunk for _, _, chunk in sorted(best.values(), key=lambda entry: (-entry[0], entry[1]))]
+
+
+async def _aget_chunks(
+    http_client: httpx.AsyncClient,
+    vectordb_endopoint: str,
+    query: str,
+    filename: str,
+    num_chunks: int = 3,
+    timeout=httpx.USE_CLIENT_DEFAULT,
+):
+    """Async counterpart of `_get_chunks` using a shared `httpx.AsyncClient`."""
+    url = f"{vectordb_endopoint}/query"
+    payload = {"query": query, "num_returns": num_chunks, "filename": filename}
+
+    # httpx only accepts a body on GET through the generic `request` method
+    response = await http_client.request("GET", url, json=payload, timeout=timeout)
+
+    return response.json()
+
+
+async def _aget_metadata(http_client: httpx.AsyncClient, vectordb_endopoint: str, timeout=httpx.USE_CLIENT_DEFAULT):
+    """Async counterpart of `_get_metadata` using a shared `httpx.AsyncClient`."""
+    url = f"{vectordb_endopoint}/metadata"
+
+    response = await http_client.get(url, timeout=timeout)
+
+    return response.json()
+
+
+async def _aget_embeddings(
+    http_client: httpx.AsyncClient,
+    text,
+    model="nomic-embed-text",
+    api_url="http://localhost:11434",
+    timeout=httpx.USE_CLIENT_DEFAULT,
+):
+    """
+    Async counterpart of `_get_embeddings` using a shared `httpx.AsyncClient`.
+
+    Returns:
+        list: The embedding vector if successful
+        None: If the request failed
+    """
+    endpoint = f"{api_url}/api/embeddings"
+
+    payload = {"model": model, "prompt": text}
+
+    try:
+        response = await http_client.post(endpoint, json=payload, timeout=timeout)
+        response.raise_for_status()
+
+        result = response.json()
+
+        if "embedding" in result:
+            return result["embedding"]
+        else:
+            print(f"Unexpected response format: {result}")
+            return None
+
+    except httpx.HTTPError as e:
+        print(f"Error making request: {e}")
+        return None
+
+
+class VectorDBClient:
+    """
+    Connection-pooled client for the vector database and the Ollama embedding API.
+
+    Sync calls share one keep-alive `requests.Session` with retries and exponential backoff on
+    connection errors and 429/5xx responses; async calls share one `httpx.AsyncClient` with the
+    same pool size, created on first use. Embeddings are served from an `EmbeddingCache` when
+    possible. Pickling keeps only the configuration, so bound methods such as `get_embeddings`
+    can be sent to worker processes.
+
+    Args:
+        vectordb_endpoint: Base URL of the vector database API
+        embeddings_url: Base URL of the Ollama API
+        embedding_model: Ollama model used for embeddings
+        pool_connections: Number of per-host connection pools kept by the sync session
+        pool_maxsize: Maximum number of connections kept alive per host
+        keepalive_expiry: Seconds an idle async connection is kept alive
+        timeout: Request timeout in seconds, or a (connect, read) tuple
+        max_retries: Retries for failed requests
+        backoff_factor: Base of the exponential backoff between retries, in seconds
+        embedding_cache: Cache for embeddings, default is an in-memory `EmbeddingCache`
+    """
+
+    def __init__(
+        self,
+        vectordb_endpoint: str = "http://localhost:5000/api",
+        embeddings_url: str = "http://localhost:11434",
+        embedding_model: str = "nomic-embed-text",
+        pool_connections: int = 10,
+        pool_maxsize: int = 50,
+        keepalive_expiry: float = 30.0,
+        timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        embedding_cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self.vectordb_endpoint = vectordb_endpoint
+        self.embeddings_url = embeddings_url
+        self.embedding_model = embedding_model
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+
+        self.session = _build_session(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+        )
+        self._async_client: Optional[httpx.AsyncClient] = None
+        # Unknown until the first batch request, then whether `/query_batch` exists
+        self.batch_supported: Optional[bool] = None
+        # Same for the Ollama `/api/embed` endpoint, missing on old Ollama versions
+        self.embed_batch_supported: Optional[bool] = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("session")
+        state.pop("_async_client")
+        # Caches hold locks and database connections, workers start with an empty one
+        state.pop("embedding_cache")
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.session = _build_session(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.max_retries,
+            backoff_factor=self.backoff_factor,
+        )
+        self._async_client = None
+        self.embedding_cache = EmbeddingCache()
+
+    @staticmethod
+    def _to_httpx_timeout(timeout: Union[float, Tuple[float, float]]) -> httpx.Timeout:
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return httpx.Timeout(read, connect=connect)
+        return httpx.Timeout(timeout)
+
+    def _request_timeout(self) -> Union[float, Tuple[float, float]]:
+        """
+        The configured timeout, cut to what is left of the current deadline (see `deadline_scope`).
+
+        Raises:
+            DeadlineExceeded: If the deadline has already passed
+        """
+        remaining = check_deadline()
+        if remaining is None:
+            return self.timeout
+        if isinstance(self.timeout, tuple):
+            return tuple(min(value, remaining) for value in self.timeout)
+        return min(self.timeout, remaining)
+
+    def _arequest_timeout(self) -> httpx.Timeout:
+        return self._to_httpx_timeout(self._request_timeout())
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self._to_httpx_timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                # httpx transports only retry failed connection attempts
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+            )
+        return self._async_client
+
+    def get_chunks(self, query: str, filename: str, num_chunks: int = 3):
+        with span("vectordb.query", filename=filename, num_chunks=num_chunks):
+            return _get_chunks(
+                vectordb_endopoint=self.vectordb_endpoint,
+                query=query,
+                filename=filename,
+                num_chunks=num_chunks,
+                session=self.session,
+                timeout=self._request_timeout(),
+            )
+
+    def get_chunks_batch(
+        self, queries: List[str], filename: str, num_chunks: int = 3, map_func: Callable = map
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve chunks for several queries in one `/query_batch` request.
+
+        The server receives `{"queries": [...], "num_returns": int, "filename": str}` and answers
+        `{"results": [{"query": str, "chunks": [...], "chunk_ids": [...], "scores": [...]}]}` in
+        query order. Servers without the endpoint are remembered and served by one `/query` call
+        per query, dispatched through `map_func` so callers can fan them out.
+
+        Returns:
+            One hits dict per query, with "query", "chunks", "chunk_ids" and "scores"
+        """
+        if not queries:
+            return []
+
+        if self.batch_supported is not False:
+            payload = {"queries": list(queries), "num_returns": num_chunks, "filename": filename}
+            with span("vectordb.query_batch", filename=filename, num_queries=len(queries), num_chunks=num_chunks):
+                response = self.session.post(
+                    f"{self.vectordb_endpoint}/query_batch", json=payload, timeout=self._request_timeout()
+                )
+
+            if response.status_code in _BATCH_UNSUPPORTED_STATUS:
+                self.batch_supported = False
+            else:
+                response.raise_for_status()
+                self.batch_supported = True
+                return [_to_hits(query, result) for query, result in zip(queries, response.json()["results"])]
+
+        return list(
+            map_func(lambda query: _to_hits(query, self.get_chunks(query, filename, num_chunks)), list(queries))
+        )
+
+    def get_metadata(self):
+        with span("vectordb.metadata"):
+            return _get_metadata(self.vectordb_endpoint, session=self.session, timeout=self._request_timeout())
+
+    def get_metadata_conditional(self, etag: Optional[str] = None) -> Tuple[Optional[List[dict]], Optional[str]]:
+        """
+        Fetch the metadata catalog unless it still matches `etag`.
+
+        Returns:
+            (metadata, etag); metadata is None when the server answered 304 Not Modified
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        with span("vectordb.metadata", conditional=etag is not None) as request_span:
+            response = self.session.get(
+                f"{self.vectordb_endpoint}/metadata", headers=headers, timeout=self._request_timeout()
+            )
+            request_span.set_attribute("not_modified", response.status_code == 304)
+
+        if response.status_code == 304:
+            return None, etag
+
+        response.raise_for_status()
+        return response.json(), response.headers.get("ETag")
+
+    def get_embeddings(self, text):
+        vector = self.embedding_cache.get(self.embedding_model, text)
+        if vector is not None:
+            return vector
+
+        with span("embeddings.embed", model=self.embedding_model, num_texts=1):
+            vector = _get_embeddings(
+                text=text,
+                model=self.embedding_model,
+                api_url=self.embeddings_url,
+                session=self.session,
+                timeout=self._request_timeout(),
+            )
+        if vector is not None:
+            self.embedding_cache.set(self.embedding_model, text, vector)
+
+        return vector
+
+    def get_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed several texts, serving cached ones and sending the rest in a single `/api/embed` call.
+
+        Falls back to one `/api/embeddings` call per text on servers without the batch endpoint.
+
+        Returns:
+            One embedding vector per text, None for texts that could not be embedded
+        """
+        vectors = [self.embedding_cache.get(self.embedding_model, text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+
+        if not missing:
+            return vectors
+
+        embedded: Dict[str, Optional[List[float]]] = {}
+        if self.embed_batch_supported is not False:
+            try:
+                with span("embeddings.embed_batch", model=self.embedding_model, num_texts=len(missing)):
+                    batch = _get_embeddings_batch(
+                        missing,
+                        model=self.embedding_model,
+                        api_url=self.embeddings_url,
+                        session=self.session,
+                        timeout=self._request_timeout(),
+                    )
+                embedded = dict(zip(missing, batch))
+                self.embed_batch_supported = True
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    self.embed_batch_supported = False
+                else:
+                    print(f"Error making request: {e}")
+            except requests.exceptions.RequestException as e:
+                print(f"Error making request: {e}")
+
+        if self.embed_batch_supported is False:
+            embedded = {text: self.get_embeddings(text) for text in missing}
+
+        for text, vector in embedded.items():
+            if vector is not None:
+                self.embedding_cache.set(self.embedding_model, text, vector)
+
+        return [vector if vector is not None else embedded.get(text) for text, vector in zip(texts, vectors)]
+
+    async def aget_chunks(self, query: str, filename: str, num_chunks: int = 3):
+        with span("vectordb.query", filename=filename, num_chunks=num_chunks):
+            return await _aget_chunks(
+                http_client=self.async_client,
+                vectordb_endopoint=self.vectordb_endpoint,
+                query=query,
+                filename=filename,
+                num_chunks=num_chunks,
+                timeout=self._arequest_timeout(),
+            )
+
+    async def aget_chunks_batch(self, queries: List[str], filename: str, num_chunks: int = 3) -> List[Dict[str, Any]]:
+        """Async counterpart of `get_chunks_batch`; the per-query fallback runs concurrently."""
+        if not queries:
+            return []
+
+        if self.batch_supported is not False:
+            payload = {"queries": list(queries), "num_returns": num_chunks, "filename": filename}
+            with span("vectordb.query_batch", filename=filename, num_queries=len(queries), num_chunks=num_chunks):
+                response = await self.async_client.post(
+                    f"{self.vectordb_endpoint}/query_batch", json=payload, timeout=self._arequest_timeout()
+                )
+
+            if response.status_code in _BATCH_UNSUPPORTED_STATUS:
+                self.batch_supported = False
+            else:
+                response.raise_for_status()
+                self.batch_supported = True
+                return [_to_hits(query, result) for query, result in zip(queries, response.json()["results"])]
+
+        results = await asyncio.gather(*[self.aget_chunks(query, filename, num_chunks) for query in queries])
+
+        return [_to_hits(query, result) for query, result in zip(queries, results)]
+
+    async def aiter_chunks_batch(
+        self, queries: List[str], filename: str, num_chunks: int = 3
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield retrieval results as soon as they are available.
+
+        A `/query_batch` response is yielded as one list holding the hits of every query; on
+        servers without the endpoint each `/query` response is yielded on its own as it arrives.
+        """
+        if not queries:
+            return
+
+        if self.batch_supported is not False:
+            payload = {"queries": list(queries), "num_returns": num_chunks, "filename": filename}
+            with span("vectordb.query_batch", filename=filename, num_queries=len(queries), num_chunks=num_chunks):
+                response = await self.async_client.post(
+                    f"{self.vectordb_endpoint}/query_batch", json=payload, timeout=self._arequest_timeout()
+                )
+
+            if response.status_code in _BATCH_UNSUPPORTED_STATUS:
+                self.batch_supported = False
+            else:
+                response.raise_for_status()
+                self.batch_supported = True
+                yield [_to_hits(query, result) for query, result in zip(queries, response.json()["results"])]
+                return
+
+        async def _query(query):
+            return _to_hits(query, await self.aget_chunks(query, filename, num_chunks))
+
+        tasks = [asyncio.ensure_future(_query(query)) for query in queries]
+        try:
+            for next_hits in asyncio.as_completed(tasks):
+                yield [await next_hits]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aget_metadata(self):
+        with span("vectordb.metadata"):
+            return await _aget_metadata(self.async_client, self.vectordb_endpoint, timeout=self._arequest_timeout())
+
+    async def aget_metadata_conditional(
+        self, etag: Optional[str] = None
+    ) -> Tuple[Optional[List[dict]], Optional[str]]:
+        """Async counterpart of `get_metadata_conditional`."""
+        headers = {"If-None-Match": etag} if etag else {}
+        with span("vectordb.metadata", conditional=etag is not None) as request_span:
+            response = await self.async_client.get(
+                f"{self.vectordb_endpoint}/metadata", headers=headers, timeout=self._arequest_timeout()
+            )
+            request_span.set_attribute("not_modified", response.status_code == 304)
+
+        if response.status_code == 304:
+            return None, etag
+
+        response.raise_for_status()
+        return response.json(), response.headers.get("ETag")
+
+    async def aget_embeddings(self, text):
+        vector = await self.embedding_cache.aget(self.embedding_model, text)
+        if vector is not None:
+            return vector
+
+        with span("embeddings.embed", model=self.embedding_model, num_texts=1):
+            vector = await _aget_embeddings(
+                self.async_client,
+                text=text,
+                model=self.embedding_model,
+                api_url=self.embeddings_url,
+                timeout=self._arequest_timeout(),
+            )
+        if vector is not None:
+            await self.embedding_cache.aset(self.embedding_model, text, vector)
+
+        return vector
+
+    def close(self) -> None:
+        self.session.close()
+
+    async def aclose(self) -> None:
+        self.session.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class MetadataCache:
+    """
+    Cached metadata catalog with TTL and conditional revalidation.
+
+    Within `ttl` seconds the cached catalog is returned without any request. Afterwards it is
+    revalidated with `If-None-Match`, so an unchanged catalog costs a 304 without a body.
+    Concurrent refreshes are coalesced into one request, and documents are indexed by filename.
+    When revalidation fails, the cached catalog keeps being served for `error_ttl` seconds
+    before the next attempt; only the first fetch raises.
+
+    Args:
+        client: Client used to fetch the catalog
+        ttl: Seconds a fetched catalog is served before revalidation
+        error_ttl: Seconds a stale catalog is served after a failed revalidation
+    """
+
+    def __init__(self, client: VectorDBClient, ttl: float = 300.0, error_ttl: float = 10.0) -> None:
+        self.client = client
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+
+        self._metadata: Optional[List[dict]] = None
+        self._index: Dict[str, dict] = {}
+        self._etag: Optional[str] = None
+        self._expires_at = 0.0
+
+        self._refresh_flight = SingleFlight()
+        self._arefresh_flight = AsyncSingleFlight()
+
+    def _is_fresh(self) -> bool:
+        return self._metadata is not None and time.time() < self._expires_at
+
+    def _store(self, metadata: Optional[List[dict]], etag: Optional[str]) -> None:
+        # None means 304 Not Modified, keep the current catalog and index
+        if metadata is not None:
+            self._metadata = metadata
+            self._index = {m["filename"]: m for m in metadata}
+        self._etag = etag
+        self._expires_at = time.time() + self.ttl
+
+    def _refresh(self) -> None:
+        self._store(*self.client.get_metadata_conditional(etag=self._etag if self._metadata is not None else None))
+
+    async def _arefresh(self) -> None:
+        metadata, etag = await self.client.aget_metadata_conditional(
+            etag=self._etag if self._metadata is not None else None
+        )
+        self._store(metadata, etag)
+
+    def _serve_stale(self, exc: Exception) -> None:
+        """Keep serving the cached catalog after a failed revalidation, raise when there is none."""
+        if self._metadata is None:
+            raise exc
+        print(f"Error revalidating metadata, serving the cached catalog: {exc}")
+        self._expires_at = time.time() + self.error_ttl
+
+    def get(self) -> Tuple[List[dict], Dict[str, dict]]:
+        """Return the catalog and its filename index, refreshing them if the TTL expired."""
+        if not self._is_fresh():
+            try:
+                self._refresh_flight.do("metadata", self._refresh)
+            except Exception as e:
+                self._serve_stale(e)
+        return self._metadata, self._index
+
+    async def aget(self) -> Tuple[List[dict], Dict[str, dict]]:
+        """Async counterpart of `get`."""
+        if not self._is_fresh():
+            try:
+                await self._arefresh_flight.do("metadata", self._arefresh)
+            except Exception as e:
+                self._serve_stale(e)
+        return self._metadata, self._index
+
+    def invalidate(self) -> None:
+        """Force revalidation on the next access."""
+        self._expires_at = 0.0
@@ -0,0 +1 @@
+"""Offline benchmarks of the ARag pipeline against deterministic fake LLM and vector database servers."""
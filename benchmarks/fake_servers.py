@@ -0,0 +1,442 @@
+"""
+Deterministic local stand-ins for the services ARag talks to.
+
+`FakeLLMServer` speaks the subset of the OpenAI chat completions API used by the agents
+(plain, streamed and structured responses). `FakeVectorDBServer` serves the vector database
+(`/api/query`, `/api/query_batch`, `/api/metadata`) and Ollama embedding (`/api/embed`,
+`/api/embeddings`) endpoints from a synthetic corpus. Responses and latencies only depend on
+the request and the seed, so two runs with the same configuration see the same traffic.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_WORDS = (
+    "hydraulic pump valve pressure filter engine coolant bolt torque boom arm bucket track idler "
+    "sprocket swing motor pilot relief cylinder seal hose fitting sensor harness fuse relay "
+    "battery alternator starter injector turbocharger radiator fan belt tension adjust inspect "
+    "replace drain refill lubricate grease interval hours warning caution procedure step check"
+).split()
+
+
+@dataclass
+class LatencyModel:
+    """
+    Log-normal latency: half of the requests are faster than `median` seconds, and `sigma`
+    controls the tail (p95 is about `median * exp(1.645 * sigma)`).
+    """
+
+    median: float = 0.0
+    sigma: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(rng.gauss(0.0, self.sigma)) if self.sigma > 0 else self.median
+
+
+@dataclass
+class FakeServerConfig:
+    """
+    Behaviour of the fake services.
+
+    Args:
+        seed: Seed mixed into every latency and content draw
+        llm_latency: Time to first token of an LLM call
+        llm_tokens_per_second: Generation speed added per completion token (0 = instant)
+        vectordb_latency: Latency of a `/query`, `/query_batch` or `/metadata` request
+        embeddings_latency: Latency of an embedding request
+        num_documents: Number of documents in the catalog
+        chunks_per_document: Number of distinct chunks per document
+        chunk_words: Words per chunk
+        missing_info_rate: Share of knowledge blocks for which MissingInfoAgent reports a gap
+        sufficiency_rate: Share of SufficiencyAgent calls that find the knowledge sufficient
+        answer_words: Words of a generated answer
+        embedding_dim: Dimension of the embedding vectors
+        query_batch: Serve `/api/query_batch` (False answers 404, exercising the per-query fallback)
+    """
+
+    seed: int = 0
+    llm_latency: LatencyModel = field(default_factory=lambda: LatencyModel(0.8, 0.5))
+    llm_tokens_per_second: float = 0.0
+    vectordb_latency: LatencyModel = field(default_factory=lambda: LatencyModel(0.05, 0.3))
+    embeddings_latency: LatencyModel = field(default_factory=lambda: LatencyModel(0.02, 0.3))
+    num_documents: int = 3
+    chunks_per_document: int = 60
+    chunk_words: int = 250
+    missing_info_rate: float = 0.2
+    sufficiency_rate: float = 0.5
+    answer_words: int = 300
+    embedding_dim: int = 256
+    query_batch: bool = True
+
+
+def _rng(seed: int, *parts: Any) -> random.Random:
+    """Random generator derived from the seed and the request content."""
+    digest = hashlib.sha1(json.dumps([seed, *parts], sort_keys=True, default=str).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _text(rng: random.Random, num_words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(num_words))
+
+
+def _count_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+
+    def add(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    """Keep-alive JSON request handler; subclasses implement `route`."""
+
+    protocol_version = "HTTP/1.1"
+    server: "_FakeServer"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/_stats":
+            self._send_json(200, self.server.stats.snapshot())
+            return
+
+        self.server.stats.add(f"{method} {path}")
+        try:
+            self.route(method, path, self._body())
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def route(self, method: str, path: str, body: Any) -> None:
+        raise NotImplementedError
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, config: FakeServerConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), handler)
+        self.config = config
+        self.stats = _Stats()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_FakeServer":
+        threading.Thread(target=self.serve_forever, name=self.__class__.__name__, daemon=True).start()
+        return self
+
+
+# ---------------------------------------------------------------------------------------------
+# LLM
+# ---------------------------------------------------------------------------------------------
+
+
+def _from_schema(schema: Dict[str, Any], defs: Dict[str, Any], rng: random.Random) -> Any:
+    """Generic value matching a JSON schema, used for schemas without a dedicated handler."""
+    if "$ref" in schema:
+        return _from_schema(defs[schema["$ref"].split("/")[-1]], defs, rng)
+    if "anyOf" in schema:
+        return _from_schema(schema["anyOf"][0], defs, rng)
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _from_schema(prop, defs, rng) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_from_schema(schema.get("items", {}), defs, rng) for _ in range(rng.randint(1, 3))]
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "integer":
+        return rng.randint(0, 10)
+    if kind == "number":
+        return rng.random()
+    return _text(rng, 12)
+
+
+class _LLMHandler(_JSONHandler):
+    def route(self, method: str, path: str, body: Any) -> None:
+        if method != "POST" or not path.endswith("/chat/completions"):
+            self._send_json(404, {"error": f"Unknown route {method} {path}"})
+            return
+
+        config = self.server.config
+        messages = body["messages"]
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        rng = _rng(config.seed, messages)
+
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            json_schema = response_format["json_schema"]
+            content = json.dumps(self._structured(json_schema["name"], json_schema["schema"], user, rng))
+            self.server.stats.add(f"schema {json_schema['name']}")
+        else:
+            content = self._answer(user, rng)
+            self.server.stats.add("schema text")
+
+        prompt_tokens = _count_tokens(system) + _count_tokens(user)
+        completion_tokens = _count_tokens(content)
+        self.server.stats.add("prompt_tokens", prompt_tokens)
+        self.server.stats.add("completion_tokens", completion_tokens)
+
+        time.sleep(config.llm_latency.sample(rng))
+        generation_time = completion_tokens / config.llm_tokens_per_second if config.llm_tokens_per_second else 0.0
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if body.get("stream"):
+            self._stream(body["model"], content, usage, generation_time)
+            return
+
+        time.sleep(generation_time)
+        self._send_json(
+            200,
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    def _stream(self, model: str, content: str, usage: Dict[str, int], generation_time: float) -> None:
+        """Send the content as server-sent events, a few words per chunk, then the usage chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        words = content.split(" ")
+        pieces = [" ".join(words[i : i + 4]) + " " for i in range(0, len(words), 4)]
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+
+        for piece in pieces:
+            time.sleep(generation_time / len(pieces))
+            chunk = {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _answer(self, user: str, rng: random.Random) -> str:
+        paragraphs = []
+        words_left = self.server.config.answer_words
+        while words_left > 0:
+            num_words = min(words_left, rng.randint(40, 80))
+            paragraphs.append(_text(rng, num_words).capitalize() + ".")
+            words_left -= num_words
+        return "\n\n".join(paragraphs)
+
+    def _structured(self, name: str, schema: Dict[str, Any], user: str, rng: random.Random) -> Any:
+        config = self.server.config
+
+        if name == "DocumentSelectionSchema":
+            filenames = re.findall(r"<filename>(.*?)</filename>", user)
+            return {"filename": rng.choice(filenames) if filenames else ""}
+
+        if name == "QueryRewriterSchema":
+            query = re.search(r"<user_query>(.*?)</user_query>", user, re.S)
+            num_queries = re.search(r"<num_queries>(\d+)</num_queries>", user)
+            query = query.group(1) if query else user[:100]
+            count = int(num_queries.group(1)) if num_queries else 5
+            return {"rewritten_queries": [f"{query} {rng.choice(_WORDS)} {i}" for i in range(count)]}
+
+        if name == "KnowledgeBatchSchema":
+            chunk_ids = re.findall(r'<document_chunk id="([^"]+)">', user)
+            return {"entries": [{"chunk_id": chunk_id, "knowledge": _text(rng, 60)} for chunk_id in chunk_ids]}
+
+        if name == "KnowledgeSchema":
+            return {"knowledge": _text(rng, 60)}
+
+        if name == "MissingInfoSchema":
+            if rng.random() >= config.missing_info_rate:
+                return {"missing_information": []}
+            return {
+                "missing_information": [
+                    {
+                        "reference_context": _text(rng, 10),
+                        "what_im_looking_for": _text(rng, 8),
+                        "section": f"Section {rng.randint(1, 12)}",
+                    }
+                ]
+            }
+
+        if name == "SufficiencySchema":
+            if rng.random() < config.sufficiency_rate:
+                return {"is_sufficient": True, "needed_references": []}
+            num_references = len(re.findall(r"<reference number=", user))
+            needed = rng.sample(range(num_references), k=min(num_references, rng.randint(1, 3)))
+            return {"is_sufficient": False, "needed_references": needed}
+
+        return _from_schema(schema, schema.get("$defs", {}), rng)
+
+
+class FakeLLMServer(_FakeServer):
+    """OpenAI-compatible chat completions server; use `url + "/v1"` as the client base URL."""
+
+    def __init__(self, config: FakeServerConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__(_LLMHandler, config, host, port)
+
+
+# ---------------------------------------------------------------------------------------------
+# Vector database and embeddings
+# ---------------------------------------------------------------------------------------------
+
+
+class _VectorDBHandler(_JSONHandler):
+    def route(self, method: str, path: str, body: Any) -> None:
+        config = self.server.config
+        rng = _rng(config.seed, path, body)
+
+        if path == "/api/metadata":
+            time.sleep(config.vectordb_latency.sample(rng))
+            etag = self.server.metadata_etag
+            if self.headers.get("If-None-Match") == etag:
+                self._send_json(304, None, {"ETag": etag})
+            else:
+                self._send_json(200, self.server.metadata, {"ETag": etag})
+            return
+
+        if path == "/api/query":
+            time.sleep(config.vectordb_latency.sample(rng))
+            self._send_json(200, self.server.query(body["query"], body.get("filename"), body.get("num_returns", 3)))
+            return
+
+        if path == "/api/query_batch" and config.query_batch:
+            time.sleep(config.vectordb_latency.sample(rng))
+            results = [
+                {"query": query, **self.server.query(query, body.get("filename"), body.get("num_returns", 3))}
+                for query in body["queries"]
+            ]
+            self._send_json(200, {"results": results})
+            return
+
+        if path == "/api/embed":
+            time.sleep(config.embeddings_latency.sample(rng))
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            self.server.stats.add("embedded_texts", len(texts))
+            self._send_json(200, {"model": body.get("model"), "embeddings": [self.server.embed(t) for t in texts]})
+            return
+
+        if path == "/api/embeddings":
+            time.sleep(config.embeddings_latency.sample(rng))
+            self.server.stats.add("embedded_texts")
+            self._send_json(200, {"embedding": self.server.embed(body["prompt"])})
+            return
+
+        self._send_json(404, {"error": f"Unknown route {method} {path}"})
+
+
+class FakeVectorDBServer(_FakeServer):
+    """
+    Vector database and Ollama embedding server over a synthetic corpus.
+
+    Use `url + "/api"` as the vector database endpoint and `url` as the embeddings URL.
+    """
+
+    def __init__(self, config: FakeServerConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__(_VectorDBHandler, config, host, port)
+
+        self.documents: Dict[str, List[str]] = {}
+        self.metadata = []
+        for doc_idx in range(config.num_documents):
+            rng = _rng(config.seed, "document", doc_idx)
+            filename = f"manual_{doc_idx}.pdf"
+            sections = [f"Section {i}: {_text(rng, 3)}" for i in range(1, 13)]
+            self.documents[filename] = [
+                f"{rng.choice(sections)}\n{_text(rng, config.chunk_words)}" for _ in range(config.chunks_per_document)
+            ]
+            self.metadata.append({"filename": filename, "summary": _text(rng, 40), "table_of_contents": sections})
+        self.metadata_etag = hashlib.sha1(json.dumps(self.metadata).encode("utf-8")).hexdigest()
+
+    def query(self, query: str, filename: Optional[str], num_returns: int) -> Dict[str, Any]:
+        """Deterministic top-k: close queries (sharing their first words) share most of their chunks."""
+        chunks = self.documents.get(filename) or next(iter(self.documents.values()))
+        topic = " ".join(query.split()[:6])
+        pool_size = min(len(chunks), 3 * num_returns)
+        pool = _rng(self.config.seed, "pool", filename, topic).sample(range(len(chunks)), pool_size)
+        picked = _rng(self.config.seed, "pick", filename, query).sample(pool, min(len(pool), num_returns))
+        scores = sorted((round(1.0 - 0.05 * rank, 3) for rank in range(len(picked))), reverse=True)
+
+        return {
+            "chunks": [chunks[idx] for idx in picked],
+            "chunk_ids": [f"{filename}:{idx}" for idx in picked],
+            "scores": scores,
+        }
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.random.RandomState(zlib.crc32(text.encode("utf-8"))).standard_normal(self.config.embedding_dim)
+        return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+def start_servers(config: Optional[FakeServerConfig] = None) -> Tuple[FakeLLMServer, FakeVectorDBServer]:
+    """Start both fake servers on free local ports, in background threads of this process."""
+    config = config or FakeServerConfig()
+    return FakeLLMServer(config).start(), FakeVectorDBServer(config).start()
+
+
+def serve(config: FakeServerConfig, ready) -> None:
+    """Process entry point: start the servers, report their URLs through `ready` and serve forever."""
+    llm_server, vectordb_server = start_servers(config)
+    ready.put((llm_server.url, vectordb_server.url))
+    threading.Event().wait()
@@ -0,0 +1,90 @@
+"""
+Measure the cold import time of the package and guard against heavy dependencies loading eagerly.
+
+    python -m benchmarks.import_time --repeat 5 --max-ms 500
+
+Every import runs in a fresh interpreter. Besides the time, the run reports which heavy
+dependencies each module pulled in, and fails (exit code 1) when a module loads one of the
+dependencies it must not load at import time, or when `--max-ms` is exceeded.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Dependencies expected to load only when first used
+HEAVY_MODULES = ("openai", "numpy", "tiktoken", "sklearn", "scipy", "Levenshtein", "httpx", "requests")
+
+# Module imported -> heavy dependencies allowed at import time
+GUARDED_IMPORTS = {
+    "arag": (),
+    # The vector DB client is built on both HTTP clients, the pipeline imports it eagerly
+    "arag.agent_pipeline": ("httpx", "requests"),
+    "arag.arag_agents": (),
+}
+
+_PROBE = """
+import json, sys, time
+started_at = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started_at
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str, repeat: int) -> Dict[str, Any]:
+    """Import `module` in `repeat` fresh interpreters and return the median time and loaded heavy modules."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    times, loaded = [], set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        loaded.update(result["loaded"])
+
+    return {"median_ms": statistics.median(times) * 1000, "max_ms": max(times) * 1000, "loaded": sorted(loaded)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail when a median import takes longer")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results, failures = {}, []
+    print("module                     median_ms   max_ms  heavy modules loaded")
+    for module, allowed in GUARDED_IMPORTS.items():
+        result = measure(module, args.repeat)
+        results[module] = result
+        print(f"{module:<26} {result['median_ms']:>9.1f} {result['max_ms']:>8.1f}  {', '.join(result['loaded']) or '-'}")
+
+        unexpected: List[str] = [name for name in result["loaded"] if name not in allowed]
+        if unexpected:
+            failures.append(f"{module} loads {', '.join(unexpected)} at import time")
+        if args.max_ms is not None and result["median_ms"] > args.max_ms:
+            failures.append(f"{module} takes {result['median_ms']:.1f}ms to import (limit {args.max_ms:.1f}ms)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Replay a query corpus through `ARag.search` against the fake servers and report performance.
+
+    python -m benchmarks.run --repeat 3 --concurrency 4 --output results.json
+
+The fake servers run in a child process so their threads and memory do not skew the numbers.
+Reported: end-to-end latency percentiles, calls per stage (executor metrics), calls and tokens
+per agent action (action registry), requests seen by the servers, and peak RSS of this process.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List
+
+import requests
+from openai import AsyncOpenAI, OpenAI
+
+from arag import ARag
+from arag.arag_agents.decorators.agent_registry import clear_registry, get_action_stats
+from arag.utils.executor_utils import StageExecutor
+from arag.utils.vectordb_utils import VectorDBClient
+from benchmarks.fake_servers import FakeServerConfig, LatencyModel, serve
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "queries.jsonl")
+
+
+class BenchmarkARag(ARag):
+    """ARag talking to the fake LLM server instead of Gemini."""
+
+    def __init__(self, llm_base_url: str, **kwargs) -> None:
+        self._llm_base_url = llm_base_url
+        super().__init__(**kwargs)
+
+    def _init_client(self, api_key: str):
+        self.openai_client = OpenAI(api_key=api_key, base_url=self._llm_base_url, max_retries=0)
+        self.async_openai_client = AsyncOpenAI(api_key=api_key, base_url=self._llm_base_url, max_retries=0)
+
+
+def load_queries(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["query"] for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _server_stats(url: str) -> Dict[str, int]:
+    return requests.get(f"{url}/_stats", timeout=10).json()
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    config = FakeServerConfig(
+        seed=args.seed,
+        llm_latency=LatencyModel(args.llm_median, args.llm_sigma),
+        llm_tokens_per_second=args.llm_tokens_per_second,
+        vectordb_latency=LatencyModel(args.vectordb_median, args.vectordb_sigma),
+        embeddings_latency=LatencyModel(args.embeddings_median, args.embeddings_sigma),
+        missing_info_rate=args.missing_info_rate,
+        sufficiency_rate=args.sufficiency_rate,
+        query_batch=not args.no_query_batch,
+    )
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    server_process = context.Process(target=serve, args=(config, ready), daemon=True)
+    server_process.start()
+    llm_url, vectordb_url = ready.get(timeout=30)
+
+    try:
+        executor = StageExecutor(max_workers=args.max_workers)
+        arag = BenchmarkARag(
+            llm_base_url=f"{llm_url}/v1",
+            api_key="benchmark",
+            user_id="benchmark",
+            vectordb_client=VectorDBClient(vectordb_endpoint=f"{vectordb_url}/api", embeddings_url=vectordb_url),
+            executor=executor,
+        )
+
+        queries = load_queries(args.queries)
+        for query in queries[: args.warmup]:
+            arag.search(query)
+        clear_registry()
+        executor_baseline = executor.metrics()
+
+        workload = [query for _ in range(args.repeat) for query in queries]
+        latencies, failures = [], 0
+
+        def _timed(query):
+            started_at = time.perf_counter()
+            arag.search(query, timeout=args.timeout)
+            return time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in concurrent.futures.as_completed([pool.submit(_timed, query) for query in workload]):
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    failures += 1
+                    print(f"Search failed: {type(e).__name__}: {e}")
+        wall_time = time.perf_counter() - started_at
+
+        stages = {}
+        for stage, metrics in executor.metrics().items():
+            baseline = executor_baseline.get(stage, {})
+            stages[stage] = {key: value - baseline.get(key, 0) for key, value in metrics.items()}
+
+        actions = {
+            action: {key: stats[key] for key in ("count", "cache_hits", "mean_time", "max_time", "total_tokens")}
+            for action, stats in get_action_stats().items()
+        }
+
+        return {
+            "searches": len(workload),
+            "failures": failures,
+            "concurrency": args.concurrency,
+            "wall_time": wall_time,
+            "throughput": len(latencies) / wall_time if wall_time else 0.0,
+            "latency": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "mean": sum(latencies) / len(latencies),
+                "max": max(latencies),
+            }
+            if latencies
+            else {},
+            "stages": stages,
+            "actions": actions,
+            "tokens": sum(stats["total_tokens"] for stats in actions.values()),
+            "llm_server": _server_stats(llm_url),
+            "vectordb_server": _server_stats(vectordb_url),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        server_process.terminate()
+        server_process.join()
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\n{results['searches']} searches, {results['failures']} failed, concurrency {results['concurrency']}")
+    print(f"wall time {results['wall_time']:.2f}s, throughput {results['throughput']:.2f} searches/s")
+
+    latency = results["latency"]
+    if latency:
+        print(
+            f"latency  p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s  "
+            f"max {latency['max']:.3f}s"
+        )
+
+    print("\nstage                      submitted  completed  failed  max_queue_depth")
+    for stage, metrics in sorted(results["stages"].items()):
+        print(
+            f"{stage:<26} {metrics['submitted']:>9}  {metrics['completed']:>9}  {metrics['failed']:>6}  "
+            f"{metrics['max_queue_depth']:>15}"
+        )
+
+    print("\naction                     calls  cache_hits  mean_time  tokens")
+    for action, stats in sorted(results["actions"].items()):
+        print(
+            f"{action:<26} {stats['count']:>5}  {stats['cache_hits']:>10}  {stats['mean_time']:>8.3f}s  "
+            f"{stats['total_tokens']:>6}"
+        )
+
+    print(f"\ntokens {results['tokens']}, peak RSS {results['peak_rss_mb']:.1f} MB")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="JSON lines file with a `query` per line")
+    parser.add_argument("--repeat", type=int, default=1, help="Times the corpus is replayed")
+    parser.add_argument("--warmup", type=int, default=1, help="Queries run before measuring")
+    parser.add_argument("--concurrency", type=int, default=1, help="Searches running at the same time")
+    parser.add_argument("--timeout", type=float, default=None, help="Latency budget per search in seconds")
+    parser.add_argument("--max-workers", type=int, default=32, help="Size of the stage executor pool")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-median", type=float, default=0.8, help="Median LLM latency in seconds")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="Log-normal sigma of the LLM latency")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="Generation speed, 0 = instant")
+    parser.add_argument("--vectordb-median", type=float, default=0.05)
+    parser.add_argument("--vectordb-sigma", type=float, default=0.3)
+    parser.add_argument("--embeddings-median", type=float, default=0.02)
+    parser.add_argument("--embeddings-sigma", type=float, default=0.3)
+    parser.add_argument("--missing-info-rate", type=float, default=0.2)
+    parser.add_argument("--sufficiency-rate", type=float, default=0.5)
+    parser.add_argument("--no-query-batch", action="store_true", help="Disable the /api/query_batch endpoint")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,15 @@ from setuptools import find_packages, setup
 setup(
     name="arag",
     version="0.8.6",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*", "tests", "tests.*"]),
     install_requires=[
         "openai",
         "pydantic",
         "numpy",
-        "scikit-learn",
         "tiktoken",
         "pyyaml",
         "requests",
-        "python-levenshtein"
+        "httpx"
     ],
     author="newport solutions",
     author_email="contact@newport.ro",
@@ -0,0 +1,83 @@
+import json
+import threading
+
+from arag.arag_agents.decorators import agent_registry
+from arag.arag_agents.decorators.agent_registry import ActionRegistry
+
+
+def _action(idx: int) -> dict:
+    return {"query": f"q{idx}", "action": "action-test", "elapsed_time": 0.01, "token_count": None, "response": "r"}
+
+
+def test_resizing_while_recording_loses_no_entries():
+    registry = ActionRegistry(max_entries=100_000)
+    stop = threading.Event()
+
+    def _resize():
+        size = 100_000
+        while not stop.is_set():
+            size = 100_001 if size == 100_000 else 100_000
+            registry.configure(max_entries=size)
+
+    resizer = threading.Thread(target=_resize)
+    resizer.start()
+    try:
+        for idx in range(20_000):
+            registry.record(_action(idx))
+    finally:
+        stop.set()
+        resizer.join()
+
+    assert len(registry.entries()) == 20_000
+    assert registry.stats()["action-test"]["count"] == 20_000
+
+
+def test_ring_buffer_keeps_the_most_recent_entries():
+    registry = ActionRegistry(max_entries=3)
+    for idx in range(5):
+        registry.record(_action(idx))
+
+    assert [entry["query"] for entry in registry.entries()] == ["q2", "q3", "q4"]
+    assert all(entry["response"] is None for entry in registry.entries())
+
+    registry.configure(max_entries=2, retain_responses=True)
+    registry.record(_action(5))
+    assert [entry["query"] for entry in registry.entries()] == ["q4", "q5"]
+    assert registry.entries()[-1]["response"] == "r"
+
+
+def test_exports_keep_the_per_query_format_and_write_stats_separately(tmp_path, monkeypatch):
+    registry = ActionRegistry()
+    monkeypatch.setattr(agent_registry, "action_registry", registry)
+    registry.record(_action(0))
+    registry.record(_action(0))
+    registry.record(_action(1))
+
+    agent_registry.export_registry_to_json(str(tmp_path / "actions.json"))
+    actions = json.loads((tmp_path / "actions.json").read_text())
+    assert list(actions) == ["q0", "q1"]
+    assert len(actions["q0"]) == 2
+    assert actions["q1"][0]["action"] == "action-test" and "query" not in actions["q1"][0]
+
+    agent_registry.export_stats_to_json(str(tmp_path / "stats.json"))
+    stats = json.loads((tmp_path / "stats.json").read_text())
+    assert stats["action-test"]["count"] == 3
+    assert sum(stats["action-test"]["latency_histogram"].values()) == 3
+
+
+def test_timing_is_printed_only_when_verbose(capsys, monkeypatch):
+    registry = ActionRegistry()
+    monkeypatch.setattr(agent_registry, "action_registry", registry)
+
+    class _Agent:
+        @agent_registry.register_action("action-test")
+        def action(self, query):
+            return "answer", None
+
+    _Agent().action("question")
+    assert capsys.readouterr().out == ""
+
+    registry.configure(verbose=True)
+    _Agent().action("question")
+    assert "[action-test] - Time:" in capsys.readouterr().out
+    assert registry.stats()["action-test"]["count"] == 2
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from arag.utils.cache_utils import LRUCache, SQLiteCache
+
+
+def test_sqlite_cache_evicts_least_recently_used_in_batches(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), max_entries=10, evict_batch=4)
+    for idx in range(10):
+        cache.set(f"key{idx}", f"value{idx}")
+    assert cache.stats()["evictions"] == 0
+
+    cache.get("key0")
+    cache.set("key10", "value10")
+
+    # One batch brings the cache down to max_entries - evict_batch, keeping the recently read key
+    assert cache.stats()["evictions"] == 5
+    assert cache.stats()["size"] == 6
+    assert cache.get("key0") == "value0"
+    assert cache.get("key1") is None
+
+
+def test_sqlite_cache_counts_existing_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, max_entries=5, evict_batch=1)
+    for idx in range(5):
+        cache.set(f"key{idx}", "value")
+    cache.close()
+
+    reopened = SQLiteCache(path, max_entries=5, evict_batch=1)
+    reopened.set("key5", "value")
+
+    assert reopened.stats()["size"] == 4
+
+
+def test_sqlite_cache_async_methods_run_off_the_event_loop(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"))
+    threads = []
+    get = cache.get
+
+    def _get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    cache.get = _get
+
+    async def _roundtrip():
+        await cache.aset("key", "value")
+        return await cache.aget("key")
+
+    assert asyncio.run(_roundtrip()) == "value"
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_lru_cache_async_methods():
+    cache = LRUCache(max_entries=2)
+
+    async def _roundtrip():
+        await cache.aset("key", "value")
+        return await cache.aget("key")
+
+    assert asyncio.run(_roundtrip()) == "value"
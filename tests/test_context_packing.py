@@ -0,0 +1,46 @@
+import pytest
+
+from arag.utils import token_utils
+from arag.utils.citation_system import rank_by_similarity
+from arag.utils.token_utils import pack_by_token_budget
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # One token per word keeps the budgets readable
+    monkeypatch.setattr(token_utils, "count_tokens", lambda text, encoding_name=None: len(text.split()))
+
+
+def test_packing_follows_the_ranking_and_returns_input_order():
+    texts = ["a " * 4, "b " * 3, "c " * 2, "d " * 5]
+
+    packed, dropped = pack_by_token_budget(texts, max_tokens=9, ranking=[3, 2, 1, 0])
+
+    # d (5) and c (2) fit, b (3) would exceed 9, a (4) too
+    assert packed == [2, 3]
+    assert dropped == [1, 0]
+
+
+def test_smaller_less_relevant_texts_fill_the_remaining_budget():
+    texts = ["a " * 6, "b " * 5, "c " * 3]
+
+    packed, dropped = pack_by_token_budget(texts, max_tokens=9)
+
+    assert packed == [0, 2]
+    assert dropped == [1]
+
+
+def test_overhead_counts_against_the_budget():
+    texts = ["a " * 3, "b " * 3, "c " * 3]
+
+    assert pack_by_token_budget(texts, max_tokens=9) == ([0, 1, 2], [])
+    # 2 tokens of tags per text, only two of them fit
+    assert pack_by_token_budget(texts, max_tokens=10, overhead=2) == ([0, 1], [2])
+
+
+def test_rank_by_similarity_orders_by_cosine_similarity():
+    query = [1.0, 0.0]
+    vectors = [[0.0, 1.0], None, [2.0, 0.1], [1.0, 1.0], [0.0, 0.0], [4.0, 4.0]]
+
+    # Equal directions tie and keep input order, missing vectors rank last
+    assert rank_by_similarity(query, vectors) == [2, 3, 5, 0, 4, 1]
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from arag.arag_agents.utils.agent_primitives import aclient_message, client_message
+from arag.utils.deadline_utils import (DeadlineExceeded, deadline_scope,
+                                       gather_until_deadline, get_deadline)
+from arag.utils.retry_utils import RetryPolicy
+
+# Scheduling slack allowed past a deadline
+SLACK = 0.25
+
+
+class _SlowCompletions:
+    """Chat completions that take `latency` seconds and honor the per-request `timeout` like the SDK."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    def _response(self):
+        usage = SimpleNamespace(total_tokens=1, json=lambda: "{}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))], usage=usage)
+
+    def create(self, timeout=None, **kwargs):
+        self.calls += 1
+        if timeout is not None and timeout < self.latency:
+            time.sleep(timeout)
+            raise TimeoutError("Request timed out")
+        time.sleep(self.latency)
+        return self._response()
+
+
+class _AsyncSlowCompletions(_SlowCompletions):
+    async def create(self, timeout=None, **kwargs):
+        self.calls += 1
+        if timeout is not None and timeout < self.latency:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("Request timed out")
+        await asyncio.sleep(self.latency)
+        return self._response()
+
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+def test_request_timeout_past_deadline_raises_deadline_exceeded():
+    completions = _SlowCompletions(latency=5.0)
+
+    started_at = time.monotonic()
+    with deadline_scope(timeout=0.3), pytest.raises(DeadlineExceeded):
+        client_message(
+            user_message="question",
+            openai_client=_client(completions),
+            model="model",
+            retry_policy=RetryPolicy(max_attempts=5, base_delay=0.01),
+        )
+
+    assert time.monotonic() - started_at < 0.3 + SLACK
+    # The timed out attempt is not retried past the deadline
+    assert completions.calls == 1
+
+
+def test_async_request_timeout_past_deadline_raises_deadline_exceeded():
+    completions = _AsyncSlowCompletions(latency=5.0)
+
+    async def _call():
+        with deadline_scope(timeout=0.3):
+            return await aclient_message(
+                user_message="question",
+                openai_client=_client(completions),
+                model="model",
+                retry_policy=RetryPolicy(max_attempts=5, base_delay=0.01),
+            )
+
+    started_at = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(_call())
+
+    assert time.monotonic() - started_at < 0.3 + SLACK
+
+
+def test_timeout_before_deadline_is_not_converted():
+    completions = _SlowCompletions(latency=5.0)
+
+    # The request timeout of the client itself, not the deadline, expires first
+    def _create(**kwargs):
+        raise TimeoutError("Request timed out")
+
+    completions.create = _create
+    with deadline_scope(timeout=10.0), pytest.raises(TimeoutError) as excinfo:
+        client_message(user_message="question", openai_client=_client(completions), model="model")
+
+    assert not isinstance(excinfo.value, DeadlineExceeded)
+
+
+def test_nested_scope_only_tightens_the_deadline():
+    with deadline_scope(timeout=1.0) as outer:
+        with deadline_scope(timeout=60.0) as inner:
+            assert inner == outer == get_deadline()
+        with deadline_scope(timeout=0.1) as tighter:
+            assert tighter < outer
+        assert get_deadline() == outer
+    assert get_deadline() is None
+
+
+def test_gather_until_deadline_cancels_tasks_still_running():
+    cancelled = []
+
+    async def _sleep(delay, result):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(result)
+            raise
+        return result
+
+    async def _fail():
+        raise ValueError("failed")
+
+    async def _run():
+        with deadline_scope(timeout=0.2):
+            tasks = [
+                asyncio.ensure_future(_sleep(0.01, "fast")),
+                asyncio.ensure_future(_fail()),
+                asyncio.ensure_future(_sleep(5.0, "slow")),
+            ]
+            results = await gather_until_deadline(tasks)
+        # Let the cancelled task unwind
+        await asyncio.sleep(0)
+        return results
+
+    started_at = time.monotonic()
+    fast, failed, slow = asyncio.run(_run())
+
+    assert time.monotonic() - started_at < 0.2 + SLACK
+    assert fast == "fast"
+    assert isinstance(failed, ValueError)
+    assert isinstance(slow, DeadlineExceeded)
+    assert cancelled == ["slow"]
+
+
+def test_gather_until_deadline_waits_for_all_tasks_without_deadline():
+    async def _run():
+        tasks = [asyncio.ensure_future(asyncio.sleep(delay, result=delay)) for delay in (0.05, 0.01)]
+        return await gather_until_deadline(tasks), await gather_until_deadline([])
+
+    assert asyncio.run(_run()) == ([0.05, 0.01], [])
+
+
+@pytest.fixture(scope="module")
+def fake_arag():
+    fake_servers = pytest.importorskip("benchmarks.fake_servers")
+    from benchmarks.run import BenchmarkARag
+
+    from arag.utils.vectordb_utils import VectorDBClient
+
+    config = fake_servers.FakeServerConfig(llm_latency=fake_servers.LatencyModel(0.3, 0.0))
+    llm_server, vectordb_server = fake_servers.start_servers(config)
+    arag = BenchmarkARag(
+        llm_base_url=f"{llm_server.url}/v1",
+        api_key="test",
+        user_id="test",
+        vectordb_client=VectorDBClient(
+            vectordb_endpoint=f"{vectordb_server.url}/api", embeddings_url=vectordb_server.url
+        ),
+    )
+    # Loads encodings, clients and the event loop outside the measured searches
+    arag.search("warm up")
+    yield arag
+    llm_server.shutdown()
+    vectordb_server.shutdown()
+
+
+@pytest.mark.parametrize("timeout", [0.5, 1.0])
+def test_search_returns_within_timeout(fake_arag, timeout):
+    started_at = time.monotonic()
+    try:
+        fake_arag.search("How do I change the engine oil?", timeout=timeout)
+    except DeadlineExceeded:
+        pass
+
+    assert time.monotonic() - started_at < timeout + SLACK
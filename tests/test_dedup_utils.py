@@ -0,0 +1,56 @@
+import pytest
+
+from arag.utils.dedup_utils import MinHashDeduplicator, _optimal_bands
+from arag.utils.text_utils import remove_almost_duplicates
+
+
+@pytest.mark.parametrize(
+    "num_perm, threshold, expected",
+    [
+        # S-curve midpoints (1 / bands) ** (1 / rows) of the candidates around the threshold:
+        # (16, 8) -> 0.707, (8, 16) -> 0.878, (32, 4) -> 0.42
+        (128, 0.7, (16, 8)),
+        (128, 0.9, (8, 16)),
+        (128, 0.5, (32, 4)),
+        # Only (1, 7) and (7, 1) divide a prime
+        (7, 0.7, (1, 7)),
+        (7, 0.1, (7, 1)),
+    ],
+)
+def test_optimal_bands_picks_the_closest_midpoint(num_perm, threshold, expected):
+    assert _optimal_bands(num_perm, threshold) == expected
+
+
+def test_higher_thresholds_use_fewer_longer_bands():
+    selections = [_optimal_bands(120, threshold / 20) for threshold in range(1, 20)]
+
+    assert all(bands * rows == 120 for bands, rows in selections)
+    assert [bands for bands, _ in selections] == sorted((bands for bands, _ in selections), reverse=True)
+
+
+def test_deduplicator_drops_near_duplicates_only():
+    deduplicator = MinHashDeduplicator(jaccard_threshold=0.7)
+    base = "Check the engine oil level every month and top it up with the grade listed in the manual"
+
+    kept = deduplicator.deduplicate(
+        [
+            base,
+            base.upper() + ".",
+            base + " today",
+            "Replace the cabin air filter every fifteen thousand kilometres or once a year",
+        ]
+    )
+
+    assert (deduplicator.bands, deduplicator.rows) == (16, 8)
+    assert kept == [base, "Replace the cabin air filter every fifteen thousand kilometres or once a year"]
+
+
+def test_deprecated_edit_distance_threshold_is_mapped():
+    base = "Check the engine oil level every month and top it up with the grade listed in the manual"
+    strings = [base, base.upper() + ".", base + " today"]
+
+    with pytest.warns(DeprecationWarning):
+        assert remove_almost_duplicates(strings, threshold=2) == remove_almost_duplicates(strings) == [base]
+    # A distance of 0 only drops exact duplicates of the normalized text
+    with pytest.warns(DeprecationWarning):
+        assert remove_almost_duplicates(strings, threshold=0) == [base, base + " today"]
@@ -0,0 +1,31 @@
+import asyncio
+
+from arag.utils import vectordb_utils
+from arag.utils.vectordb_utils import EmbeddingCache, VectorDBClient
+
+
+def test_async_embeddings_are_served_from_the_cache(tmp_path, monkeypatch):
+    calls = []
+
+    async def _fake_aget_embeddings(http_client, text, model, api_url, timeout=None):
+        calls.append(text)
+        return [0.1, 0.2]
+
+    monkeypatch.setattr(vectordb_utils, "_aget_embeddings", _fake_aget_embeddings)
+    cache = EmbeddingCache(disk_path=str(tmp_path / "embeddings.sqlite"))
+    client = VectorDBClient(
+        vectordb_endpoint="http://vectordb/api", embeddings_url="http://embeddings", embedding_cache=cache
+    )
+
+    async def _embed():
+        first = await client.aget_embeddings("query")
+        second = await client.aget_embeddings("query")
+        await client.aclose()
+        return first, second
+
+    assert asyncio.run(_embed()) == ([0.1, 0.2], [0.1, 0.2])
+    assert calls == ["query"]
+    # Shared with the sync path, and persisted to the disk tier
+    assert client.get_embeddings("query") == [0.1, 0.2]
+    reopened = EmbeddingCache(disk_path=str(tmp_path / "embeddings.sqlite"))
+    assert reopened.get(client.embedding_model, "query") == [0.1, 0.2]
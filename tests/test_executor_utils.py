@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from arag.utils.executor_utils import StageExecutor
+
+
+def _run_with_timeout(fn, timeout: float = 5.0):
+    """Run `fn` in a thread, failing instead of hanging if it deadlocks."""
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "map deadlocked"
+    return result["value"]
+
+
+def test_tasks_not_picked_up_run_on_the_caller():
+    executor = StageExecutor(max_workers=1)
+    release = threading.Event()
+    blocker = executor.submit("busy", release.wait, 5.0)
+    caller = threading.current_thread()
+
+    try:
+        threads = executor.map("knowledge", lambda item: (item, threading.current_thread()), [0, 1, 2])
+    finally:
+        release.set()
+        blocker.result()
+
+    assert [item for item, _ in threads] == [0, 1, 2]
+    assert all(thread is caller for _, thread in threads)
+    metrics = executor.metrics()["knowledge"]
+    assert metrics["completed"] == 3 and metrics["queued"] == 0 and metrics["active"] == 0
+
+
+def test_nested_map_on_a_saturated_pool_does_not_deadlock():
+    executor = StageExecutor(max_workers=1)
+
+    def outer(item):
+        # Runs on the only worker, its sub-tasks can only run on this thread
+        return executor.map("inner", lambda sub: item * 10 + sub, range(3))
+
+    results = _run_with_timeout(lambda: executor.map("outer", outer, [1, 2]))
+
+    assert results == [[10, 11, 12], [20, 21, 22]]
+
+
+def test_map_returns_or_raises_exceptions_in_order():
+    executor = StageExecutor(max_workers=2)
+
+    def fn(item):
+        if item == 1:
+            raise ValueError(item)
+        return item
+
+    results = executor.map("stage", fn, [0, 1, 2], return_exceptions=True)
+    assert results[0] == 0 and isinstance(results[1], ValueError) and results[2] == 2
+
+    with pytest.raises(ValueError):
+        executor.map("stage", fn, [0, 1, 2])
+
+
+def test_max_concurrency_bounds_a_single_map():
+    executor = StageExecutor(max_workers=8)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+    barrier = threading.Event()
+
+    def fn(item):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        barrier.wait(0.05)
+        with lock:
+            running[0] -= 1
+        return item
+
+    assert executor.map("stage", fn, range(8), max_concurrency=2) == list(range(8))
+    assert peak[0] <= 2
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+
+import pytest
+
+from arag.agent_pipeline import ARag
+from arag.arag_agents.knowledge_agent import (KnowledgeAgent,
+                                              KnowledgeBatchSchema,
+                                              KnowledgeEntry)
+from arag.utils.deadline_utils import DeadlineExceeded
+from arag.utils.executor_utils import StageExecutor
+
+
+def _response(*entries):
+    return KnowledgeBatchSchema(entries=[KnowledgeEntry(chunk_id=i, knowledge=k) for i, k in entries])
+
+
+def test_batch_knowledge_keeps_entries_in_chunk_order():
+    response = _response(("1", "b"), ("0", "a"), ("2", ""))
+
+    assert KnowledgeAgent._batch_knowledge(response, 3) == ["a", "b", ""]
+
+
+def test_batch_knowledge_accepts_decorated_ids():
+    response = _response(("chunk 0", "a"), (" 1 ", "b"))
+
+    assert KnowledgeAgent._batch_knowledge(response, 2) == ["a", "b"]
+
+
+def test_batch_knowledge_marks_uncovered_chunks():
+    # Chunk 1 is left out, chunk 2 is duplicated and chunk 3 has an unreadable ID
+    response = _response(("0", "a"), ("2", "c"), ("2", "c again"), ("three", "d"))
+
+    assert KnowledgeAgent._batch_knowledge(response, 4) == ["a", None, None, None]
+
+
+class _PartialKnowledgeAgent:
+    """Batched calls cover only the first chunk."""
+
+    def perform_batch_action(self, query, document_chunks):
+        return ["batched"] + [None] * (len(document_chunks) - 1)
+
+    async def aperform_batch_action(self, query, document_chunks):
+        return self.perform_batch_action(query, document_chunks)
+
+    async def aperform_action(self, query, document_chunk, variant=None):
+        return f"single {document_chunk}"
+
+
+def _arag():
+    arag = ARag.__new__(ARag)
+    arag.knowledge_agent = _PartialKnowledgeAgent()
+    return arag
+
+
+def test_blocking_extraction_runs_the_async_pipeline():
+    arag = _arag()
+    arag.executor = StageExecutor(max_workers=2)
+    arag.knowledge_batch_tokens, arag.knowledge_batch_size = 1000, 8
+    arag.knowledge_compress_tokens = arag.knowledge_split_tokens = None
+    arag._loop, arag._loop_lock = None, threading.Lock()
+
+    assert arag.extract_knowledge(["x", "y", "z"], "query") == ["batched", "single y", "single z"]
+
+
+def test_uncovered_chunks_are_extracted_one_by_one_async():
+    async def _extract(chunk):
+        return f"single {chunk}"
+
+    knowledge = asyncio.run(_arag()._aextract_knowledge_batch(["x", "y", "z"], "query", _extract))
+
+    assert knowledge == ["batched", "single y", "single z"]
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+
+class _FailingKnowledgeAgent:
+    """Every call raises `error`, the calls are recorded with their prompt variant."""
+
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+        self.variants = []
+
+    def perform_action(self, query, document_chunk, variant=None):
+        self.variants.append(variant)
+        raise self.error
+
+    async def aperform_action(self, query, document_chunk, variant=None):
+        return self.perform_action(query, document_chunk, variant)
+
+
+def _failing_arag(error):
+    arag = ARag.__new__(ARag)
+    arag.knowledge_agent = _FailingKnowledgeAgent(error)
+    arag.knowledge_compress_tokens = arag.knowledge_split_tokens = None
+    arag.knowledge_fallbacks = 0
+    arag._fallback_lock = threading.Lock()
+    return arag
+
+
+def test_transient_errors_keep_the_raw_chunk_and_are_counted():
+    arag = _failing_arag(TimeoutError("Request timed out"))
+
+    assert asyncio.run(arag._aextract_knowledge("raw", "query")) == "raw"
+    # The compressed retry failed as well
+    assert asyncio.run(arag._afilter_and_process_chunk("wilf", "raw")) == "raw"
+
+    assert arag.knowledge_fallbacks == 2
+    assert arag.knowledge_agent.variants == [None, None, "compress"]
+
+
+@pytest.mark.parametrize("error", [DeadlineExceeded("deadline"), _RateLimitError("quota"), ValueError("bad output")])
+def test_deadline_rate_limit_and_permanent_errors_are_raised(error):
+    arag = _failing_arag(error)
+
+    with pytest.raises(type(error)):
+        asyncio.run(arag._aextract_knowledge("raw", "query"))
+    with pytest.raises(type(error)):
+        asyncio.run(arag._afilter_and_process_chunk("wilf", "raw"))
+
+    assert arag.knowledge_fallbacks == 0
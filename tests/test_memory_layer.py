@@ -0,0 +1,51 @@
+from arag.arag_agents.utils import memory_layer
+from arag.arag_agents.utils.memory_layer import AgentMemory
+from arag.utils.token_utils import count_tokens
+
+
+def _count_calls(monkeypatch, count=count_tokens):
+    calls = []
+
+    def _count_tokens(text):
+        calls.append(text)
+        return count(text)
+
+    monkeypatch.setattr(memory_layer, "count_tokens", _count_tokens)
+    return calls
+
+
+def test_memories_are_counted_once_when_added(monkeypatch):
+    calls = _count_calls(monkeypatch)
+    memory = AgentMemory(max_memory_tokens=1000)
+    facts = [f"Fact number {idx} about the engine." for idx in range(5)]
+
+    memory.update(facts)
+
+    assert calls == facts
+    assert memory.total_tokens == sum(count_tokens(fact) for fact in facts)
+
+    # Only the most recent memories that fit are kept, without encoding them again
+    kept = memory.retrieve(max_tokens=2 * (count_tokens(facts[0]) + memory_layer._pattern_tokens()))
+    assert facts[-1] in kept and facts[0] not in kept
+    assert not set(facts[:-1]) & set(calls[len(facts) :])
+
+
+def test_memories_shorter_than_the_limit_in_bytes_are_accepted(monkeypatch):
+    # Even if the count were above the limit, fewer bytes than tokens allowed is always under it
+    _count_calls(monkeypatch, count=lambda text: 10_000)
+    memory = AgentMemory(max_memory_tokens=100)
+
+    memory.update(["Short fact."])
+
+    assert memory.retrieve() == "<knowledge>\nShort fact.\n</knowledge>"
+
+
+def test_long_memories_are_checked_against_the_limit(monkeypatch):
+    # Many bytes per token, e.g. repetitive text, is still accepted when under the limit
+    _count_calls(monkeypatch, count=lambda text: 50 if text.startswith("-") else 500)
+    memory = AgentMemory(max_memory_tokens=100)
+
+    memory.update(["-" * 5000, "word " * 200])
+
+    assert memory.retrieve() == f"<knowledge>\n{'-' * 5000}\n</knowledge>"
+    assert memory.total_tokens == 50
@@ -0,0 +1,138 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from arag.utils import vectordb_utils
+from arag.utils.vectordb_utils import MetadataCache, VectorDBClient
+
+CATALOG = [{"filename": "manual.pdf", "summary": "Owner's manual"}]
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(vectordb_utils, "time", clock)
+    return clock
+
+
+class _Response:
+    def __init__(self, status_code: int, body=None, etag=None) -> None:
+        self.status_code = status_code
+        self._body = body
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Server Error")
+
+
+class _MetadataServer:
+    """Serves `CATALOG` with an ETag, answers 304 to a matching `If-None-Match` and fails while `down`."""
+
+    def __init__(self) -> None:
+        self.requests = []
+        self.down = False
+
+    def respond(self, headers):
+        self.requests.append(headers.get("If-None-Match"))
+        if self.down:
+            return 503, None, None
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, None, None
+        return 200, CATALOG, '"v1"'
+
+    # `requests.Session.get`
+    def get(self, url, headers=None, timeout=None):
+        return _Response(*self.respond(headers or {}))
+
+    # `httpx.MockTransport` handler
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        status_code, body, etag = self.respond(request.headers)
+        return httpx.Response(status_code, json=body, headers={"ETag": etag} if etag else {})
+
+
+def _client(server):
+    client = VectorDBClient(vectordb_endpoint="http://vectordb/api")
+    client.session = server
+    client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+    return client
+
+
+def test_catalog_is_served_from_memory_until_the_ttl_expires(clock):
+    server = _MetadataServer()
+    cache = MetadataCache(_client(server), ttl=60)
+
+    metadata, index = cache.get()
+    clock.now += 59
+    assert cache.get() == (metadata, index)
+    assert metadata == CATALOG and index == {"manual.pdf": CATALOG[0]}
+    assert server.requests == [None]
+
+    clock.now += 2
+    cache.get()
+    assert server.requests == [None, '"v1"']
+
+
+def test_unchanged_catalog_is_revalidated_with_a_304(clock):
+    server = _MetadataServer()
+    cache = MetadataCache(_client(server), ttl=60)
+
+    async def _revalidate():
+        first = await cache.aget()
+        clock.now += 61
+        return first, await cache.aget()
+
+    first, second = asyncio.run(_revalidate())
+
+    # The 304 carries no body, the cached catalog and index are kept and served for another TTL
+    assert server.requests == [None, '"v1"']
+    assert second[0] is first[0] and second[1] is first[1]
+    clock.now += 59
+    cache.get()
+    assert len(server.requests) == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stale_catalog_is_served_when_revalidation_fails(clock, use_async):
+    server = _MetadataServer()
+    cache = MetadataCache(_client(server), ttl=60, error_ttl=10)
+    get = (lambda: asyncio.run(cache.aget())) if use_async else cache.get
+
+    metadata, _ = get()
+    server.down = True
+    clock.now += 61
+    assert get()[0] is metadata
+
+    # The failure is not retried before `error_ttl`
+    clock.now += 9
+    get()
+    assert len(server.requests) == 2
+
+    server.down = False
+    clock.now += 2
+    assert get()[0] == CATALOG
+    assert server.requests[-1] == '"v1"'
+
+
+def test_first_fetch_failure_is_raised(clock):
+    server = _MetadataServer()
+    server.down = True
+    cache = MetadataCache(_client(server))
+
+    with pytest.raises(requests.HTTPError):
+        cache.get()
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(cache.aget())
@@ -0,0 +1,202 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from arag.arag_agents.utils.agent_primitives import (aclient_message,
+                                                     client_message,
+                                                     client_message_stream,
+                                                     get_rate_limiter)
+from arag.utils import rate_limit_utils
+from arag.utils.rate_limit_utils import (PRIORITY_HIGH, PRIORITY_LOW,
+                                         PRIORITY_NORMAL, RateLimiter)
+from arag.utils.retry_utils import RetryPolicy
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(rate_limit_utils, "time", clock)
+    return clock
+
+
+def _can_acquire(limiter: RateLimiter, tokens: int = 0) -> bool:
+    """Whether capacity is available right now; with the clock standing still, a waiter never gets any."""
+
+    async def _acquire():
+        await asyncio.wait_for(limiter.aacquire(tokens=tokens), timeout=0.1)
+
+    try:
+        asyncio.run(_acquire())
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+def test_buckets_refill_with_time(clock):
+    limiter = RateLimiter(requests_per_minute=2)
+    limiter.acquire()
+    limiter.acquire()
+
+    assert not _can_acquire(limiter)
+
+    # One request per 30 seconds
+    clock.now += 30
+    assert _can_acquire(limiter)
+    assert limiter.stats()["acquired"] == 3
+
+
+def test_refill_is_capped_at_the_quota(clock):
+    limiter = RateLimiter(requests_per_minute=2)
+    clock.now += 3600
+
+    limiter.acquire()
+    limiter.acquire()
+    assert not _can_acquire(limiter)
+
+
+def test_reconciled_usage_delays_later_requests(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.acquire(tokens=100)
+    # The request used 400 tokens more than estimated, leaving 100
+    limiter.reconcile(100, 500)
+
+    assert not _can_acquire(limiter, tokens=200)
+
+    # 10 tokens per second refill the missing 100
+    clock.now += 10
+    assert _can_acquire(limiter, tokens=200)
+
+
+async def _until_served(served, count):
+    while len(served) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_waiters_are_served_by_priority_then_arrival(clock):
+    limiter = RateLimiter(requests_per_minute=1)
+    limiter.acquire()
+    served = []
+
+    async def _wait(name, priority):
+        await limiter.aacquire(priority=priority)
+        served.append(name)
+
+    async def _run():
+        tasks = [
+            asyncio.ensure_future(_wait(name, priority))
+            for name, priority in [
+                ("low", PRIORITY_LOW),
+                ("normal", PRIORITY_NORMAL),
+                ("high", PRIORITY_HIGH),
+                ("second_high", PRIORITY_HIGH),
+            ]
+        ]
+        await asyncio.sleep(0.1)
+        assert served == [] and limiter.stats()["queued"] == 4
+
+        # Refill one request at a time, waiting for the next waiter to be served
+        for count in range(1, len(tasks) + 1):
+            clock.now += 60
+            await asyncio.wait_for(_until_served(served, count), timeout=2.0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(_run())
+
+    assert served == ["high", "second_high", "normal", "low"]
+
+
+class _FailingCompletions:
+    def create(self, **kwargs):
+        raise ValueError("Bad request")
+
+
+class _AsyncFailingCompletions:
+    async def create(self, **kwargs):
+        raise ValueError("Bad request")
+
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+def test_failed_request_refunds_reserved_tokens():
+    limiter = RateLimiter(tokens_per_minute=100_000)
+
+    with pytest.raises(ValueError):
+        client_message(
+            user_message="question " * 50, openai_client=_client(_FailingCompletions()), model="m", rate_limiter=limiter
+        )
+
+    stats = limiter.stats()
+    assert stats["acquired"] == 1
+    assert stats["reconciled_tokens"] < 0
+    assert limiter._tokens.level == pytest.approx(100_000, abs=1)
+    # The limiter is used for the call only, the process default is left alone
+    assert get_rate_limiter() is None
+
+
+def test_failed_async_request_refunds_reserved_tokens():
+    limiter = RateLimiter(tokens_per_minute=100_000)
+
+    with pytest.raises(ValueError):
+        asyncio.run(
+            aclient_message(
+                user_message="question " * 50,
+                openai_client=_client(_AsyncFailingCompletions()),
+                model="m",
+                rate_limiter=limiter,
+            )
+        )
+
+    assert limiter.stats()["reconciled_tokens"] < 0
+    assert limiter._tokens.level == pytest.approx(100_000, abs=1)
+
+
+class _FlakyStreamCompletions:
+    """Fails to open the first stream, then streams two pieces of text and the usage."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            raise TimeoutError("Request timed out")
+        usage = SimpleNamespace(total_tokens=7, json=lambda: '{"total_tokens": 7}')
+        return iter(
+            [
+                SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="Hello"))]),
+                SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=" world"))]),
+                SimpleNamespace(usage=usage, choices=[]),
+            ]
+        )
+
+
+def test_every_stream_open_attempt_is_counted():
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100_000)
+    completions = _FlakyStreamCompletions()
+
+    pieces = list(
+        client_message_stream(
+            user_message="question",
+            openai_client=_client(completions),
+            model="m",
+            retry_policy=RetryPolicy(max_attempts=2, base_delay=0.0),
+            rate_limiter=limiter,
+        )
+    )
+
+    assert [text for text, _ in pieces] == ["Hello", " world", None]
+    assert completions.calls == 2
+    assert limiter.stats()["acquired"] == 2
+    # The failed attempt was refunded, the successful one reconciled with the reported usage
+    assert limiter._tokens.level == pytest.approx(100_000 - 7, abs=1)
@@ -0,0 +1,210 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from arag.utils import retry_utils
+from arag.utils.retry_utils import RetryPolicy
+
+
+class _FakeTime:
+    """Clock whose `sleep` advances it instantly and records the delays."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake_time = _FakeTime()
+    monkeypatch.setattr(retry_utils, "time", fake_time)
+    # Full jitter picks the upper bound, so delays are deterministic
+    monkeypatch.setattr(retry_utils.random, "uniform", lambda low, high: high)
+    return fake_time
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int, retry_after=None) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": retry_after} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def _failing(errors, result="ok"):
+    """Function raising the given errors one per call, then returning `result`."""
+    errors = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(len(calls))
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return fn, calls
+
+
+def test_backoff_doubles_up_to_max_delay(fake_time):
+    policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=1.5)
+    fn, calls = _failing([TimeoutError(), ConnectionError(), _StatusError(503), _StatusError(429)])
+
+    assert policy.call(fn) == "ok"
+    assert fake_time.sleeps == [0.5, 1.0, 1.5, 1.5]
+    assert len(calls) == 5
+    assert policy.stats()["retries"] == 4
+
+
+def test_gives_up_after_max_attempts(fake_time):
+    policy = RetryPolicy(max_attempts=2, base_delay=0.1)
+    fn, calls = _failing([TimeoutError(), TimeoutError("last")])
+
+    with pytest.raises(TimeoutError, match="last"):
+        policy.call(fn)
+    assert len(calls) == 2
+    assert policy.stats()["failures"] == 1
+
+
+def test_retry_after_header_overrides_backoff(fake_time):
+    policy = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=5.0)
+    fn, _ = _failing([_StatusError(429, retry_after="2"), _StatusError(429, retry_after="120")])
+
+    assert policy.call(fn) == "ok"
+    # Honored in full, above max_delay too
+    assert fake_time.sleeps == [2.0, 120.0]
+
+
+def test_retry_after_past_the_deadline_is_not_waited_for(fake_time):
+    policy = RetryPolicy(max_attempts=3, max_delay=5.0)
+    fn, calls = _failing([_StatusError(429, retry_after="30")])
+
+    with pytest.raises(_StatusError):
+        policy.call(fn, deadline=fake_time.now + 10)
+    assert fake_time.sleeps == []
+    assert len(calls) == 1
+
+
+def test_non_retryable_errors_are_raised_at_once(fake_time):
+    policy = RetryPolicy(max_attempts=3)
+    fn, calls = _failing([_StatusError(400)])
+
+    with pytest.raises(_StatusError):
+        policy.call(fn)
+    assert len(calls) == 1
+    assert fake_time.sleeps == []
+
+
+def test_no_retry_that_would_end_past_the_deadline(fake_time):
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0)
+    fn, calls = _failing([TimeoutError(), TimeoutError()])
+
+    with pytest.raises(TimeoutError):
+        policy.call(fn, deadline=fake_time.now + 1.5)
+    # The first backoff (1s) fits, the second (2s) would end past the deadline
+    assert fake_time.sleeps == [1.0]
+    assert len(calls) == 2
+
+
+def test_async_retries_honor_retry_after(monkeypatch, fake_time):
+    sleeps = []
+
+    async def _sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(retry_utils.asyncio, "sleep", _sleep)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5)
+    fn, _ = _failing([_StatusError(429, retry_after="3"), TimeoutError()])
+
+    async def _call():
+        return fn()
+
+    assert asyncio.run(policy.acall(_call)) == "ok"
+    assert sleeps == [3.0, 1.0]
+
+
+def test_hedge_delay_is_the_latency_quantile():
+    policy = RetryPolicy(hedge=True, hedge_quantile=0.95, hedge_min_samples=10)
+    for latency in range(1, 10):
+        policy._observe(latency)
+    assert policy.hedge_delay() is None
+
+    for latency in range(10, 101):
+        policy._observe(latency)
+    assert policy.hedge_delay() == 96
+    assert RetryPolicy(hedge=False).hedge_delay() is None
+
+
+def _hedging_policy() -> RetryPolicy:
+    policy = RetryPolicy(hedge=True, hedge_min_samples=1)
+    policy._observe(0.05)
+    return policy
+
+
+def test_slow_call_is_hedged_and_the_duplicate_wins():
+    policy = _hedging_policy()
+    released = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            released.wait(5.0)
+            return "slow"
+        return "fast"
+
+    started_at = time.monotonic()
+    try:
+        assert policy.call(fn) == "fast"
+    finally:
+        released.set()
+
+    assert time.monotonic() - started_at < 1.0
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+
+
+def test_fast_call_is_not_hedged():
+    policy = _hedging_policy()
+    fn, calls = _failing([])
+
+    assert policy.call(fn) == "ok"
+    assert len(calls) == 1
+    assert policy.stats()["hedges"] == 0
+
+
+def test_async_slow_call_is_hedged_and_the_loser_cancelled():
+    policy = _hedging_policy()
+    cancelled = []
+
+    async def fn():
+        if not cancelled:
+            cancelled.append(False)
+            try:
+                await asyncio.sleep(5.0)
+            except asyncio.CancelledError:
+                cancelled[0] = True
+                raise
+            return "slow"
+        return "fast"
+
+    async def _call():
+        result = await policy.acall(fn)
+        # Let the cancelled call unwind
+        await asyncio.sleep(0)
+        return result
+
+    started_at = time.monotonic()
+    assert asyncio.run(_call()) == "fast"
+    assert time.monotonic() - started_at < 1.0
+    assert cancelled == [True]
+    assert policy.stats()["hedge_wins"] == 1
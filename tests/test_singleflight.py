@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from arag.utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_calls_share_one_async_call():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def _run():
+        return await asyncio.gather(flight.do("key", fn, 1), flight.do("key", fn, 1), flight.do("other", fn, 2))
+
+    assert asyncio.run(_run()) == [2, 2, 4]
+    assert calls == [1, 2]
+
+
+def test_cancelling_a_waiter_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight()
+    finished = []
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return "result"
+
+    async def _run():
+        first = asyncio.ensure_future(flight.do("key", fn))
+        second = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(_run()) == "result"
+    assert finished == [True]
+
+
+def test_shared_call_completes_when_every_waiter_is_cancelled():
+    flight = AsyncSingleFlight()
+
+    async def _run():
+        done = asyncio.Event()
+
+        async def fn():
+            await asyncio.sleep(0.02)
+            done.set()
+            raise ValueError("failed")
+
+        waiter = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.wait_for(done.wait(), timeout=1.0)
+        await asyncio.sleep(0)
+        # The key is released once the call is over, the next caller starts a new one
+        assert flight._calls[asyncio.get_running_loop()] == {}
+
+    asyncio.run(_run())
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(True)
+        started.set()
+        release.wait(5.0)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", fn)))
+    leader.start()
+    started.wait(5.0)
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", fn)))
+    follower.start()
+    # Give the follower time to start waiting on the leader's call
+    follower.join(0.1)
+    release.set()
+    leader.join(5.0)
+    follower.join(5.0)
+
+    assert results == ["result", "result"]
+    assert len(calls) == 1
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from arag.agent_pipeline import ARag
+from arag.arag_agents.answer_agent import AnswerAgent
+from arag.arag_agents.decorators import agent_registry
+from arag.arag_agents.decorators.agent_registry import ActionRegistry
+
+PIECES = ["First ", "paragraph.\n\n", "Second ", "paragraph."]
+_USAGE = SimpleNamespace(total_tokens=7, json=lambda: '{"total_tokens": 7}')
+
+
+def _chunks(pieces):
+    chunks = [SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=p))]) for p in pieces]
+    return iter(chunks + [SimpleNamespace(usage=_USAGE, choices=[])])
+
+
+class _Stream:
+    def __init__(self, pieces) -> None:
+        self._chunks = _chunks(pieces)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _AsyncStream:
+    def __init__(self, pieces, delay: float) -> None:
+        self._chunks = _chunks(pieces)
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.delay)
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _Completions:
+    """Streams `PIECES` and keeps every stream it opened."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.streams = []
+
+    def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        self.streams.append(_Stream(PIECES))
+        return self.streams[-1]
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        self.streams.append(_AsyncStream(PIECES, self.delay))
+        return self.streams[-1]
+
+
+def _client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    registry = ActionRegistry()
+    monkeypatch.setattr(agent_registry, "action_registry", registry)
+    return registry
+
+
+def _agent(delay: float = 0.0) -> AnswerAgent:
+    return AnswerAgent(
+        system_prompt="answer",
+        openai_client=_client(_Completions()),
+        async_openai_client=_client(_AsyncCompletions(delay)),
+    )
+
+
+def test_stream_action_yields_tokens_in_order_and_records_the_answer(registry):
+    agent = _agent()
+
+    assert list(agent.stream_action(query="question", document_chunks=["knowledge"])) == PIECES
+    assert agent.openai_client.chat.completions.streams[0].closed
+    assert registry.stats()["action-answer"]["count"] == 1
+    assert registry.stats()["action-answer"]["total_tokens"] == 7
+
+
+def test_astream_action_yields_tokens_in_order():
+    agent = _agent()
+
+    async def _collect():
+        return [token async for token in agent.astream_action(query="question", document_chunks=["knowledge"])]
+
+    assert asyncio.run(_collect()) == PIECES
+
+
+def test_stopping_early_closes_the_stream(registry):
+    agent = _agent()
+
+    tokens = agent.stream_action(query="question", document_chunks=["knowledge"])
+    assert next(tokens) == "First "
+    tokens.close()
+    assert agent.openai_client.chat.completions.streams[0].closed
+
+    async def _first():
+        tokens = agent.astream_action(query="question", document_chunks=["knowledge"])
+        first = await tokens.__anext__()
+        await tokens.aclose()
+        return first
+
+    assert asyncio.run(_first()) == "First "
+    assert agent.async_openai_client.chat.completions.streams[0].closed
+    # Incomplete answers are not recorded
+    assert "action-answer" not in registry.stats()
+
+
+def _arag(delay: float = 0.0):
+    arag = ARag.__new__(ARag)
+    arag.user_id = "user"
+    arag.tracer = None
+    arag.status_mode = "template"
+    arag.events = []
+    arag.status_callback = lambda state, message: arag.events.append((state, message))
+    arag.answer_agent = _agent(delay)
+    arag._loop, arag._loop_lock = None, threading.Lock()
+
+    async def _agather_knowledge(query, narrations):
+        return ["knowledge"]
+
+    async def _apack_context(query, knowledge):
+        return knowledge
+
+    async def _aadd_citations(answer, merged_knowledge, citation_map=None):
+        return f"{answer} [1]"
+
+    arag._agather_knowledge = _agather_knowledge
+    arag._apack_context = _apack_context
+    arag._aadd_citations = _aadd_citations
+    return arag
+
+
+def test_asearch_stream_yields_tokens_then_cited_paragraphs_and_reports_them():
+    arag = _arag()
+
+    async def _collect():
+        return [event async for event in arag.asearch_stream("question")]
+
+    events = asyncio.run(_collect())
+
+    assert [text for kind, text in events if kind == "answer_token"] == PIECES
+    paragraphs = [text for kind, text in events if kind == "answer_paragraph"]
+    assert paragraphs == ["First paragraph. [1]", "Second paragraph. [1]"]
+    # Every streamed event reaches the status callback, in the same order
+    assert [event for event in arag.events if event[0] in ("answer_token", "answer_paragraph")] == events
+
+
+def _run_with_timeout(fn, timeout: float = 5.0):
+    """Run `fn` in a thread, failing instead of hanging if it deadlocks."""
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "search_stream deadlocked"
+    return result["value"]
+
+
+def test_search_stream_drives_the_background_loop_without_deadlock():
+    arag = _arag(delay=0.01)
+
+    events = _run_with_timeout(lambda: list(arag.search_stream("question")))
+    assert [text for kind, text in events if kind == "answer_token"] == PIECES
+
+    # Stopping early closes the async stream on the loop, which keeps serving later searches
+    def _first_token():
+        stream = arag.search_stream("question")
+        first = next(stream)
+        stream.close()
+        return first
+
+    assert _run_with_timeout(_first_token) == ("answer_token", "First ")
+    assert arag.answer_agent.async_openai_client.chat.completions.streams[-1].closed
+    assert len(_run_with_timeout(lambda: list(arag.search_stream("question")))) == len(events)
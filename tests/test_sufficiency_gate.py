@@ -0,0 +1,132 @@
+import asyncio
+from types import SimpleNamespace
+
+from arag.agent_pipeline import ARag
+from arag.utils.executor_utils import StageExecutor
+
+METADATA = {"filename": "doc.pdf", "table_of_contents": "", "summary": ""}
+
+
+def _section(section, what="details"):
+    return SimpleNamespace(section=section, what_im_looking_for=what, reference_context="")
+
+
+class _KnowledgeAgent:
+    async def aperform_action(self, query, document_chunk, variant=None):
+        return f"knowledge of {document_chunk}"
+
+
+class _MissingInfoAgent:
+    """Finds one missing section per block, after `delay` seconds."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def aperform_action(self, text_chunk, table_of_contents, file_summary):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return [_section(f"section of {text_chunk}")]
+
+
+class _SufficiencyAgent:
+    def __init__(self, is_sufficient: bool = False, error: Exception = None) -> None:
+        self.is_sufficient = is_sufficient
+        self.error = error
+        self.calls = 0
+
+    async def aperform_action(self, query, knowledge, missing_sections):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.is_sufficient, []
+
+
+def _arag(sufficiency_agent, missing_info_agent, max_missing_sections=3):
+    arag = ARag.__new__(ARag)
+    arag.executor = StageExecutor(max_workers=4)
+    arag.status_callback = None
+    arag.knowledge_batch_tokens = None
+    arag.knowledge_compress_tokens = arag.knowledge_split_tokens = None
+    arag.answer_context_tokens = None
+    arag.max_missing_sections = max_missing_sections
+    arag.knowledge_agent = _KnowledgeAgent()
+    arag.missing_info_agent = missing_info_agent
+    arag.sufficiency_agent = sufficiency_agent
+
+    async def _chunks(prompts, filename, num_chunks):
+        yield ["a", "b"]
+        yield ["c"]
+
+    arag.aiter_retrieved_chunks = _chunks
+    return arag
+
+
+def _stream(arag):
+    return asyncio.run(
+        asyncio.wait_for(
+            arag.astream_knowledge(query="query", prompts=["p"], chosen_metadata=METADATA, sufficiency_gate=True),
+            timeout=2.0,
+        )
+    )
+
+
+def test_sufficient_knowledge_cancels_detection_and_skips_the_expansion():
+    missing_info_agent = _MissingInfoAgent(delay=30.0)
+    arag = _arag(_SufficiencyAgent(is_sufficient=True), missing_info_agent)
+
+    knowledge, missing_sections = _stream(arag)
+
+    assert knowledge == ["knowledge of a", "knowledge of b", "knowledge of c"]
+    assert missing_sections == []
+    # Detection was pipelined with extraction, and cut short by the verdict
+    assert missing_info_agent.calls == 3 and missing_info_agent.cancelled == 3
+    assert arag.sufficiency_agent.calls == 1
+
+
+def test_insufficient_knowledge_keeps_the_detected_sections():
+    missing_info_agent = _MissingInfoAgent(delay=0.05)
+    arag = _arag(_SufficiencyAgent(is_sufficient=False), missing_info_agent)
+
+    _, missing_sections = _stream(arag)
+
+    assert [item.section for item in missing_sections] == [
+        "section of knowledge of a",
+        "section of knowledge of b",
+        "section of knowledge of c",
+    ]
+    assert missing_info_agent.cancelled == 0
+    assert arag.sufficiency_agent.calls == 1
+
+
+def test_failed_sufficiency_check_falls_back_to_the_detected_sections():
+    arag = _arag(_SufficiencyAgent(error=TimeoutError("Request timed out")), _MissingInfoAgent())
+
+    _, missing_sections = _stream(arag)
+
+    assert len(missing_sections) == 3
+
+
+def test_sections_over_the_limit_are_ranked_and_capped():
+    arag = _arag(_SufficiencyAgent(), _MissingInfoAgent(), max_missing_sections=2)
+    followed = []
+
+    async def _extraction(missing_sections, chosen_metadata, extracted_knowledge, num_chunks):
+        followed.extend(missing_sections)
+        return ["expanded"]
+
+    arag.amissing_info_extraction = _extraction
+    detected = [_section("1.1"), _section("2.3"), _section("4"), _section("2.3", "other"), _section("4"), _section("4")]
+
+    expansion_span = SimpleNamespace(set_attribute=lambda key, value: None)
+    expanded = asyncio.run(arag._aexpand_missing_info(["knowledge"], detected, METADATA, expansion_span))
+
+    # "4" is referenced three times, "2.3" twice; duplicates of a (section, what) pair are merged
+    assert expanded == ["expanded"]
+    assert [(item.section, item.what_im_looking_for) for item in followed] == [("4", "details"), ("2.3", "details")]
+    assert arag.sufficiency_agent.calls == 0
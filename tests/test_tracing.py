@@ -0,0 +1,55 @@
+import asyncio
+import contextvars
+import threading
+
+from arag.utils.tracing_utils import Tracer, get_tracer, span, start_span
+
+
+class _ListExporter:
+    def __init__(self) -> None:
+        self.spans = []
+
+    def export(self, spans) -> None:
+        self.spans.extend(spans)
+
+
+def test_nested_spans_follow_the_tracer_of_their_trace():
+    first, second = _ListExporter(), _ListExporter()
+    first_tracer, second_tracer = Tracer(first), Tracer(second)
+
+    with first_tracer.span("search"):
+        with span("stage"):
+            pass
+    with second_tracer.span("search") as root:
+        child = start_span("llm.chat", parent=root)
+        child.end()
+
+    assert [s.name for s in first.spans] == ["stage", "search"]
+    assert [s.name for s in second.spans] == ["llm.chat", "search"]
+    # Outside any span the disabled process tracer is used
+    assert not get_tracer().enabled
+
+
+def test_tracer_is_inherited_by_tasks_and_threads():
+    exporter = _ListExporter()
+    tracer = Tracer(exporter)
+
+    def _job():
+        with span("thread_job"):
+            pass
+
+    async def _task():
+        with span("task"):
+            pass
+
+    async def _search():
+        with tracer.span("search"):
+            await asyncio.create_task(_task())
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(_job,))
+            thread.start()
+            thread.join()
+
+    asyncio.run(_search())
+
+    assert sorted(s.name for s in exporter.spans) == ["search", "task", "thread_job"]
+    assert len({s.trace_id for s in exporter.spans}) == 1